@@ -0,0 +1,91 @@
+"""
+Porównanie przepustowości ekstrakcji yt-dlp w trybie wątków i procesów.
+
+Uruchamia te same zapytania przez YTDLPool (wątki) i YTDLProcessPool
+(procesy robocze), z taką samą liczbą równoległych zadań, i mierzy:
+- czas całkowity i liczbę ekstrakcji na sekundę,
+- opóźnienie pętli zdarzeń (jak bardzo ekstrakcja spowalnia resztę bota).
+
+Użycie (z katalogu głównego repozytorium, wymaga dostępu do sieci):
+    python benchmarks/extraction_backends.py URL [URL ...] --repeat 3 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import YTDLPool, YTDLProcessPool, ytdl_profiles
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    """Mierzy maksymalne i średnie opóźnienie budzenia się pętli zdarzeń"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return max(lags, default=0.0), sum(lags) / len(lags) if lags else 0.0
+
+
+async def run_backend(pool, urls, workers):
+    """Wykonuje ekstrakcję wszystkich adresów i zwraca wyniki pomiaru"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, pool.extract_info, 'stream', url) for url in urls),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    max_lag, avg_lag = await lag_task
+    executor.shutdown()
+
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    return {
+        'elapsed': elapsed,
+        'throughput': (len(urls) - failed) / elapsed if elapsed else 0.0,
+        'failed': failed,
+        'max_lag_ms': max_lag * 1000,
+        'avg_lag_ms': avg_lag * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+', help="Adresy lub zapytania (np. ytsearch:fraza)")
+    parser.add_argument('--repeat', type=int, default=3, help="Ile razy powtórzyć listę adresów")
+    parser.add_argument('--workers', type=int, default=4, help="Liczba równoległych ekstrakcji")
+    args = parser.parse_args()
+
+    urls = args.urls * args.repeat
+    backends = {
+        'thread': YTDLPool(ytdl_profiles, size=args.workers),
+        'process': YTDLProcessPool(ytdl_profiles, workers=args.workers)
+    }
+
+    for name, pool in backends.items():
+        pool.warm_up(args.workers)
+        # Pierwsze wywołanie rozgrzewa procesy i cache - nie wliczamy go do pomiaru
+        asyncio.run(run_backend(pool, urls[:1], 1))
+
+        result = asyncio.run(run_backend(pool, urls, args.workers))
+        print(
+            f"{name:>8}: {len(urls)} ekstrakcji w {result['elapsed']:.2f}s "
+            f"({result['throughput']:.2f}/s, błędów: {result['failed']}), "
+            f"opóźnienie pętli: maks. {result['max_lag_ms']:.1f} ms, śr. {result['avg_lag_ms']:.2f} ms"
+        )
+
+    backends['process'].shutdown()
+
+
+if __name__ == '__main__':
+    main()
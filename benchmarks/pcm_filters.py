@@ -0,0 +1,67 @@
+"""
+Pomiar kosztu przetwarzania jednej ramki PCM (20 ms, 48 kHz, stereo).
+
+Porównuje dotychczasową ścieżkę (audioop.mul, jak w PCMVolumeTransformer)
+z łańcuchem PCMFilterChain na NumPy: sama głośność, głośność z korektą
+utworu oraz głośność w trakcie wyciszania. Wynik to średni czas na ramkę
+- budżet czasu wątku odtwarzacza to 20 ms na ramkę na serwer.
+    python benchmarks/pcm_filters.py --frames 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.helpers import FRAME_BYTES, FadeFilter, GainFilter, PCMFilterChain
+
+
+def measure(process, frame, count):
+    """Zwraca średni czas przetworzenia ramki w mikrosekundach"""
+    for _ in range(100):
+        process(frame)
+    start = time.perf_counter()
+    for _ in range(count):
+        process(frame)
+    return (time.perf_counter() - start) / count * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=20000, help="Liczba ramek w pomiarze")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(-20000, 20000, FRAME_BYTES // 2, dtype=np.int16).tobytes()
+
+    volume_only = PCMFilterChain([GainFilter(0.5)])
+    with_loudness = PCMFilterChain([GainFilter(0.5), GainFilter(0.8)])
+
+    # Wyciszanie trwające cały pomiar - każda ramka dostaje własną rampę
+    fader = FadeFilter()
+    fader.fade_out(args.frames + 1000)
+    fading = PCMFilterChain([GainFilter(0.5), fader])
+
+    results = []
+    try:
+        import audioop  # Usunięty w Pythonie 3.13 - porównanie tylko tam, gdzie jest dostępny
+    except ImportError:
+        pass
+    else:
+        results.append(("audioop.mul (dotychczas)", measure(lambda data: audioop.mul(data, 2, 0.5), frame, args.frames)))
+
+    results += [
+        ("NumPy: głośność", measure(volume_only.process, frame, args.frames)),
+        ("NumPy: głośność + korekta", measure(with_loudness.process, frame, args.frames)),
+        ("NumPy: głośność + wyciszanie", measure(fading.process, frame, args.frames)),
+        ("Głośność 1.0 (bez filtrów)", measure(PCMFilterChain([GainFilter(1.0)]).process, frame, args.frames)),
+    ]
+    for name, micros in results:
+        print(f"{name:32} {micros:8.1f} µs na ramkę")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Pomiar pamięci zajmowanej przez jeden utwór w kolejce.
+
+Porównuje dotychczasowy sposób (obiekt utworu + pełny słownik yt-dlp
+trzymany w `data`) z rekordem TrackInfo/QueuedTrack, który przechowuje
+tylko używane pola. Pamięć mierzona jest przez tracemalloc dla N kopii.
+
+Domyślnie używa syntetycznego słownika o strukturze typowej dla YouTube
+(formaty, miniatury, napisy, opis, tagi). Dokładniejszy wynik da prawdziwy
+słownik zapisany poleceniem `yt-dlp -J URL > info.json`:
+    python benchmarks/track_memory.py --info info.json --count 500
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import QueuedTrack
+from utils.ytdl_worker import trim_info
+
+
+def synthetic_info():
+    """Buduje słownik podobny do wyniku extract_info dla filmu YouTube"""
+    formats = [
+        {
+            'format_id': str(100 + i), 'url': f"https://rr1---sn.googlevideo.com/videoplayback?expire=1700000000&id={i}&" + "x" * 900,
+            'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none' if i < 6 else 'vp9', 'abr': 128.0, 'asr': 48000,
+            'filesize': 3_000_000 + i, 'tbr': 130.5, 'protocol': 'https', 'format_note': 'medium',
+            'http_headers': {'User-Agent': 'Mozilla/5.0 ' + 'y' * 100, 'Accept': '*/*', 'Accept-Language': 'en-us'},
+            'downloader_options': {'http_chunk_size': 10485760}, 'fragments': None
+        }
+        for i in range(30)
+    ]
+    return {
+        'id': 'dQw4w9WgXcQ', 'title': 'Przykładowy utwór', 'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'uploader': 'Kanał', 'uploader_url': 'https://www.youtube.com/@kanal', 'duration': 213,
+        'view_count': 1_000_000, 'like_count': 10_000,
+        'thumbnail': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg',
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/dQw4w9WgXcQ/{i}.jpg", 'height': i, 'width': i, 'id': str(i)} for i in range(40)],
+        'description': 'Opis filmu. ' * 400,
+        'tags': [f"tag{i}" for i in range(30)],
+        'formats': formats,
+        'requested_formats': formats[:1],
+        'automatic_captions': {
+            f"l{i}": [{'ext': ext, 'url': 'https://www.youtube.com/api/timedtext?' + 'z' * 300} for ext in ('json3', 'srv1', 'vtt')]
+            for i in range(100)
+        },
+        'url': formats[0]['url'], 'acodec': 'opus', 'abr': 128.0, 'asr': 48000, 'ext': 'webm'
+    }
+
+
+class FullTrack:
+    """Odpowiednik dotychczasowego utworu, który trzymał pełny słownik yt-dlp"""
+
+    def __init__(self, data):
+        self.data = data
+        self.track = QueuedTrack(data)
+
+
+def measure(factory, info, count):
+    """Zwraca średnią liczbę bajtów na utwór dla `count` utworów"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    samples = [copy.deepcopy(info) for _ in range(count)]
+    tracks = [factory(sample) for sample in samples]
+    del samples  # Zostaje tylko to, co utwory faktycznie przechowują
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(tracks) == count
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--info', help="Plik JSON z wynikiem yt-dlp -J (domyślnie dane syntetyczne)")
+    parser.add_argument('--count', type=int, default=200, help="Liczba utworów w pomiarze")
+    args = parser.parse_args()
+
+    if args.info:
+        with open(args.info, encoding='utf-8') as f:
+            info = json.load(f)
+    else:
+        info = synthetic_info()
+
+    full = measure(FullTrack, info, args.count)
+    compact = measure(lambda data: QueuedTrack(trim_info(data)), info, args.count)
+
+    print(f"Pełny słownik + utwór:  {full / 1024:8.1f} KB na utwór")
+    print(f"TrackInfo/QueuedTrack:  {compact / 1024:8.1f} KB na utwór")
+    print(f"Oszczędność:            {(1 - compact / full) * 100:8.1f}%")
+
+
+if __name__ == '__main__':
+    main()
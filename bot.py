@@ -8,91 +8,36 @@ except ImportError as e:
     print("pip install -r requirements.txt")
     exit(1)
 
-# Sprawdź czy FFmpeg jest dostępny
 import shutil
-if not shutil.which("ffmpeg"):
-    print("OSTRZEŻENIE: FFmpeg nie został znaleziony w PATH.")
-    print("Bot może nie odtwarzać dźwięku. Zainstaluj FFmpeg i upewnij się, że jest w PATH.")
-
-import os
 import discord
 from discord.ext import commands, tasks
 import asyncio
 import traceback
 from config import TOKEN, PREFIX, DEBUG_MODE
 from utils.logger import get_logger
-import time
+from utils.audio_cache import audio_cache, cleanup_temp_files as cleanup_audio_files
 
 # Inicjalizacja loggera
 logger = get_logger()
 
-# Ustawienia intencji (Intents)
-intents = discord.Intents.default()
-intents.message_content = True
-intents.voice_states = True
-intents.members = True
-
-# Inicjalizacja bota
-bot = commands.Bot(command_prefix=PREFIX, intents=intents, help_command=None)
-
-# Konfiguracja zaawansowanego logowania
-if DEBUG_MODE:
-    import logging
-    discord_logger = logging.getLogger('discord')
-    discord_logger.setLevel(logging.DEBUG)
-    logging.getLogger('discord.http').setLevel(logging.INFO)
-    logging.getLogger('discord.voice_client').setLevel(logging.DEBUG)
+# Uwaga: procesy robocze ekstrakcji (YTDL_BACKEND=process, metoda spawn) wykonują
+# ten plik od nowa jako __mp_main__ - poza blokiem __main__ wolno tylko definiować
+# funkcje, bez tworzenia bota i zmian na dysku
 
 @tasks.loop(hours=6)
 async def cleanup_temp_files():
-    """Okresowo czyści pliki tymczasowe"""
+    """Okresowo czyści pliki tymczasowe i pilnuje limitu cache audio"""
     logger.info("Rozpoczynam czyszczenie plików tymczasowych...")
     try:
-        # Implementacja czyszczenia plików w samym bot.py zamiast polegania na YTDLSource
-        temp_dir = 'temp'
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-            logger.info(f"Utworzono katalog {temp_dir}")
-            return
-
-        current_time = time.time()
-        max_age_seconds = 24 * 3600  # 24 godziny
-        
-        # Liczniki statystyk
-        removed_count = 0
-        total_size_removed = 0
-        
-        for filename in os.listdir(temp_dir):
-            file_path = os.path.join(temp_dir, filename)
-            try:
-                # Sprawdź czy to plik (nie katalog)
-                if not os.path.isfile(file_path):
-                    continue
-                
-                # Pobierz czas modyfikacji pliku
-                file_modified_time = os.path.getmtime(file_path)
-                file_age_seconds = current_time - file_modified_time
-                
-                # Jeśli plik jest starszy niż dozwolony wiek
-                if file_age_seconds > max_age_seconds:
-                    # Pobierz rozmiar pliku przed usunięciem
-                    file_size = os.path.getsize(file_path)
-                    
-                    # Usuń plik
-                    os.unlink(file_path)
-                    
-                    # Aktualizuj statystyki
-                    removed_count += 1
-                    total_size_removed += file_size
-            except Exception as e:
-                logger.error(f"Błąd podczas próby usunięcia pliku {file_path}: {e}")
-        
+        # Ta sama procedura co komenda cleancache (utils/audio_cache.py)
+        removed_count, total_size_removed = await asyncio.get_running_loop().run_in_executor(
+            None, cleanup_audio_files, 24
+        )
         logger.info(f"Usunięto {removed_count} plików, zwolniono {total_size_removed} bajtów")
     except Exception as e:
         logger.error(f"Błąd podczas czyszczenia plików tymczasowych: {e}")
 
-@bot.event
-async def on_ready():
+async def bot_ready(bot):
     """Wywoływane gdy bot jest gotowy i połączony"""
     logger.info(f"Bot zalogowany jako {bot.user.name} ({bot.user.id})")
     
@@ -107,12 +52,11 @@ async def on_ready():
     logger.info(f"Bot jest na {guild_count} serwerach")
     
     # Załaduj moduły
-    await load_extensions()
+    await load_extensions(bot)
     
     # Uruchom zadanie czyszczenia plików
     cleanup_temp_files.start()
 
-@bot.event
 async def on_command_error(ctx, error):
     """Obsługa błędów komend"""
     if isinstance(error, commands.CommandNotFound):
@@ -142,7 +86,7 @@ async def on_command_error(ctx, error):
     # Powiadom użytkownika
     await ctx.send(f"❌ Wystąpił błąd podczas wykonywania komendy: {str(error)}")
 
-async def load_extensions():
+async def load_extensions(bot):
     """Ładuje wszystkie rozszerzenia (cogs)"""
     # Główne moduły
     main_extensions = ['cogs.music']
@@ -174,11 +118,11 @@ async def load_extensions():
     except Exception as e:
         logger.error(f"Nie udało się załadować modułu cogs.diagnostics: {e}")
 
-@bot.command(name="ping", help="Sprawdza opóźnienie bota")
+@commands.command(name="ping", help="Sprawdza opóźnienie bota")
 async def ping(ctx):
     """Sprawdza opóźnienie bota"""
     # Oblicz opóźnienie bota
-    latency = round(bot.latency * 1000)  # Konwersja na milisekundy
+    latency = round(ctx.bot.latency * 1000)  # Konwersja na milisekundy
     
     # Utwórz osadzony komunikat z informacją o opóźnieniu
     embed = discord.Embed(
@@ -189,10 +133,51 @@ async def ping(ctx):
     
     await ctx.send(embed=embed)
 
+def create_bot():
+    """
+    Tworzy bota z obsługą zdarzeń i komendami (bez łączenia z Discordem).
+    
+    Returns:
+        commands.Bot: Skonfigurowany bot
+    """
+    # Ustawienia intencji (Intents)
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.voice_states = True
+    intents.members = True
+    
+    # Inicjalizacja bota
+    bot = commands.Bot(command_prefix=PREFIX, intents=intents, help_command=None)
+    
+    @bot.event
+    async def on_ready():
+        await bot_ready(bot)
+    
+    bot.event(on_command_error)
+    bot.add_command(ping)
+    
+    # Konfiguracja zaawansowanego logowania
+    if DEBUG_MODE:
+        import logging
+        discord_logger = logging.getLogger('discord')
+        discord_logger.setLevel(logging.DEBUG)
+        logging.getLogger('discord.http').setLevel(logging.INFO)
+        logging.getLogger('discord.voice_client').setLevel(logging.DEBUG)
+    
+    return bot
+
 if __name__ == "__main__":
+    # Sprawdź czy FFmpeg jest dostępny
+    if not shutil.which("ffmpeg"):
+        print("OSTRZEŻENIE: FFmpeg nie został znaleziony w PATH.")
+        print("Bot może nie odtwarzać dźwięku. Zainstaluj FFmpeg i upewnij się, że jest w PATH.")
+    
+    # Pobierania przerwane przy poprzednim wyłączeniu bota nie dokończą się
+    audio_cache.remove_partial_files()
+    
     try:
         # Uruchom bota
-        asyncio.run(bot.start(TOKEN))
+        asyncio.run(create_bot().start(TOKEN))
     except KeyboardInterrupt:
         logger.info("Bot zatrzymany przez użytkownika")
     except Exception as e:
@@ -1,11 +1,16 @@
 import discord
 from discord.ext import commands
 import asyncio
+import functools
 import sys
 import traceback
-import yt_dlp
 import os
 import subprocess
+from utils.helpers import (
+    ytdl_pool, metadata_cache, query_index, transition_stats,
+    extraction_scheduler, download_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+from utils.audio_cache import audio_cache
 
 class Diagnostics(commands.Cog):
     def __init__(self, bot):
@@ -50,24 +55,20 @@ class Diagnostics(commands.Cog):
             # 3. Pobieranie informacji o utworze z yt-dlp
             await ctx.send(f"🔍 Wyszukuję: `{query}`...")
             
-            ytdl_opts = {
-                'format': 'bestaudio/best',
-                'noplaylist': True,
-                'quiet': True,
-                'no_warnings': True,
-                'default_search': 'auto',
-                'extract_flat': True,
-            }
-            
-            ydl = yt_dlp.YoutubeDL(ytdl_opts)
-            
             # Sprawdź, czy to URL czy fraza wyszukiwania
             if not (query.startswith('http://') or query.startswith('https://')):
                 search_query = f"ytsearch:{query}"
             else:
                 search_query = query
-                
-            info = await self.bot.loop.run_in_executor(None, lambda: ydl.extract_info(search_query, download=False))
+            
+            # Pełna ekstrakcja (z listą formatów, także w trybie procesów roboczych)
+            # w harmonogramie ekstrakcji - liczy się do limitu serwera jak %play
+            info = await extraction_scheduler.run(
+                functools.partial(ytdl_pool.extract_info, 'stream', search_query, download=False, formats=True),
+                priority=PRIORITY_INTERACTIVE,
+                guild_id=ctx.guild.id,
+                timeout=30.0
+            )
             
             if 'entries' in info:
                 info = info['entries'][0]
@@ -182,5 +183,78 @@ class Diagnostics(commands.Cog):
             await ctx.send(f"❌ Błąd diagnostyki: {e}")
             traceback.print_exc()
 
+    @commands.command(name="stats")
+    @commands.is_owner()
+    async def stats(self, ctx):
+        """Wyświetla statystyki wydajności (cache, ekstrakcja, przejścia między utworami)"""
+        embed = discord.Embed(title="📊 Statystyki", color=discord.Color.blue())
+        
+        cache = metadata_cache.stats()
+        embed.add_field(
+            name="Cache metadanych",
+            value=(
+                f"Wpisy w pamięci: {cache['entries']}/{cache['max_entries']}\n"
+                f"Trafienia: {cache['hits']} (z dysku: {cache['disk_hits']})\n"
+                f"Chybienia: {cache['misses']}\n"
+                f"Skuteczność: {cache['hit_ratio']:.0%}"
+            ),
+            inline=False
+        )
+        
+        queries = query_index.stats()
+        embed.add_field(
+            name="Indeks zapytań",
+            value=(
+                f"Frazy w pamięci: {queries['entries']}\n"
+                f"Trafienia: {queries['hits']}\n"
+                f"Chybienia: {queries['misses']}\n"
+                f"Skuteczność: {queries['hit_ratio']:.0%}"
+            ),
+            inline=False
+        )
+        
+        audio = audio_cache.stats()
+        downloads = download_scheduler.stats()
+        embed.add_field(
+            name="Cache audio",
+            value=(
+                f"Pliki: {audio['entries']} ({audio['size_mb']:.0f}/{audio['max_mb']:.0f} MB)\n"
+                f"Trafienia: {audio['hits']}\n"
+                f"Chybienia: {audio['misses']}\n"
+                f"Skuteczność: {audio['hit_ratio']:.0%}\n"
+                f"Pobieranie w tle: {downloads['active']}/{downloads['workers']} (w kolejce: {downloads['pending']})"
+            ),
+            inline=False
+        )
+        
+        extraction = extraction_scheduler.stats()
+        interactive = extraction['waits'][PRIORITY_INTERACTIVE]
+        background = extraction['waits'][PRIORITY_BACKGROUND]
+        embed.add_field(
+            name="Ekstrakcja yt-dlp",
+            value=(
+                f"Wątki zajęte: {extraction['active']}/{extraction['workers']} "
+                f"(limit na serwer: {extraction['guild_limit']})\n"
+                f"W kolejce: {extraction['pending']}\n"
+                f"Oczekiwanie (interaktywne): śr. {interactive['avg_ms']:.0f} ms, maks. {interactive['max_ms']:.0f} ms\n"
+                f"Oczekiwanie (w tle): śr. {background['avg_ms']:.0f} ms, maks. {background['max_ms']:.0f} ms"
+            ),
+            inline=False
+        )
+        
+        transitions = transition_stats.stats()
+        embed.add_field(
+            name="Przejścia między utworami",
+            value=(
+                f"Przejścia: {transitions['transitions']} (przygotowane: {transitions['prefetched']})\n"
+                f"Ostatnia przerwa: {transitions['last_ms']:.0f} ms\n"
+                f"Średnia przerwa: {transitions['avg_ms']:.0f} ms\n"
+                f"Najdłuższa przerwa: {transitions['max_ms']:.0f} ms"
+            ),
+            inline=False
+        )
+        
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Diagnostics(bot))
\ No newline at end of file
@@ -0,0 +1,722 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+import discord
+from utils.helpers import YTDLSource, transition_stats, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from utils.audio_cache import audio_cache
+from config import (
+    STREAM_URL_REFRESH_MARGIN, PREFETCH_SECONDS, QUEUE_HISTORY_SIZE, LOOP_BUFFER_SECONDS,
+    PREDOWNLOAD_TRACKS, FADE_MS, DUPLICATE_POLICY
+)
+from utils.logger import get_logger
+from .guild_queue import apply_duplicate_policy
+
+# Inicjalizacja loggera
+logger = get_logger()
+
+
+class GuildPlayer:
+    """
+    Odtwarzacz jednego serwera.
+
+    Jedno długo działające zadanie asyncio na serwer jest jedynym miejscem,
+    które zmienia stan odtwarzania: kolejkę, aktualny utwór i voice client.
+    Komendy oraz sygnały zakończenia utworów trafiają do kolejki poleceń
+    i są wykonywane po kolei, więc równoległe komendy nie ścigają się ze
+    sobą ani z przejściami między utworami.
+    """
+
+    def __init__(self, cog, guild):
+        self.cog = cog
+        self.guild = guild
+        self.guild_id = guild.id
+        self.ctx = None  # Kontekst ostatniej komendy - do wysyłania wiadomości
+        self.loop = asyncio.get_running_loop()
+        self.commands = asyncio.Queue()
+
+        # Numer bieżącego odtwarzania - pozwala odrzucić spóźnione sygnały zakończenia
+        self.generation = 0
+        self.track_ended_at = None
+        self.skip_repeat = False  # Następne przejście ma pominąć powtarzanie utworu (skip, play_now)
+
+        self.refresh = None  # (utwór, zadanie) odświeżania adresu strumienia
+        self.prefetch_task = None
+        self.prefetched = None  # (utwór, źródło) przygotowane z wyprzedzeniem
+        self.loop_buffer = None  # (utwór, ramki PCM) do zapętlania w trybie powtarzania utworu
+        self.downloads = {}  # id filmu -> zadanie pobierania w tle do cache audio
+        self.announcements = set()  # Zadania wysyłania informacji o utworze - referencje chronią je przed GC
+
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def queue(self):
+        return self.cog._get_queue(self.guild_id)
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    @property
+    def repeat_mode(self):
+        return self.cog.repeat_mode.get(self.guild_id, 0)
+
+    def is_alive(self):
+        """Sprawdza, czy zadanie odtwarzacza nadal działa"""
+        return not self._closed and not self._task.done()
+
+    def is_idle(self):
+        """Sprawdza, czy bot jest połączony i nic nie odtwarza"""
+        voice_client = self.voice_client
+        return (
+            voice_client is not None and voice_client.is_connected() and
+            not (voice_client.is_playing() or voice_client.is_paused())
+        )
+
+    async def call(self, command, *args):
+        """
+        Zleca polecenie odtwarzaczowi i czeka na jego wynik.
+
+        Args:
+            command: Nazwa polecenia (metoda _cmd_<nazwa>)
+            *args: Argumenty polecenia
+
+        Returns:
+            Wynik polecenia
+
+        Raises:
+            asyncio.CancelledError: Odtwarzacz został zamknięty przed wykonaniem polecenia
+        """
+        future = self.loop.create_future()
+        if self._closed:
+            future.cancel()
+        else:
+            self.commands.put_nowait((command, args, future))
+        return await future
+
+    def post(self, command, *args):
+        """Zleca polecenie bez czekania na wynik - można wywołać z dowolnego wątku"""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.commands.put_nowait, (command, args, None))
+
+    def close(self):
+        """Zatrzymuje zadanie odtwarzacza i zwalnia przygotowane zasoby"""
+        self._closed = True
+        self._task.cancel()
+
+        # Polecenia czekające w kolejce nie zostaną wykonane - nie mogą zawiesić wywołań call()
+        while not self.commands.empty():
+            _, _, future = self.commands.get_nowait()
+            if future and not future.done():
+                future.cancel()
+
+        self.loop_buffer = None
+        self._discard_prefetch()
+        if self.refresh and not self.refresh[1].done():
+            self.refresh[1].cancel()
+        self.refresh = None
+        for task in self.downloads.values():
+            task.cancel()
+        self.downloads.clear()
+        for task in self.announcements:
+            task.cancel()
+        self.announcements.clear()
+
+    async def _run(self):
+        """Pętla odtwarzacza - wykonuje polecenia po kolei"""
+        while True:
+            command, args, future = await self.commands.get()
+            try:
+                result = await getattr(self, f'_cmd_{command}')(*args)
+            except asyncio.CancelledError:
+                if future and not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Błąd polecenia odtwarzacza '{command}' w {self.guild_id}: {e}")
+                if future and not future.done():
+                    future.set_exception(e)
+                else:
+                    traceback.print_exc()
+            else:
+                if future and not future.done():
+                    future.set_result(result)
+
+    # Polecenia
+
+    async def _cmd_play_next(self, ctx):
+        """Rozpoczyna odtwarzanie kolejki, jeśli nic nie jest odtwarzane"""
+        self.ctx = ctx
+        if self.is_idle():
+            await self._play_next()
+
+    async def _cmd_enqueue(self, ctx, tracks, check_duplicates=True):
+        """
+        Dodaje utwory na koniec kolejki i rozpoczyna odtwarzanie, jeśli nic nie gra.
+
+        Args:
+            ctx: Kontekst komendy
+            tracks: Lista utworów (QueuedTrack)
+            check_duplicates: Czy zastosować politykę duplikatów serwera
+                (False, jeśli wywołujący już ją zastosował)
+
+        Returns:
+            tuple: (pozycja pierwszego dodanego utworu w kolejce, 0 jeśli od razu jest
+                odtwarzany lub None, jeśli wszystkie utwory pominięto jako duplikaty;
+                liczba duplikatów)
+        """
+        self.ctx = ctx
+        duplicates = 0
+        if check_duplicates:
+            policy = self.cog.duplicate_policy.get(self.guild_id, DUPLICATE_POLICY)
+            tracks, duplicates = apply_duplicate_policy(self.queue, tracks, policy)
+            if not tracks:
+                return None, duplicates
+
+        position = len(self.queue) + 1
+        self.queue.extend(tracks)
+
+        if self.is_idle():
+            await self._play_next()
+            return 0, duplicates
+        self._schedule_downloads()
+        return position, duplicates
+
+    async def _cmd_play_now(self, ctx, track):
+        """Odtwarza utwór natychmiast, przerywając bieżący (reszta kolejki pozostaje)"""
+        self.ctx = ctx
+        self.queue.insert(0, track)
+
+        voice_client = self.voice_client
+        if voice_client and (voice_client.is_playing() or voice_client.is_paused()):
+            # Sygnał zakończenia bieżącego utworu uruchomi dodany utwór (a nie powtórzy bieżący)
+            self.skip_repeat = True
+            self._stop_current()
+        else:
+            await self._play_next()
+
+    async def _cmd_skip(self, ctx):
+        """
+        Pomija bieżący utwór.
+
+        Returns:
+            bool: Czy było co pominąć
+        """
+        self.ctx = ctx
+        voice_client = self.voice_client
+        if not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            return False
+        # Pominięcie ma przejść do następnego utworu także w trybie powtarzania utworu
+        self.skip_repeat = True
+        self._stop_current()
+        return True
+
+    async def _cmd_stop(self, ctx):
+        """Czyści kolejkę i zatrzymuje odtwarzanie"""
+        self.ctx = ctx
+        self.queue.clear()
+        self._discard_prefetch()
+        self._queue_changed()
+
+        # Bez bieżącego utworu i historii tryby powtarzania nie wznowią odtwarzania
+        self.cog.now_playing.pop(self.guild_id, None)
+        history = self.cog._queue_history.get(self.guild_id)
+        if history:
+            history.clear()
+        self.loop_buffer = None
+
+        if self.voice_client:
+            self._stop_current()
+
+    async def _cmd_remove(self, index):
+        """
+        Usuwa utwór z kolejki.
+
+        Args:
+            index: Pozycja utworu w kolejce (od 0)
+
+        Returns:
+            Optional[QueuedTrack]: Usunięty utwór lub None, jeśli pozycja jest niepoprawna
+        """
+        if not 0 <= index < len(self.queue):
+            return None
+        track = self.queue.remove_at(index)
+        self._queue_changed()
+        return track
+
+    async def _cmd_move(self, source, target):
+        """
+        Przenosi utwór na inną pozycję w kolejce.
+
+        Args:
+            source: Obecna pozycja utworu (od 0)
+            target: Nowa pozycja utworu (od 0)
+
+        Returns:
+            Optional[QueuedTrack]: Przeniesiony utwór lub None, jeśli pozycje są niepoprawne
+        """
+        length = len(self.queue)
+        if not (0 <= source < length and 0 <= target < length):
+            return None
+        track = self.queue.move(source, target)
+        self._queue_changed()
+        return track
+
+    async def _cmd_shuffle(self):
+        """
+        Miesza kolejkę.
+
+        Returns:
+            int: Liczba pomieszanych utworów
+        """
+        self.queue.shuffle()
+        self._queue_changed()
+        return len(self.queue)
+
+    async def _cmd_clear_queue(self):
+        """
+        Czyści kolejkę, nie przerywając bieżącego utworu.
+
+        Returns:
+            int: Liczba usuniętych utworów
+        """
+        count = len(self.queue)
+        self.queue.clear()
+        self._queue_changed()
+        return count
+
+    async def _cmd_restore(self, ctx, tracks):
+        """
+        Przywraca kolejkę zapisanej sesji i rozpoczyna odtwarzanie.
+
+        Returns:
+            int: Liczba utworów w przywróconej kolejce
+        """
+        self.ctx = ctx
+        self.queue.replace(tracks)
+        if tracks and self.is_idle():
+            await self._play_next()
+        else:
+            self._queue_changed()
+        return len(tracks)
+
+    async def _cmd_volume(self, volume):
+        """Ustawia głośność bieżącego źródła (kolejne źródła biorą ją z ustawień serwera)"""
+        voice_client = self.voice_client
+        if voice_client and voice_client.source:
+            voice_client.source.volume = volume
+
+    async def _cmd_track_finished(self, generation, error, ended_at):
+        """Obsługuje sygnał zakończenia utworu z wątku odtwarzania"""
+        # Sygnał od utworu, który został już zastąpiony - ignoruj
+        if generation != self.generation:
+            return
+
+        if error is not None:
+            logger.error(f"Błąd odtwarzacza w {self.guild_id}: {error}")
+
+        self.track_ended_at = ended_at
+        await self._play_next()
+
+    # Odtwarzanie
+
+    def _after_callback(self, generation):
+        """
+        Tworzy funkcję `after` dla voice_client.play.
+
+        Wątek odtwarzacza discord.py tylko zleca polecenie zakończenia utworu
+        i nie czeka na pętlę zdarzeń.
+        """
+        def after(error):
+            self.post('track_finished', generation, error, time.perf_counter())
+        return after
+
+    def _stop_current(self):
+        """Kończy bieżący utwór - po płynnym wyciszeniu, jeśli to możliwe"""
+        voice_client = self.voice_client
+        source = voice_client.source
+
+        # Wstrzymany utwór nie odczyta ramek wyciszenia - zatrzymaj od razu
+        if voice_client.is_playing() and isinstance(source, YTDLSource) and source.fade_out(FADE_MS):
+            return
+        voice_client.stop()
+
+    def _start(self, player, prefetched=False):
+        """Uruchamia źródło na voice cliencie i mierzy przerwę od poprzedniego utworu"""
+        self.generation += 1
+        voice_client = self.voice_client
+
+        # discord.py tworzy enkoder tylko dla źródeł PCM - źródło Opus może jednak
+        # w trakcie utworu przejść na PCM (zmiana głośności), więc enkoder musi już istnieć
+        if player.is_opus() and not voice_client.encoder:
+            voice_client.encoder = discord.opus.Encoder()
+
+        voice_client.play(player, after=self._after_callback(self.generation))
+        voice_client._start_time = time.time()  # Zapisz czas rozpoczęcia
+
+        if self.track_ended_at is not None:
+            transition_stats.record(time.perf_counter() - self.track_ended_at, prefetched)
+            self.track_ended_at = None
+
+    def _start_or_cleanup(self, player, prefetched=False):
+        """
+        Uruchamia źródło, a jeśli się nie da - zamyka je (proces FFmpeg) i zapomina.
+
+        Returns:
+            bool: True, jeśli odtwarzanie się rozpoczęło
+        """
+        try:
+            self._start(player, prefetched)
+            return True
+        except Exception as e:
+            logger.error(f"Nie udało się rozpocząć odtwarzania {player.title} w {self.guild_id}: {e}")
+            self.cog.now_playing.pop(self.guild_id, None)
+            player.cleanup()
+            return False
+
+    def _announce(self):
+        """Wysyła informacje o odtwarzanym utworze, nie wstrzymując odtwarzacza"""
+        if self.ctx is not None and self.cog.command_channels.get(self.guild_id):
+            task = asyncio.create_task(self.cog._send_now_playing_embed(self.ctx))
+            self.announcements.add(task)
+            task.add_done_callback(self._announcement_done)
+
+    def _announcement_done(self, task):
+        """Zapomina zakończone zadanie wysyłania informacji i loguje jego błąd"""
+        self.announcements.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Nie udało się wysłać informacji o utworze w {self.guild_id}: {task.exception()}")
+
+    async def _replay_source(self, current):
+        """
+        Tworzy nowe źródło dla ponownie odtwarzanego utworu (tryb powtarzania utworu).
+
+        Krótki utwór odtworzony w całości jest zapętlany z ramek zapisanych
+        w pamięci; w pozostałych przypadkach powstaje nowy proces FFmpeg
+        z zapamiętanego adresu strumienia - bez ponownej ekstrakcji, chyba że
+        adres wygasł.
+
+        Args:
+            current: Źródło, którego odtwarzanie właśnie się zakończyło
+
+        Returns:
+            YTDLSource: Nowe źródło tego samego utworu
+        """
+        track = current.track
+        volume = current.volume
+
+        frames = current.recorded_frames()
+        if frames:
+            self.loop_buffer = (track, frames)
+        elif self.loop_buffer and self.loop_buffer[0] is not track:
+            self.loop_buffer = None
+
+        if self.loop_buffer:
+            return YTDLSource.from_frames(track, self.loop_buffer[1], volume=volume)
+
+        await self._ensure_fresh_stream(track)
+        player = YTDLSource.from_track(track, volume=volume)
+        self._record_if_looping(player)
+        return player
+
+    def _record_if_looping(self, player):
+        """Włącza zapis ramek do pamięci, jeśli utwór będzie zapętlany i jest dość krótki"""
+        duration = player.track.duration_raw
+        if self.repeat_mode == 1 and LOOP_BUFFER_SECONDS > 0 and 0 < duration <= LOOP_BUFFER_SECONDS:
+            # 50 ramek na sekundę + zapas na niedokładny czas trwania
+            player.start_recording((duration + 5) * 50)
+
+    def _remember_played(self, track):
+        """Dopisuje utwór do historii serwera - bufora cyklicznego o rozmiarze QUEUE_HISTORY_SIZE"""
+        if QUEUE_HISTORY_SIZE <= 0:
+            return
+        history = self.cog._queue_history.get(self.guild_id)
+        if history is None:
+            history = self.cog._queue_history[self.guild_id] = deque(maxlen=QUEUE_HISTORY_SIZE)
+        history.append(track)
+
+    async def _play_next(self):
+        """Odtwarza następny utwór w kolejce"""
+        guild_id = self.guild_id
+        voice_client = self.voice_client
+
+        # Jeśli głos nie jest połączony, zakończ
+        if not voice_client or not voice_client.is_connected():
+            return
+
+        skip_repeat, self.skip_repeat = self.skip_repeat, False
+
+        # Jeśli powtarzamy bieżący utwór (repeat_mode == 1) i coś jest odtwarzane
+        if self.repeat_mode == 1 and not skip_repeat and self.cog.now_playing.get(guild_id):
+            # Poprzednie źródło jest wyczerpane - odtwórz utwór od nowa z nowego źródła
+            current = self.cog.now_playing[guild_id]
+            try:
+                player = await self._replay_source(current)
+            except Exception as e:
+                logger.error(f"Nie udało się ponownie odtworzyć {current.title}: {e}")
+                self.cog.now_playing.pop(guild_id, None)
+                return await self._play_next()
+
+            self.cog.now_playing[guild_id] = player
+            if not self._start_or_cleanup(player):
+                return
+            self._announce()
+
+        # Jeśli kolejka jest pusta
+        elif not self.queue:
+            history = self.cog._queue_history.get(guild_id)
+
+            # Jeśli powtarzamy całą kolejkę (repeat_mode == 2) i mamy historię
+            if self.repeat_mode == 2 and history:
+                # Utwory z historii to same metadane - adresy strumieni zostaną
+                # odświeżone przed odtworzeniem, jeśli zdążyły wygasnąć
+                self.queue.replace(history)
+                history.clear()
+
+                # Kontynuuj odtwarzanie od początku kolejki
+                return await self._play_next()
+
+            # Koniec odtwarzania - nie ma już czego przygotowywać ani mierzyć
+            self.track_ended_at = None
+            self._discard_prefetch()
+
+            # Rozpocznij licznik nieaktywności
+            if self.ctx is not None:
+                await self.cog._start_inactivity_timer(self.ctx)
+        else:
+            # Pobierz następny utwór
+            track = self.queue.popleft()
+
+            # Zapisz utwór do historii (dla powtarzania całej kolejki)
+            self._remember_played(track)
+
+            # Użyj źródła przygotowanego z wyprzedzeniem, jeśli dotyczy tego utworu
+            player = self._take_prefetched(track)
+            prefetched = player is not None
+            if prefetched:
+                player.volume = await self.cog._get_volume(guild_id)
+            else:
+                # Odśwież adres strumienia, jeśli wygasł podczas oczekiwania w kolejce
+                await self._ensure_fresh_stream(track)
+
+                # Utwórz źródło audio (proces FFmpeg) dopiero teraz, tuż przed odtworzeniem
+                try:
+                    player = YTDLSource.from_track(track, volume=await self.cog._get_volume(guild_id))
+                except Exception as e:
+                    logger.error(f"Nie udało się utworzyć źródła audio dla {track.title}: {e}")
+                    return await self._play_next()
+
+            # Nowy utwór - bufor pętli poprzedniego nie jest już potrzebny
+            self.loop_buffer = None
+            self._record_if_looping(player)
+            player.fade_in(FADE_MS)
+
+            # Zapisz utwór jako obecnie odtwarzany i odtwórz
+            self.cog.now_playing[guild_id] = player
+            if not self._start_or_cleanup(player, prefetched):
+                return
+
+            # Przygotuj adres strumienia kolejnego utworu, zanim wygaśnie,
+            # a pod koniec bieżącego - cały następny utwór
+            self._schedule_stream_refresh()
+            self._schedule_prefetch()
+            self._schedule_downloads()
+
+            self._announce()
+
+    # Odświeżanie wygasających adresów strumieni
+
+    async def _refresh_track(self, track, priority=PRIORITY_BACKGROUND):
+        """Odświeża adres strumienia utworu, nie przerywając odtwarzania w razie błędu"""
+        try:
+            await YTDLSource.refresh_track(track, loop=self.loop, priority=priority, guild_id=self.guild_id)
+
+            # Odświeżenie mogło uzupełnić czas trwania utworu wciąż czekającego w kolejce
+            self.queue.update_duration(track)
+        except Exception as e:
+            logger.warning(f"Nie udało się odświeżyć adresu strumienia dla {track.title}: {e}")
+
+    def _schedule_stream_refresh(self):
+        """Odświeża w tle adres strumienia następnego utworu, zanim ten wygaśnie"""
+        if not self.queue:
+            return
+
+        track = self.queue[0]
+
+        # Utwór z lokalnego cache audio nie potrzebuje adresu strumienia
+        if audio_cache.has(track.id):
+            return
+
+        # Następny utwór zacznie się najwcześniej po zakończeniu bieżącego
+        current = self.cog.now_playing.get(self.guild_id)
+        margin = STREAM_URL_REFRESH_MARGIN + (current.duration_raw if current else 0)
+        if not track.is_stale(margin):
+            return
+
+        # Nie uruchamiaj drugiego odświeżania, jeśli poprzednie jeszcze trwa
+        if self.refresh and not self.refresh[1].done():
+            return
+
+        self.refresh = (track, asyncio.create_task(self._refresh_track(track)))
+
+    async def _ensure_fresh_stream(self, track, priority=PRIORITY_INTERACTIVE):
+        """Dba o to, by utwór miał ważny adres strumienia tuż przed odtworzeniem"""
+        # Utwór z lokalnego cache audio zostanie odtworzony z dysku
+        if audio_cache.has(track.id):
+            return
+
+        # Jeśli odświeżanie w tle dotyczy tego utworu, poczekaj na jego wynik
+        if self.refresh and self.refresh[0] is track:
+            refresh, self.refresh = self.refresh, None
+            await refresh[1]
+
+        if track.is_stale():
+            await self._refresh_track(track, priority)
+
+    # Przygotowywanie następnego utworu przed końcem bieżącego
+
+    async def _prefetch_next(self, delay):
+        """
+        Po upływie `delay` sekund przygotowuje pierwszy utwór z kolejki.
+
+        Odświeża adres strumienia, uruchamia FFmpeg i wczytuje początek utworu,
+        tak aby _play_next mógł przełączyć źródło bez przerwy.
+
+        Args:
+            delay: Czas oczekiwania w sekundach
+        """
+        source = None
+        try:
+            await asyncio.sleep(delay)
+
+            if not self.queue:
+                return
+            track = self.queue[0]
+
+            await self._ensure_fresh_stream(track, PRIORITY_BACKGROUND)
+            source = YTDLSource.from_track(track, volume=await self.cog._get_volume(self.guild_id))
+            frames = await self.loop.run_in_executor(None, source.prebuffer)
+
+            self.prefetched = (track, source)
+            source = None
+            logger.debug(f"Przygotowano następny utwór w {self.guild_id}: {track.title} ({frames} ramek)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Nie udało się przygotować następnego utworu w {self.guild_id}: {e}")
+        finally:
+            # Źródło, które nie trafiło do self.prefetched, trzeba zamknąć
+            if source is not None:
+                source.cleanup()
+
+    def _schedule_prefetch(self):
+        """Planuje przygotowanie następnego utworu na PREFETCH_SECONDS przed końcem bieżącego"""
+        self._discard_prefetch()
+
+        current = self.cog.now_playing.get(self.guild_id)
+        if PREFETCH_SECONDS <= 0 or not current or not current.duration_raw:
+            return
+
+        delay = max(0, current.duration_raw - PREFETCH_SECONDS)
+        self.prefetch_task = asyncio.create_task(self._prefetch_next(delay))
+
+    # Pobieranie najbliższych utworów do lokalnego cache audio
+
+    def _schedule_downloads(self):
+        """Uruchamia w tle pobieranie PREDOWNLOAD_TRACKS najbliższych utworów z kolejki"""
+        if PREDOWNLOAD_TRACKS <= 0:
+            return
+
+        for track in self.queue.page(0, PREDOWNLOAD_TRACKS):
+            if track.id is None or track.id in self.downloads or audio_cache.has(track.id):
+                continue
+            self.downloads[track.id] = asyncio.create_task(self._download(track))
+
+    async def _download(self, track):
+        """
+        Czeka na pobranie utworu do cache audio.
+
+        Do czasu zakończenia pobierania utwór jest odtwarzany ze strumienia.
+        Jeśli pobieranie skończy się po przygotowaniu strumienia dla tego
+        utworu, przygotowane źródło jest zastępowane plikiem z dysku.
+
+        Args:
+            track: Utwór z kolejki
+        """
+        try:
+            # Zadanie pobierania jest wspólne dla serwerów - anulowanie nie może go przerwać
+            data, _ = await asyncio.shield(YTDLSource.download_track(track, loop=self.loop, guild_id=self.guild_id))
+            logger.info(f"Pobrano do cache audio w {self.guild_id}: {track.title}")
+
+            # Głośność zmierzona po pobraniu - korekta obejmie to odtworzenie
+            if data.get('loudness') is not None:
+                track.loudness = data['loudness']
+
+            if self.prefetched and self.prefetched[0] is track:
+                self._discard_prefetch()
+                self.prefetch_task = asyncio.create_task(self._prefetch_next(0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Nie udało się pobrać {track.title}, zostaje strumień: {e}")
+        finally:
+            self.downloads.pop(track.id, None)
+
+    def _take_prefetched(self, track):
+        """
+        Zwraca przygotowane źródło, jeśli dotyczy podanego utworu.
+
+        Args:
+            track: Utwór, który ma zostać odtworzony
+
+        Returns:
+            Optional[YTDLSource]: Gotowe źródło lub None
+        """
+        entry, self.prefetched = self.prefetched, None
+        if entry is None:
+            return None
+        prefetched_track, source = entry
+        if prefetched_track is track:
+            return source
+
+        # Kolejka zmieniła się od czasu przygotowania - źródło jest bezużyteczne
+        source.cleanup()
+        return None
+
+    def _queue_changed(self):
+        """
+        Dostosowuje zadania w tle do zmienionej kolejki.
+
+        Przygotowane źródło innego utworu niż pierwszy w kolejce jest zamykane
+        (i przygotowywane od nowa), a pobierania utworów, które wypadły
+        z początku kolejki, są przerywane.
+        """
+        if self.prefetched and (not self.queue or self.prefetched[0] is not self.queue[0]):
+            self._discard_prefetch()
+            current = self.cog.now_playing.get(self.guild_id)
+            if self.queue and PREFETCH_SECONDS > 0 and current and current.duration_raw:
+                remaining = current.duration_raw - current.position
+                self.prefetch_task = asyncio.create_task(self._prefetch_next(max(0, remaining - PREFETCH_SECONDS)))
+
+        upcoming = {track.id for track in self.queue.page(0, PREDOWNLOAD_TRACKS)}
+        for video_id, task in list(self.downloads.items()):
+            if video_id in upcoming:
+                continue
+            task.cancel()
+            del self.downloads[video_id]
+            # Pobieranie jest wspólne - przerywamy je, tylko jeśli nie czeka na nie inny serwer
+            if not any(video_id in player.downloads for player in self.cog.players.values()):
+                YTDLSource.cancel_download(video_id)
+
+        self._schedule_stream_refresh()
+        self._schedule_downloads()
+
+    def _discard_prefetch(self):
+        """Anuluje przygotowywanie następnego utworu i zamyka przygotowane źródło"""
+        if self.prefetch_task and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
+        entry, self.prefetched = self.prefetched, None
+        if entry is not None:
+            entry[1].cleanup()
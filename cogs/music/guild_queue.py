@@ -0,0 +1,234 @@
+import random
+from collections import Counter, deque
+from itertools import islice
+
+
+def track_key(track):
+    """Klucz utworu w indeksie duplikatów - id filmu lub link"""
+    return track.id or track.url
+
+
+def requester_key(track):
+    """Klucz użytkownika, który dodał utwór (None, jeśli nieznany)"""
+    return track.requester.id if track.requester is not None else None
+
+
+def apply_duplicate_policy(queue, items, policy, key=track_key):
+    """
+    Wybiera elementy do dodania zgodnie z polityką duplikatów.
+
+    Duplikatem jest element, który już jest w kolejce albo wcześniej
+    na liście dodawanych elementów.
+
+    Args:
+        queue: Kolejka serwera (GuildQueue)
+        items: Dodawane elementy (utwory lub wpisy playlisty)
+        policy: Polityka duplikatów - allow, skip lub warn
+        key: Funkcja zwracająca klucz elementu w indeksie duplikatów
+
+    Returns:
+        tuple: (elementy do dodania, liczba znalezionych duplikatów)
+    """
+    selected = []
+    seen = set()
+    duplicates = 0
+    for item in items:
+        item_key = key(item)
+        if item_key in seen or queue.has(item_key):
+            duplicates += 1
+            if policy == 'skip':
+                continue
+        seen.add(item_key)
+        selected.append(item)
+    return selected, duplicates
+
+
+class GuildQueue:
+    """
+    Kolejka utworów jednego serwera.
+
+    Oparta na deque, więc pobranie następnego utworu (popleft) i dodanie na
+    końcu lub początku działa w O(1), a operacje na pozycji w środku kosztują
+    O(min(i, n-i)). Kolejka utrzymuje indeks id filmów (do sprawdzania
+    duplikatów w O(1)), łączny czas trwania utworów oraz liczbę utworów
+    dodanych przez każdego użytkownika - wszystko aktualizowane przyrostowo,
+    więc odczyt sum nie wymaga przechodzenia po kolejce.
+    """
+
+    def __init__(self, tracks=()):
+        self._tracks = deque()
+        self._keys = Counter()
+        self._requesters = Counter()
+        # id(obiekt utworu) -> (klucz i czas trwania przy dodaniu, liczba wystąpień) - metadane
+        # utworu mogą się zmienić w kolejce, więc przy usuwaniu liczy się stan z dodania
+        self._entries = {}
+        self.total_duration = 0
+        self.version = 0  # Zwiększana przy każdej zmianie - do unieważniania cache widoków
+        self.extend(tracks)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __bool__(self):
+        return bool(self._tracks)
+
+    def __iter__(self):
+        return iter(self._tracks)
+
+    def __getitem__(self, index):
+        return self._tracks[index]
+
+    def _discard_key(self, key, count=1):
+        """Zmniejsza licznik klucza w indeksie duplikatów"""
+        self._keys[key] -= count
+        if self._keys[key] <= 0:
+            del self._keys[key]
+
+    def _added(self, track):
+        """Aktualizuje indeks i liczniki po dodaniu utworu"""
+        key, duration, count = self._entries.get(id(track), (track_key(track), track.duration_raw, 0))
+        self._entries[id(track)] = (key, duration, count + 1)
+        self._keys[key] += 1
+        self._requesters[requester_key(track)] += 1
+        self.total_duration += duration
+        self.version += 1
+
+    def _removed(self, track):
+        """Aktualizuje indeks i liczniki po usunięciu utworu"""
+        key, duration, count = self._entries.pop(id(track))
+        if count > 1:
+            self._entries[id(track)] = (key, duration, count - 1)
+        self._discard_key(key)
+        requester = requester_key(track)
+        self._requesters[requester] -= 1
+        if self._requesters[requester] <= 0:
+            del self._requesters[requester]
+        self.total_duration -= duration
+        self.version += 1
+
+    def append(self, track):
+        """Dodaje utwór na końcu kolejki"""
+        self._tracks.append(track)
+        self._added(track)
+
+    def extend(self, tracks):
+        """Dodaje wiele utworów na końcu kolejki"""
+        for track in tracks:
+            self.append(track)
+
+    def insert(self, index, track):
+        """Wstawia utwór na podanej pozycji (0 - na początek kolejki w O(1), w środku O(min(i, n-i)))"""
+        if index == 0:
+            self._tracks.appendleft(track)
+        else:
+            self._tracks.insert(index, track)
+        self._added(track)
+
+    def popleft(self):
+        """Usuwa i zwraca następny utwór w kolejce"""
+        track = self._tracks.popleft()
+        self._removed(track)
+        return track
+
+    def remove_at(self, index):
+        """Usuwa i zwraca utwór z podanej pozycji - O(min(i, n-i)), bo deque przesuwa elementy"""
+        track = self._tracks[index]
+        del self._tracks[index]
+        self._removed(track)
+        return track
+
+    def move(self, from_index, to_index):
+        """
+        Przenosi utwór na inną pozycję w kolejce.
+
+        Kosztuje O(min(i, n-i)) dla każdej z obu pozycji (usunięcie i wstawienie
+        w deque); indeks duplikatów i sumy nie są przeliczane.
+
+        Args:
+            from_index: Obecna pozycja utworu (od 0)
+            to_index: Docelowa pozycja utworu (od 0)
+
+        Returns:
+            Przeniesiony utwór
+        """
+        track = self._tracks[from_index]
+        del self._tracks[from_index]
+        self._tracks.insert(to_index, track)
+        self.version += 1
+        return track
+
+    def shuffle(self):
+        """Miesza kolejność utworów (zawartość i indeks pozostają bez zmian)"""
+        tracks = list(self._tracks)
+        random.shuffle(tracks)
+        self._tracks = deque(tracks)
+        self.version += 1
+
+    def clear(self):
+        """Czyści kolejkę"""
+        self._tracks.clear()
+        self._keys.clear()
+        self._requesters.clear()
+        self._entries.clear()
+        self.total_duration = 0
+        self.version += 1
+
+    def replace(self, tracks):
+        """Zastępuje całą zawartość kolejki podanymi utworami"""
+        self.clear()
+        self.extend(tracks)
+
+    def update_duration(self, track):
+        """
+        Uwzględnia zmianę metadanych utworu po pobraniu pełnych informacji.
+        
+        Aktualizuje łączny czas trwania oraz klucz w indeksie duplikatów
+        (wpis playlisty bez id jest indeksowany linkiem, dopóki id nie będzie znane).
+        
+        Args:
+            track: Utwór, którego metadane zostały odświeżone
+        """
+        recorded = self._entries.get(id(track))
+        if recorded is None:
+            return
+        key, duration, count = recorded
+        new_key = track_key(track)
+        if new_key != key:
+            self._discard_key(key, count)
+            self._keys[new_key] += count
+        self.total_duration += (track.duration_raw - duration) * count
+        self._entries[id(track)] = (new_key, track.duration_raw, count)
+        self.version += 1
+
+    def has(self, key):
+        """Sprawdza w O(1), czy utwór o danym id (lub linku) jest w kolejce"""
+        return self._keys.get(key, 0) > 0
+
+    def requester_count(self, user_id):
+        """Zwraca liczbę utworów w kolejce dodanych przez użytkownika"""
+        return self._requesters.get(user_id, 0)
+
+    def format_total_duration(self):
+        """Formatuje łączny czas trwania kolejki, np. '1h 5m 3s'"""
+        minutes, seconds = divmod(self.total_duration, 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours > 0:
+            return f"{hours}h {minutes}m {seconds}s"
+        return f"{minutes}m {seconds}s"
+
+    def page(self, start, count):
+        """
+        Zwraca fragment kolejki bez kopiowania całości.
+
+        Args:
+            start: Indeks pierwszego utworu
+            count: Maksymalna liczba utworów
+
+        Returns:
+            List: Utwory z pozycji [start, start + count)
+        """
+        return list(islice(self._tracks, start, start + count))
+
+    def copy(self):
+        """Zwraca listę utworów w kolejce (migawka, np. do zapisania sesji)"""
+        return list(self._tracks)
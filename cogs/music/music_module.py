@@ -5,8 +5,7 @@ from .queue_manager import setup_queue_commands
 from .ui import setup_ui_commands
 from .utils import is_dj  # Dodaj ten import
 from utils.logger import get_logger
-import asyncio
-from config import PREFIX, DJ_ROLE_ENABLED
+from config import PREFIX, DJ_ROLE_ENABLED, DEFAULT_VOLUME
 
 # Inicjalizacja loggera
 logger = get_logger()
@@ -16,8 +15,9 @@ class Music(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.volume_value = 0.5
+        self.volume_value = DEFAULT_VOLUME
         self.queues = {}
+        self.duplicate_policy = {}
         self.now_playing = {}
         
         # Inicjalizacja kolekcji
@@ -27,6 +27,7 @@ class Music(commands.Cog):
         self.repeat_mode = {}
         self.volume_settings = {}
         self._queue_history = {}
+        self.players = {}
         self.last_np_message = {}
         
         # Dodawanie komend z różnych modułów - najpierw ui, potem player
@@ -49,6 +50,10 @@ class Music(commands.Cog):
     async def play_command(self, ctx, *, query=None):
         await self.play(ctx, query=query)
 
+    @commands.command(name="playlist", aliases=["pl", "playlista"], help="Dodaje całą playlistę YouTube do kolejki")
+    async def playlist_command(self, ctx, *, url):
+        await self.playlist(ctx, url=url)
+
     @commands.command(name="pause", aliases=["pauza", "wstrzymaj"], help="Wstrzymuje odtwarzanie")
     @is_dj()
     async def pause_command(self, ctx):
@@ -135,36 +140,17 @@ class Music(commands.Cog):
                     await ctx.send("Musisz być na kanale głosowym!")
                     return
                     
-            # Bezpośrednio pobierz i odtwórz utwór bez używania kolejki
+            # Pobierz utwór i odtwórz go od razu, przed resztą kolejki
             await ctx.send("🔍 Wyszukuję utwór...")
             
             from utils.helpers import YTDLSource
             
-            # Użyj streamowania
-            source = await YTDLSource.from_url(query, loop=self.bot.loop, stream=True)
-            await ctx.send(f"✅ Znaleziono: **{source.title}**")
-            
-            # Zdefiniuj prosty callback
-            def after_playback(error):
-                if error:
-                    print(f"TEST ERROR: {error}")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send(f"❌ Test error: {error}"), 
-                        self.bot.loop
-                    )
-                else:
-                    print("TEST: Playback completed normally")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send("✅ Test odtwarzania zakończony pomyślnie!"), 
-                        self.bot.loop
-                    )
+            track = await YTDLSource.create_track(query, loop=self.bot.loop, requester=ctx.author, guild_id=guild_id)
+            await ctx.send(f"✅ Znaleziono: **{track.title}**")
             
-            # Odtwórz utwór
+            # Odtwórz utwór przez odtwarzacz serwera
             await ctx.send("▶️ Rozpoczynam odtwarzanie testowe...")
-            ctx.voice_client.play(source, after=after_playback)
-            
-            # Ustaw głośność
-            ctx.voice_client.source.volume = 0.5
+            await self._get_player(ctx.guild).call('play_now', ctx, track)
             
         except Exception as e:
             await ctx.send(f"❌ Test error: {e}")
@@ -227,30 +213,23 @@ class Music(commands.Cog):
             
             await ctx.send(f"✅ Znaleziono film: {video_link}")
             
-            # Teraz odtwórz ten konkretny film
+            # Teraz dodaj ten konkretny film do kolejki
             from utils.helpers import YTDLSource
-            player = await YTDLSource.from_url(video_link, loop=self.bot.loop, stream=True)
+            track = await YTDLSource.create_track(
+                video_link, loop=self.bot.loop, requester=ctx.author, guild_id=ctx.guild.id
+            )
             
-            # Funkcja wywoływana po zakończeniu
-            def after_playback(error):
-                if error:
-                    print(f"Error in playback: {error}")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send(f"❌ Błąd odtwarzania: {error}"), 
-                        self.bot.loop
-                    )
-                else:
-                    print("Playback completed normally")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send("✅ Odtwarzanie zakończone"), 
-                        self.bot.loop
-                    )
-            
-            # Odtwórz utwór
-            ctx.voice_client.play(player, after=after_playback)
-            ctx.voice_client.source.volume = 0.5
-            
-            await ctx.send(f"▶️ Odtwarzam: **{player.title}**")
+            self.command_channels[ctx.guild.id] = ctx.channel
+            position, duplicates = await self._enqueue(ctx, [track])
+            if position is None:
+                await ctx.send(f"⏭️ **{track.title}** jest już w kolejce - pominięto")
+            elif position:
+                message = f"✅ Dodano do kolejki: **{track.title}** (pozycja {position})"
+                if duplicates:
+                    message += "\n⚠️ Ten utwór był już w kolejce"
+                await ctx.send(message)
+            else:
+                await ctx.send(f"▶️ Odtwarzam: **{track.title}**")
             
         except Exception as e:
             await ctx.send(f"❌ Błąd: {str(e)}")
@@ -2,13 +2,13 @@ import discord
 from discord.ext import commands
 from datetime import datetime, timedelta
 from utils.helpers import YTDLSource, YTDLError
+from utils.audio_cache import audio_cache, cleanup_temp_files
 from .utils import is_dj
 import asyncio
 import traceback
-import os
-import time
 import sys
 from config import INACTIVITY_TIMEOUT
+from .guild_player import GuildPlayer
 from utils.logger import get_logger
 
 # Inicjalizacja loggera
@@ -33,6 +33,9 @@ def setup_player_commands(cog):
     if not hasattr(cog, 'volume_settings'):
         cog.volume_settings = {}
     
+    if not hasattr(cog, 'players'):
+        cog.players = {}
+    
     # Definicja funkcji formatującej bajty
     def _format_bytes(size):
         """Formatuje bajty do czytelnej wielkości (KB, MB, GB)."""
@@ -62,95 +65,35 @@ def setup_player_commands(cog):
     # Definicja funkcji czyszczenia plików tymczasowych
     async def _cleanup_temp_files(hours=24):
         """
-        Czyści pliki tymczasowe, które są starsze niż określona liczba godzin,
-        z wyjątkiem plików, które są aktualnie odtwarzane.
+        Czyści cache audio i pliki tymczasowe (wspólna procedura z zadaniem okresowym w bot.py).
+        
+        Pliki odtwarzanych i kolejkowanych utworów są przypięte w cache audio
+        i nie zostaną usunięte.
         
         Args:
-            hours: Maksymalny wiek plików w godzinach
+            hours: Maksymalny wiek plików tymczasowych w godzinach
         """
         try:
-            temp_dir = 'temp'
-            
-            # Sprawdź czy katalog istnieje
-            if not os.path.exists(temp_dir):
-                os.makedirs(temp_dir)
-                logger.info(f"Utworzono katalog {temp_dir}")
-                return
-            
-            # Zbierz wszystkie aktualnie odtwarzane pliki ze wszystkich serwerów
-            active_files = set()  # Używaj set() dla szybszego sprawdzania członkostwa
-            
-            # Zbierz pliki z now_playing
-            for guild_now_playing in cog.now_playing.values():
-                if hasattr(guild_now_playing, 'filename'):
-                    active_files.add(guild_now_playing.filename)
-                if hasattr(guild_now_playing, 'original_file'):
-                    active_files.add(guild_now_playing.original_file)
-            
-            # Dodaj pliki z kolejek
-            for guild_queue in cog.queues.values():
-                for track in guild_queue:
-                    if hasattr(track, 'filename'):
-                        active_files.add(track.filename)
-                    if hasattr(track, 'original_file'):
-                        active_files.add(track.original_file)
-
-            # Debug info
-            logger.debug(f"Aktywne pliki, które nie będą usunięte: {active_files}")
-                    
-            current_time = time.time()
-            max_age_seconds = hours * 3600
-            
-            # Liczniki statystyk
-            removed_count = 0
-            error_count = 0
-            total_size_removed = 0
-            
-            # Przetwarzaj pliki w mniejszych porcjach, aby uniknąć blokowania pętli zdarzeń
-            files_to_process = os.listdir(temp_dir)
-            for i in range(0, len(files_to_process), 20):
-                batch = files_to_process[i:i+20]
-                
-                for filename in batch:
-                    file_path = os.path.join(temp_dir, filename)
-                    try:
-                        # Sprawdź czy to plik (nie katalog)
-                        if not os.path.isfile(file_path):
-                            continue
-                        
-                        # Sprawdź czy plik jest używany
-                        if file_path in active_files or filename in active_files:
-                            logger.debug(f"Pomijam aktywny plik: {file_path}")
-                            continue
-                        
-                        # Pobierz czas modyfikacji pliku
-                        file_modified_time = os.path.getmtime(file_path)
-                        file_age_seconds = current_time - file_modified_time
-                        
-                        # Jeśli plik jest starszy niż dozwolony wiek
-                        if file_age_seconds > max_age_seconds:
-                            # Pobierz rozmiar pliku przed usunięciem
-                            file_size = os.path.getsize(file_path)
-                            
-                            # Usuń plik
-                            os.unlink(file_path)
-                            
-                            # Aktualizuj statystyki
-                            removed_count += 1
-                            total_size_removed += file_size
-                    except Exception as e:
-                        error_count += 1
-                        logger.error(f"Błąd podczas próby usunięcia pliku {file_path}: {e}")
-                
-                # Po każdej porcji, daj czas na inne operacje asyncio
-                await asyncio.sleep(0.1)
+            removed_count, total_size_removed = await asyncio.get_running_loop().run_in_executor(
+                None, cleanup_temp_files, hours
+            )
             
-            # Zwróć statystyki
             human_readable_size = _format_bytes(total_size_removed)
-            logger.info(f"Czyszczenie plików tymczasowych: usunięto {removed_count} plików ({human_readable_size}), błędów: {error_count}")
+            logger.info(f"Czyszczenie plików tymczasowych: usunięto {removed_count} plików ({human_readable_size})")
         except Exception as e:
             logger.error(f"Błąd podczas czyszczenia plików tymczasowych: {e}")
     
+    # Utwory odtwarzane i czekające w kolejce nie mogą zniknąć z cache audio
+    def _pinned_tracks():
+        """Zwraca id filmów odtwarzanych i czekających w kolejkach wszystkich serwerów"""
+        pinned = {source.track.id for source in list(cog.now_playing.values()) if source}
+        for guild_queue in list(cog.queues.values()):
+            # Migawka - funkcja bywa wywoływana z wątku executora
+            pinned.update(track.id for track in guild_queue.copy())
+        return pinned
+    
+    audio_cache.set_pin_source(_pinned_tracks)
+    
     # Funkcja pomocnicza do czyszczenia plików
     async def cleanup_files():
         """Czyści pliki tymczasowe"""
@@ -193,9 +136,9 @@ def setup_player_commands(cog):
             # Ustaw podstawową wartość volume_value dla kompatybilności
             cog.volume_value = volume_float
             
-            # Ustaw głośność na aktualnym źródle dźwięku, jeśli istnieje
-            if ctx.voice_client and ctx.voice_client.source:
-                ctx.voice_client.source.volume = volume_float
+            # Ustaw głośność na aktualnym źródle dźwięku przez odtwarzacz serwera
+            if ctx.voice_client:
+                await _get_player(ctx.guild).call('volume', volume_float)
                 
             return True, None  # Sukces, brak błędu
         except ValueError:
@@ -204,65 +147,47 @@ def setup_player_commands(cog):
             traceback.print_exc()
             return False, f"Wystąpił błąd: {str(e)}"
     
-    # Uproszczona i poprawiona funkcja _play next
-
-    async def _play_next(ctx):
-        """Odtwarza następny utwór w kolejce"""
-        guild_id = ctx.guild.id
+    # Odtwarzacze serwerów
+    def _get_player(guild):
+        """
+        Zwraca odtwarzacz serwera, tworząc go (i jego zadanie) w razie potrzeby.
         
-        # Jeśli głos nie jest połączony, zakończ
-        if not ctx.voice_client or not ctx.voice_client.is_connected():
-            return
+        Args:
+            guild: Serwer Discord
+            
+        Returns:
+            GuildPlayer: Odtwarzacz serwera
+        """
+        player = cog.players.get(guild.id)
+        if player is None or not player.is_alive():
+            player = GuildPlayer(cog, guild)
+            cog.players[guild.id] = player
+        return player
+    
+    def _close_player(guild_id):
+        """Zatrzymuje odtwarzacz serwera (np. po opuszczeniu kanału)"""
+        player = cog.players.pop(guild_id, None)
+        if player is not None:
+            player.close()
+    
+    async def _play_next(ctx):
+        """Rozpoczyna odtwarzanie kolejki, jeśli nic nie jest odtwarzane"""
+        await _get_player(ctx.guild).call('play_next', ctx)
+    
+    async def _enqueue(ctx, tracks, check_duplicates=True):
+        """
+        Dodaje utwory do kolejki przez odtwarzacz serwera.
         
-        # Sprawdź tryb powtarzania
-        repeat_mode = cog.repeat_mode.get(guild_id, 0)
-        
-        # Jeśli powtarzamy bieżący utwór (repeat_mode == 1) i coś jest odtwarzane
-        if repeat_mode == 1 and guild_id in cog.now_playing and cog.now_playing[guild_id]:
-            # Odtwórz ponownie bieżący utwór
-            player = cog.now_playing[guild_id]
-            ctx.voice_client.play(player, after=lambda e: asyncio.run_coroutine_threadsafe(
-                _play_next(ctx), ctx.bot.loop).result() if e is None else print(f'Player error: {e}'))
-            ctx.voice_client._start_time = time.time()  # Zapisz czas rozpoczęcia
-            
-            # Wyślij informacje o powtarzanym utworze
-            channel = cog.command_channels.get(guild_id)
-            if channel:
-                await cog._send_now_playing_embed(ctx)  # Dodaj tę linię!
-                
-        # Jeśli kolejka jest pusta
-        elif guild_id not in cog.queues or not cog.queues[guild_id]:
-            # Jeśli powtarzamy całą kolejkę (repeat_mode == 2) i mamy historię
-            if repeat_mode == 2 and guild_id in cog._queue_history and cog._queue_history[guild_id]:
-                cog.queues[guild_id] = cog._queue_history[guild_id].copy()
-                cog._queue_history[guild_id] = []
-                
-                # Kontynuuj odtwarzanie od początku kolejki
-                return await _play_next(ctx)
-            else:
-                # Koniec odtwarzania, rozpocznij licznik nieaktywności
-                await cog._start_inactivity_timer(ctx)
-        else:
-            # Pobierz następny utwór
-            player = cog.queues[guild_id].pop(0)
-            
-            # Zapisz utwór do historii (dla powtarzania całej kolejki)
-            if guild_id not in cog._queue_history:
-                cog._queue_history[guild_id] = []
-            cog._queue_history[guild_id].append(player)
-            
-            # Zapisz utwór jako obecnie odtwarzany
-            cog.now_playing[guild_id] = player
-            
-            # Odtwórz utwór
-            ctx.voice_client.play(player, after=lambda e: asyncio.run_coroutine_threadsafe(
-                _play_next(ctx), ctx.bot.loop).result() if e is None else print(f'Player error: {e}'))
-            ctx.voice_client._start_time = time.time()  # Zapisz czas rozpoczęcia
-            
-            # Wyślij informacje o odtwarzanym utworze
-            channel = cog.command_channels.get(guild_id)
-            if channel:
-                await cog._send_now_playing_embed(ctx)  # Dodaj tę linię!
+        Args:
+            ctx: Kontekst komendy
+            tracks: Lista utworów (QueuedTrack)
+            check_duplicates: Czy zastosować politykę duplikatów serwera
+            
+        Returns:
+            tuple: (pozycja pierwszego utworu w kolejce, 0 jeśli od razu jest odtwarzany
+                lub None, jeśli utwory pominięto jako duplikaty; liczba duplikatów)
+        """
+        return await _get_player(ctx.guild).call('enqueue', ctx, tracks, check_duplicates)
 
     # Funkcja timera nieaktywności
     async def _start_inactivity_timer(self, ctx):
@@ -316,8 +241,9 @@ def setup_player_commands(cog):
                         logger.error(f"Błąd podczas rozłączania: {e}")
                     
                     # Czyścimy kolejkę i inne dane dla tego serwera
-                    if guild_id in self.queues:
-                        del self.queues[guild_id]
+                    self._close_player(guild_id)
+                    self.queues.pop(guild_id, None)
+                    self._queue_history.pop(guild_id, None)
                     if guild_id in self.now_playing:
                         del self.now_playing[guild_id]
                     
@@ -389,8 +315,8 @@ def setup_player_commands(cog):
                 
                 # Zapisz informacje tylko jeśli jest co zapisać
                 self.disconnected_sessions[guild_id] = {
-                    'now_playing': self.now_playing[guild_id],
-                    'queue': self.queues.get(guild_id, []).copy(), # Używamy copy aby uniknąć referencji
+                    'now_playing': self.now_playing[guild_id].track if self.now_playing.get(guild_id) else None,
+                    'queue': self.queues[guild_id].copy() if guild_id in self.queues else [], # Migawka, aby uniknąć referencji
                     'channel_id': before.channel.id,
                     'timestamp': datetime.now()
                 }
@@ -436,8 +362,9 @@ def setup_player_commands(cog):
         
         # Czyścimy dane dla tego serwera
         guild_id = ctx.guild.id
-        if guild_id in cog.queues:
-            del cog.queues[guild_id]
+        _close_player(guild_id)
+        cog.queues.pop(guild_id, None)
+        cog._queue_history.pop(guild_id, None)
         if guild_id in cog.now_playing:
             del cog.now_playing[guild_id]
         
@@ -447,7 +374,7 @@ def setup_player_commands(cog):
     # Komenda odtwarzania
     async def _play(self, ctx, *, query=None):
         """
-        Uproszczona wersja funkcji odtwarzania do debugowania.
+        Dodaje utwór do kolejki i rozpoczyna odtwarzanie, jeśli nic nie gra.
         
         Args:
             ctx: Kontekst komendy
@@ -470,55 +397,32 @@ def setup_player_commands(cog):
                 await ctx.send("⚠️ Podaj tytuł utworu lub link!")
                 return
             
-            # Zatrzymaj aktualnie odtwarzany dźwięk, jeśli istnieje
-            if ctx.voice_client.is_playing():
-                ctx.voice_client.stop()
-                await ctx.send("Zatrzymuję aktualnie odtwarzany utwór...")
+            # Zapisz kanał, na którym wywołano komendę
+            self.command_channels[guild_id] = ctx.channel
             
             # Wyszukiwanie
             await ctx.send(f"🔍 Wyszukuję: `{query}`...")
             
-            # Pobierz utwór
+            # Pobierz metadane utworu - źródło audio powstanie tuż przed odtworzeniem
             try:
-                from utils.helpers import YTDLSource
-                player = await YTDLSource.from_url(query, loop=self.bot.loop, stream=True)
-                await ctx.send(f"✅ Znaleziono: **{player.title}**")
+                track = await YTDLSource.create_track(query, loop=self.bot.loop, requester=ctx.author, guild_id=guild_id)
             except Exception as e:
+                logger.error(f"Błąd wyszukiwania '{query}': {e}")
                 await ctx.send(f"❌ Błąd wyszukiwania: {str(e)}")
-                import traceback
-                traceback.print_exc()
                 return
             
-            # Funkcja wywoływana po zakończeniu odtwarzania
-            def after_playing(error):
-                if error:
-                    print(f"ERROR in after_playing: {error}")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send(f"❌ Błąd odtwarzania: {error}"), 
-                        self.bot.loop
-                    )
-                else:
-                    print("Playback completed normally")
-                    asyncio.run_coroutine_threadsafe(
-                        ctx.send("✅ Odtwarzanie zakończone!"), 
-                        self.bot.loop
-                    )
-            
-            # Rozpocznij odtwarzanie
-            await ctx.send("▶️ Rozpoczynam odtwarzanie...")
-            ctx.voice_client.play(player, after=after_playing)
-            
-            # Ustaw głośność
-            ctx.voice_client.source.volume = 0.5
-            
-            # Zapisz informacje do kontekstu bota
-            self.now_playing[guild_id] = player
-            if guild_id not in self.queues:
-                self.queues[guild_id] = []
+            # Dodaj do kolejki przez odtwarzacz serwera
+            position, duplicates = await self._enqueue(ctx, [track])
+            if position is None:
+                await ctx.send(f"⏭️ **{track.title}** jest już w kolejce - pominięto")
+            elif position:
+                message = f"✅ Dodano do kolejki: **{track.title}** (pozycja {position})"
+                if duplicates:
+                    message += "\n⚠️ Ten utwór był już w kolejce"
+                await ctx.send(message)
             
         except Exception as e:
             await ctx.send(f"❌ Nieoczekiwany błąd: {str(e)}")
-            import traceback
             traceback.print_exc()
     
     # Komenda wstrzymywania odtwarzania
@@ -561,12 +465,8 @@ def setup_player_commands(cog):
             await ctx.send("Nie jestem połączony z kanałem głosowym!")
             return
             
-        # Czyścimy kolejkę
-        if ctx.guild.id in self.queues:
-            self.queues[ctx.guild.id] = []
-            
-        # Zatrzymujemy odtwarzanie
-        ctx.voice_client.stop()
+        # Czyścimy kolejkę i zatrzymujemy odtwarzanie
+        await self._get_player(ctx.guild).call('stop', ctx)
         await ctx.send("🛑 Odtwarzanie zatrzymane i kolejka wyczyszczona.")
         
         # Czyścimy pliki tymczasowe
@@ -580,12 +480,11 @@ def setup_player_commands(cog):
             await ctx.send("Nie jestem połączony z kanałem głosowym!")
             return
             
-        if not ctx.voice_client.is_playing() and not ctx.voice_client.is_paused():
+        # Zatrzymujemy aktualny utwór, co automatycznie uruchomi następny
+        if not await self._get_player(ctx.guild).call('skip', ctx):
             await ctx.send("Nic teraz nie gram!")
             return
             
-        # Zatrzymujemy aktualny utwór, co automatycznie uruchomi następny
-        ctx.voice_client.stop()
         await ctx.send("⏭️ Pomijam utwór.")
     
     # Komenda ustawiania głośności
@@ -671,26 +570,18 @@ def setup_player_commands(cog):
             try:
                 await ctx.author.voice.channel.connect()
                 
-                # Przywróć kolejkę
-                if not guild_id in cog.queues:
-                    cog.queues[guild_id] = []
-                
-                # Przywróć zapisaną kolejkę
-                cog.queues[guild_id] = session['queue']
-                
-                await ctx.send(f"✅ Przywrócono sesję muzyczną z {len(session['queue'])} utworami w kolejce.")
-                
-                # Rozpocznij odtwarzanie
+                # Przywróć zapisaną kolejkę - przerwany utwór na początku
+                tracks = list(session['queue'])
                 if session['now_playing']:
-                    # Dodaj aktualnie odtwarzany utwór na początek kolejki
-                    cog.queues[guild_id].insert(0, session['now_playing'])
-                    
+                    tracks.insert(0, session['now_playing'])
+                
                 # Usuń zapisaną sesję
                 del cog.disconnected_sessions[guild_id]
                 
-                # Uruchom odtwarzanie, jeśli kolejka nie jest pusta
-                if cog.queues.get(guild_id, []):
-                    await cog._play_next(ctx)
+                await ctx.send(f"✅ Przywrócono sesję muzyczną z {len(session['queue'])} utworami w kolejce.")
+                
+                # Odtwarzacz podmienia kolejkę i rozpoczyna odtwarzanie
+                await _get_player(ctx.guild).call('restore', ctx, tracks)
             except Exception as e:
                 logger.error(f"Błąd podczas przywracania sesji: {e}")
                 await ctx.send(f"Wystąpił błąd podczas przywracania sesji: {str(e)}")
@@ -717,6 +608,9 @@ def setup_player_commands(cog):
     cog._get_volume = _get_volume
     cog._set_volume = _set_volume
     cog._play_next = _play_next
+    cog._get_player = _get_player
+    cog._close_player = _close_player
+    cog._enqueue = _enqueue
     cog._format_bytes = _format_bytes
     cog._cleanup_temp_files = _cleanup_temp_files
     cog.cleanup_files = cleanup_files
@@ -729,14 +623,14 @@ def setup_player_commands(cog):
     cog.play = _play.__get__(cog, type(cog))
     cog.pause = _pause.__get__(cog, type(cog))
     cog.resume = _resume.__get__(cog, type(cog))
-    cog.nowplaying = _nowplaying.__get__(cog, type(cog))  # Dodaj tę linię
+    cog.stop = _stop.__get__(cog, type(cog))
+    cog.skip = _skip.__get__(cog, type(cog))
 
     # Przypisanie funkcji obsługujących komendy z ctx
     cog.leave = _leave
-    cog.stop = _stop
-    cog.skip = _skip
+    cog.nowplaying = _nowplaying
     cog.volume = _volume.__get__(cog, type(cog))  # Ta funkcja potrzebuje __get__
-    cog.cleancache = _cleancache.__get__(cog, type(cog))
+    cog.cleancache = _cleancache
     cog.reconnect = _reconnect
     cog.toggle_repeat = _toggle_repeat.__get__(cog, type(cog))
 
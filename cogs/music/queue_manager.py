@@ -1,40 +1,174 @@
 import discord
 from discord.ext import commands
 import random
-from utils.helpers import YTDLSource, YTDLError
+from utils.helpers import (
+    YTDLSource, YTDLError, QueuedTrack, ytdl_pool, metadata_cache,
+    extraction_scheduler, PRIORITY_BACKGROUND
+)
 from .utils import is_dj
 import asyncio
 import logging
 import os
 import traceback
 import math
-from utils.helpers import YTDLError
+import time
+from collections import OrderedDict
+from utils.helpers import YTDLError, extract_video_id
+from config import PLAYLIST_MODE, PLAYLIST_MAX_TRACKS, PLAYLIST_CONCURRENCY, DUPLICATE_POLICY
 from utils.logger import get_logger
+from .guild_queue import GuildQueue, apply_duplicate_policy
 
 # Inicjalizacja loggera
 logger = get_logger()
 
+# Dostępne polityki obsługi duplikatów w kolejce
+DUPLICATE_POLICIES = ('allow', 'skip', 'warn')
+
+# Liczba utworów na jednej stronie kolejki
+QUEUE_ITEMS_PER_PAGE = 10
+
+# Liczba wyrenderowanych stron trzymanych w pamięci paginatora
+QUEUE_PAGE_CACHE_SIZE = 5
+
+
+def _render_queue_page(cog, guild_id, page_num, author_id):
+    """
+    Buduje embed jednej strony kolejki na podstawie jej bieżącego stanu.
+    
+    Args:
+        cog: Instancja klasy Music
+        guild_id: ID serwera
+        page_num: Numer strony (od 0)
+        author_id: ID użytkownika, który wyświetla kolejkę
+        
+    Returns:
+        discord.Embed: Embed ze stroną kolejki
+    """
+    queue = cog._get_queue(guild_id)
+    page_count = max(1, math.ceil(len(queue) / QUEUE_ITEMS_PER_PAGE))
+    start_idx = page_num * QUEUE_ITEMS_PER_PAGE
+    
+    embed = discord.Embed(
+        title=f"📋 Kolejka utworów - {guild_id}",
+        color=discord.Color.blue()
+    )
+    
+    # Dodaj informacje o aktualnie odtwarzanym utworze, jeśli istnieje
+    if guild_id in cog.now_playing and cog.now_playing[guild_id]:
+        player = cog.now_playing[guild_id]
+        embed.add_field(
+            name="🎵 Aktualnie odtwarzane",
+            value=f"[{player.title}]({player.url}) | {player.duration} | {player.requester.mention}",
+            inline=False
+        )
+    
+    # Pobierz tylko utwory z tej strony
+    tracks_details = []
+    for i, track in enumerate(queue.page(start_idx, QUEUE_ITEMS_PER_PAGE), start=start_idx + 1):
+        tracks_details.append(
+            f"`{i}.` [{track.title}]({track.url}) | `{track.duration}` | {track.requester.mention}"
+        )
+    
+    if tracks_details:
+        embed.add_field(
+            name=f"Utwory w kolejce",
+            value="\n".join(tracks_details),
+            inline=False
+        )
+    else:
+        embed.description = "Kolejka jest pusta."
+    
+    # Sumy są utrzymywane przyrostowo przez kolejkę - odczyt w O(1)
+    total_time = queue.format_total_duration()
+    own_count = queue.requester_count(author_id)
+    own_tracks = f" • Twoje: {own_count}" if own_count else ""
+    
+    embed.set_footer(text=f"Strona {page_num + 1}/{page_count} • {len(queue)} utworów • Łączny czas: {total_time}{own_tracks}")
+    return embed
+
+
+class PageJumpModal(discord.ui.Modal, title="Przejdź do strony"):
+    """Formularz z numerem strony kolejki, na którą ma przejść paginator"""
+    
+    page_number = discord.ui.TextInput(label="Numer strony", min_length=1, max_length=6)
+    
+    def __init__(self, paginator):
+        super().__init__()
+        self.paginator = paginator
+        self.page_number.placeholder = f"1-{paginator.total_pages}"
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page_number.value)
+        except ValueError:
+            await interaction.response.send_message("❌ Podaj numer strony!", ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        self.paginator.current_page = page - 1
+        await self.paginator.update_page(interaction)
+
+
 class QueuePaginator(discord.ui.View):
     """
     Widok do paginacji kolejki.
     
-    Pozwala na nawigację po stronach kolejki za pomocą przycisków.
+    Strony są renderowane dopiero przy wyświetleniu, z bieżącego stanu kolejki,
+    więc otwarcie długiej kolejki kosztuje tyle, co jedna strona, a widok nie
+    pokazuje nieaktualnych danych po zmianach w kolejce. Kilka ostatnio
+    wyświetlonych stron jest trzymanych w cache, unieważnianym przy każdej
+    zmianie kolejki lub aktualnie odtwarzanego utworu.
     """
     
-    def __init__(self, pages, ctx, timeout=120):
+    def __init__(self, cog, ctx, timeout=120):
         super().__init__(timeout=timeout)
-        self.pages = pages
-        self.total_pages = len(pages)
-        self.current_page = 0
+        self.cog = cog
         self.ctx = ctx
+        self.guild_id = ctx.guild.id
+        self.current_page = 0
         self.message = None
-        
-        # Wyłącz przyciski, jeśli mamy tylko jedną stronę
-        if self.total_pages <= 1:
-            self.first_page.disabled = True
-            self.prev_page.disabled = True
-            self.next_page.disabled = True
-            self.last_page.disabled = True
+        self._page_cache = OrderedDict()
+        self._cache_state = None
+        self._update_buttons()
+    
+    @property
+    def total_pages(self):
+        """Liczba stron wyliczana z bieżącej długości kolejki"""
+        queue = self.cog._get_queue(self.guild_id)
+        return max(1, math.ceil(len(queue) / QUEUE_ITEMS_PER_PAGE))
+    
+    def render_page(self):
+        """
+        Zwraca embed bieżącej strony, korzystając z cache, jeśli kolejka się nie zmieniła.
+        
+        Returns:
+            discord.Embed: Embed z bieżącą stroną kolejki
+        """
+        queue = self.cog._get_queue(self.guild_id)
+        now_playing = self.cog.now_playing.get(self.guild_id)
+        state = (queue.version, id(now_playing))
+        if state != self._cache_state:
+            self._page_cache.clear()
+            self._cache_state = state
+        
+        embed = self._page_cache.get(self.current_page)
+        if embed is None:
+            embed = _render_queue_page(self.cog, self.guild_id, self.current_page, self.ctx.author.id)
+            self._page_cache[self.current_page] = embed
+            if len(self._page_cache) > QUEUE_PAGE_CACHE_SIZE:
+                self._page_cache.popitem(last=False)
+        else:
+            self._page_cache.move_to_end(self.current_page)
+        return embed
+    
+    def _update_buttons(self):
+        """Ustawia stan przycisków zgodnie z bieżącą stroną"""
+        total_pages = self.total_pages
+        self.first_page.disabled = self.current_page == 0
+        self.prev_page.disabled = self.current_page == 0
+        self.next_page.disabled = self.current_page >= total_pages - 1
+        self.last_page.disabled = self.current_page >= total_pages - 1
+        self.jump_page.disabled = total_pages <= 1
     
     @discord.ui.button(label="⏪ Pierwsza", style=discord.ButtonStyle.primary)
     async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -52,8 +186,7 @@ class QueuePaginator(discord.ui.View):
     @discord.ui.button(label="▶️ Następna", style=discord.ButtonStyle.secondary)
     async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
+        self.current_page += 1
         await self.update_page(interaction)
     
     @discord.ui.button(label="⏩ Ostatnia", style=discord.ButtonStyle.primary)
@@ -62,32 +195,47 @@ class QueuePaginator(discord.ui.View):
         self.current_page = self.total_pages - 1
         await self.update_page(interaction)
     
+    @discord.ui.button(label="🔢 Strona", style=discord.ButtonStyle.secondary, row=1)
+    async def jump_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(PageJumpModal(self))
+    
+    @discord.ui.button(label="🎵 Teraz gra", style=discord.ButtonStyle.success, row=1)
+    async def now_playing_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not self.cog.now_playing.get(self.guild_id):
+            await interaction.response.send_message("❌ Aktualnie nic nie jest odtwarzane!", ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        await self.cog._send_now_playing_embed(self.ctx)
+    
     async def update_page(self, interaction):
         """Aktualizuje stronę do wyświetlenia"""
-        # Pobierz bieżącą stronę
-        page = self.pages[self.current_page]
+        # Kolejka mogła się skrócić od ostatniego wyświetlenia
+        self.current_page = max(0, min(self.current_page, self.total_pages - 1))
         
-        # Zaktualizuj przyciski
-        self.first_page.disabled = self.current_page == 0
-        self.prev_page.disabled = self.current_page == 0
-        self.next_page.disabled = self.current_page == self.total_pages - 1
-        self.last_page.disabled = self.current_page == self.total_pages - 1
+        self._update_buttons()
         
         # Aktualizuj wiadomość
-        await interaction.message.edit(embed=page, view=self)
+        await (self.message or interaction.message).edit(embed=self.render_page(), view=self)
     
     async def on_timeout(self):
         """Obsługa timeout widoku"""
         # Wyłącz wszystkie przyciski po timeout
-        self.first_page.disabled = True
-        self.prev_page.disabled = True
-        self.next_page.disabled = True
-        self.last_page.disabled = True
+        for item in self.children:
+            item.disabled = True
         
         if self.message:
             await self.message.edit(view=self)
 
 
+def _get_queue(self, guild_id):
+    """Zwraca kolejkę serwera, tworząc ją w razie potrzeby"""
+    queue = self.queues.get(guild_id)
+    if queue is None:
+        queue = self.queues[guild_id] = GuildQueue()
+    return queue
+
+
 async def _toggle_repeat(self, ctx):
     """Włącza/wyłącza tryb powtarzania dla bieżącego utworu."""
     guild_id = ctx.guild.id
@@ -150,44 +298,34 @@ async def _playlist(self, ctx, *, url):
     await self._add_playlist(ctx, url)
 
 
-async def _add_playlist(self, ctx, playlist_url, *, max_tracks=100, chunk_size=25):
+async def _add_playlist(self, ctx, playlist_url, *, max_tracks=None, chunk_size=25, mode=None):
     """
-    Dodaje playlistę do kolejki po kawałkach.
+    Dodaje playlistę do kolejki.
+    
+    W trybie "flat" utwory trafiają do kolejki prosto z listy playlisty, bez
+    zapytań sieciowych na utwór - pełna ekstrakcja następuje dopiero, gdy utwór
+    zbliży się do początku kolejki. W trybie "full" informacje o utworach są
+    pobierane równolegle, odtwarzanie rusza po pierwszym gotowym utworze,
+    a kolejne trafiają do kolejki w kolejności playlisty.
     
     Args:
         ctx: Kontekst komendy
         playlist_url: URL playlisty YouTube
-        max_tracks: Maksymalna liczba utworów do dodania
-        chunk_size: Rozmiar porcji do przetworzenia na raz
+        max_tracks: Maksymalna liczba utworów do dodania (domyślnie PLAYLIST_MAX_TRACKS)
+        chunk_size: Co ile utworów aktualizować komunikat o postępie
+        mode: Tryb dodawania "flat" lub "full" (domyślnie PLAYLIST_MODE)
     """
+    max_tracks = max_tracks or PLAYLIST_MAX_TRACKS
+    mode = mode or PLAYLIST_MODE
+    
     async with ctx.typing():
         try:
-            await ctx.send(f"🔍 Pobieram informacje o playliście...")
+            started_at = time.monotonic()
+            progress = await ctx.send(f"🔍 Pobieram informacje o playliście...")
             
-            # Przygotuj opcje yt-dlp
-            ytdl_options = {
-                'format': 'bestaudio/best',
-                'outtmpl': 'temp/%(extractor)s-%(id)s-%(title)s.%(ext)s',
-                'restrictfilenames': True,
-                'noplaylist': False,  # Potrzebujemy playlist
-                'nocheckcertificate': True,
-                'ignoreerrors': False,
-                'logtostderr': False,
-                'quiet': True,
-                'no_warnings': True,
-                'default_search': 'auto',
-                'source_address': '0.0.0.0',
-                'extract_flat': True,  # Nie pobieraj wszystkich informacji na raz
-                'force_generic_extractor': False
-            }
-            
-            # Inicjalizacja YTDL
-            import yt_dlp
-            ydl = yt_dlp.YoutubeDL(ytdl_options)
-            
-            # Pobierz informacje o playliście
-            info = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: ydl.extract_info(playlist_url, download=False)
+            # Pobierz informacje o playliście (instancja z puli, profil bez pełnej ekstrakcji)
+            info = await extraction_scheduler.run(
+                ytdl_pool.extract_info, 'playlist', playlist_url, guild_id=ctx.guild.id
             )
             
             if 'entries' not in info:
@@ -206,85 +344,139 @@ async def _add_playlist(self, ctx, playlist_url, *, max_tracks=100, chunk_size=2
                 return
             
             # Wyświetl informacje o playliście
-            await ctx.send(f"📋 Dodaję playlistę **{playlist_title}** ({total_tracks} utworów)...")
-            
-            # Inicjalizacja kolejki dla tego serwera, jeśli nie istnieje
-            if ctx.guild.id not in self.queues:
-                self.queues[ctx.guild.id] = []
+            await progress.edit(content=f"📋 Dodaję playlistę **{playlist_title}** ({total_tracks} utworów)...")
             
             # Liczniki do śledzenia postępu
             added_count = 0
             failed_count = 0
-            duplicate_count = 0
             
-            # Pobierz informacje o każdym utworze w playliście w mniejszych porcjach
-            for i in range(0, total_tracks, chunk_size):
-                chunk = entries[i:i+chunk_size]
-                chunk_size_actual = len(chunk)
-                
-                # Aktualizuj status co każdą porcję
-                if i > 0:
-                    await ctx.send(f"⏳ Przetwarzanie {i}/{total_tracks} utworów...")
+            queue = self._get_queue(ctx.guild.id)
+            
+            # Polityka duplikatów dla tego serwera: allow, skip lub warn
+            policy = self.duplicate_policy.get(ctx.guild.id, DUPLICATE_POLICY)
+            
+            # Wybierz wpisy do dodania
+            candidates = []
+            for entry in entries:
+                # Sprawdź czy mamy URL
+                if 'url' not in entry and 'id' not in entry:
+                    failed_count += 1
+                    continue
                 
-                for entry in chunk:
-                    # Sprawdź czy mamy URL
-                    if 'url' not in entry and 'id' not in entry:
-                        failed_count += 1
-                        continue
-                    
-                    # Utwórz URL na podstawie ID, jeśli potrzeba
-                    video_url = entry.get('url', f"https://www.youtube.com/watch?v={entry.get('id')}")
-                    
-                    # Sprawdź, czy utwór już jest w kolejce (duplikat)
-                    is_duplicate = False
-                    for track in self.queues[ctx.guild.id]:
-                        if track.url == video_url:
-                            duplicate_count += 1
-                            is_duplicate = True
-                            break
-                    
-                    if is_duplicate:
-                        continue
-                    
-                    try:
-                        # Pobierz informacje o utworze
-                        player = await YTDLSource.from_url(
-                            video_url, 
-                            loop=self.bot.loop, 
-                            stream=True,
-                            volume=0.5
-                        )
-                        
-                        # Dodaj dodatkowe informacje
-                        player.requester = ctx.author
-                        
-                        # Dodaj do kolejki
-                        self.queues[ctx.guild.id].append(player)
-                        added_count += 1
-                    except Exception as e:
-                        logger.error(f"Błąd podczas dodawania utworu {video_url} do kolejki: {e}")
-                        failed_count += 1
+                # Utwórz URL na podstawie ID, jeśli potrzeba
+                video_url = entry.get('url', f"https://www.youtube.com/watch?v={entry.get('id')}")
+                candidates.append((video_url, entry))
+            
+            # Duplikaty sprawdzane w indeksie kolejki i wcześniej na tej playliście
+            candidates, duplicate_count = apply_duplicate_policy(
+                queue, candidates, policy,
+                key=lambda candidate: candidate[1].get('id') or extract_video_id(candidate[0]) or candidate[0]
+            )
+            
+            first_audio = None
+            if mode == 'flat':
+                # Metadane z listy playlisty wystarczą do kolejki - bez zapytań sieciowych na utwór
+                tracks = []
+                for video_url, entry in candidates:
+                    data = metadata_cache.get(video_url)
+                    if data is not None:
+                        tracks.append(QueuedTrack(data, requester=ctx.author))
+                    else:
+                        tracks.append(QueuedTrack.from_playlist_entry(entry, requester=ctx.author))
                 
-                # Daj czas na inne operacje asyncio
-                await asyncio.sleep(0.1)
+                # Odtwarzacz serwera doda utwory i rozpocznie odtwarzanie, jeśli nic nie gra
+                # (polityka duplikatów została już zastosowana przy wyborze wpisów)
+                if tracks:
+                    position, _ = await self._enqueue(ctx, tracks, check_duplicates=False)
+                    if position == 0:
+                        first_audio = time.monotonic() - started_at
+                added_count = len(tracks)
+            else:
+                first_audio, added_count, resolve_failed = await self._resolve_playlist_entries(
+                    ctx, candidates, progress, started_at, chunk_size
+                )
+                failed_count += resolve_failed
             
             # Wyświetl podsumowanie
+            total_time = time.monotonic() - started_at
             message = f"✅ Dodano **{added_count}** utworów do kolejki"
-            if duplicate_count > 0:
+            if duplicate_count > 0 and policy == 'skip':
                 message += f", **{duplicate_count}** duplikatów pominięto"
+            elif duplicate_count > 0 and policy == 'warn':
+                message += f"\n⚠️ **{duplicate_count}** utworów było już w kolejce"
             if failed_count > 0:
                 message += f", **{failed_count}** nie udało się załadować"
-            await ctx.send(message)
-            
-            # Rozpocznij odtwarzanie, jeśli nic nie jest odtwarzane
-            if ctx.voice_client and not ctx.voice_client.is_playing():
-                await self._play_next(ctx)
+            message += f"\n⏱️ Całość: {total_time:.1f}s"
+            if first_audio is not None:
+                message += f" • pierwszy utwór po {first_audio:.1f}s"
+            await progress.edit(content=message)
                 
         except Exception as e:
             logger.error(f"Błąd podczas dodawania playlisty: {e}")
             await ctx.send(f"❌ Wystąpił błąd podczas dodawania playlisty: {str(e)}")
 
 
+async def _resolve_playlist_entries(self, ctx, candidates, progress, started_at, chunk_size):
+    """
+    Pobiera pełne informacje o utworach playlisty równolegle i dodaje je do kolejki.
+    
+    Args:
+        ctx: Kontekst komendy
+        candidates: Lista par (URL utworu, wpis playlisty) do dodania
+        progress: Wiadomość z postępem do aktualizowania
+        started_at: Czas rozpoczęcia dodawania (time.monotonic)
+        chunk_size: Co ile utworów aktualizować komunikat o postępie
+        
+    Returns:
+        Tuple[Optional[float], int, int]: Czas do pierwszego utworu, liczba dodanych i nieudanych
+    """
+    added_count = 0
+    failed_count = 0
+    first_audio = None
+    
+    # Ogranicz liczbę jednoczesnych ekstrakcji
+    semaphore = asyncio.Semaphore(PLAYLIST_CONCURRENCY)
+    
+    async def resolve(video_url):
+        async with semaphore:
+            # Pobierz same metadane - źródło audio powstanie tuż przed odtworzeniem
+            return await YTDLSource.create_track(
+                video_url, 
+                loop=self.bot.loop, 
+                requester=ctx.author,
+                priority=PRIORITY_BACKGROUND,
+                guild_id=ctx.guild.id
+            )
+    
+    pending = [(video_url, asyncio.create_task(resolve(video_url))) for video_url, _ in candidates]
+    
+    # Dodawaj utwory w kolejności playlisty, gdy tylko są gotowe
+    try:
+        for position, (video_url, task) in enumerate(pending, start=1):
+            try:
+                track = await task
+            except Exception as e:
+                logger.error(f"Błąd podczas dodawania utworu {video_url} do kolejki: {e}")
+                failed_count += 1
+                continue
+            
+            # Odtwarzanie rusza od razu po pierwszym gotowym utworze, jeśli nic nie gra
+            queue_position, _ = await self._enqueue(ctx, [track], check_duplicates=False)
+            if queue_position == 0 and first_audio is None:
+                first_audio = time.monotonic() - started_at
+            added_count += 1
+            
+            # Aktualizuj status co porcję utworów
+            if position % chunk_size == 0:
+                await progress.edit(content=f"⏳ Przetwarzanie {position}/{len(pending)} utworów...")
+    finally:
+        # Przy błędzie lub anulowaniu nie zostawiaj działających zadań
+        for _, task in pending:
+            task.cancel()
+    
+    return first_audio, added_count, failed_count
+
+
 async def _queue(self, ctx):
     """
     Wyświetla aktualną kolejkę utworów z paginacją.
@@ -317,72 +509,15 @@ async def _queue(self, ctx):
             await ctx.send("❌ Kolejka jest pusta i nic nie jest odtwarzane!")
         return
     
-    # Przygotuj zawartość kolejki do wyświetlenia z paginacją
-    queue = self.queues[guild_id]
-    items_per_page = 10
-    pages = []
-    
-    # Oblicz liczbę stron
-    page_count = math.ceil(len(queue) / items_per_page)
-    
-    # Utwórz stronę dla każdej części kolejki
-    for page_num in range(page_count):
-        start_idx = page_num * items_per_page
-        end_idx = start_idx + items_per_page
-        page_items = queue[start_idx:end_idx]
-        
-        embed = discord.Embed(
-            title=f"📋 Kolejka utworów - {guild_id}",
-            color=discord.Color.blue()
-        )
-        
-        # Dodaj informacje o aktualnie odtwarzanym utworze, jeśli istnieje
-        if guild_id in self.now_playing and self.now_playing[guild_id]:
-            player = self.now_playing[guild_id]
-            embed.add_field(
-                name="🎵 Aktualnie odtwarzane",
-                value=f"[{player.title}]({player.url}) | {player.duration} | {player.requester.mention}",
-                inline=False
-            )
-        
-        # Dodaj utwory na tej stronie
-        tracks_details = []
-        for i, track in enumerate(page_items, start=start_idx + 1):
-            tracks_details.append(
-                f"`{i}.` [{track.title}]({track.url}) | `{track.duration}` | {track.requester.mention}"
-            )
-        
-        # Jeśli mamy utwory na tej stronie, dodaj je
-        if tracks_details:
-            embed.add_field(
-                name=f"Utwory w kolejce",
-                value="\n".join(tracks_details),
-                inline=False
-            )
-        
-        # Dodaj informacje o stronie
-        total_duration = sum(track.duration_raw for track in queue)
-        minutes, seconds = divmod(total_duration, 60)
-        hours, minutes = divmod(minutes, 60)
-        
-        # Formatuj czas całkowity
-        if hours > 0:
-            total_time = f"{hours}h {minutes}m {seconds}s"
-        else:
-            total_time = f"{minutes}m {seconds}s"
-        
-        embed.set_footer(text=f"Strona {page_num + 1}/{page_count} • {len(queue)} utworów • Łączny czas: {total_time}")
-        
-        # Dodaj stronę do listy stron
-        pages.append(embed)
+    # Strony są renderowane na żądanie - od razu budujemy tylko pierwszą
+    view = QueuePaginator(self, ctx)
     
     # Jeśli mamy tylko jedną stronę, wyślij ją bez paginacji
-    if len(pages) == 1:
-        await ctx.send(embed=pages[0])
+    if view.total_pages == 1:
+        view.stop()
+        await ctx.send(embed=view.render_page())
     else:
-        # W przeciwnym razie użyj paginatora
-        view = QueuePaginator(pages, ctx)
-        message = await ctx.send(embed=pages[0], view=view)
+        message = await ctx.send(embed=view.render_page(), view=view)
         view.message = message
 
 
@@ -404,11 +539,16 @@ def setup_queue_commands(cog):
     if not hasattr(cog, '_queue_history'):
         cog._queue_history = {}
     
+    if not hasattr(cog, 'duplicate_policy'):
+        cog.duplicate_policy = {}
+    
     # Przypisz metody do cog
     cog._toggle_repeat = _toggle_repeat.__get__(cog, type(cog))
     cog._playlist = _playlist.__get__(cog, type(cog))
     cog._add_playlist = _add_playlist.__get__(cog, type(cog))
+    cog._resolve_playlist_entries = _resolve_playlist_entries.__get__(cog, type(cog))
     cog._queue = _queue.__get__(cog, type(cog))
+    cog._get_queue = _get_queue.__get__(cog, type(cog))
     
     # Alias dla kompatybilności
     cog.queue = cog._queue
@@ -427,17 +567,12 @@ def setup_queue_commands(cog):
             await ctx.send("❌ Kolejka jest pusta!")
             return
         
-        # Sprawdź czy indeks jest poprawny
-        if index < 1 or index > len(cog.queues[guild_id]):
+        # Usuń utwór z kolejki (odtwarzacz sprawdza indeks - kolejka mogła się w międzyczasie zmienić)
+        track = await cog._get_player(ctx.guild).call('remove', index-1)
+        if track is None:
             await ctx.send(f"⚠️ Podaj poprawny numer utworu (1-{len(cog.queues[guild_id])})!")
             return
         
-        # Pobierz utwór do usunięcia
-        track = cog.queues[guild_id][index-1]
-        
-        # Usuń utwór z kolejki
-        cog.queues[guild_id].pop(index-1)
-        
         # Wyślij potwierdzenie
         await ctx.send(f"✅ Usunięto z kolejki: **{track.title}**")
     
@@ -452,12 +587,8 @@ def setup_queue_commands(cog):
             await ctx.send("❌ Kolejka jest pusta!")
             return
         
-        # Zapisz długość kolejki przed mieszaniem
-        queue_length = len(cog.queues[guild_id])
-        
         # Pomieszaj kolejkę
-        import random
-        random.shuffle(cog.queues[guild_id])
+        queue_length = await cog._get_player(ctx.guild).call('shuffle')
         
         # Wyślij potwierdzenie
         await ctx.send(f"🔀 Pomieszano {queue_length} utworów w kolejce!")
@@ -473,11 +604,8 @@ def setup_queue_commands(cog):
             await ctx.send("❌ Kolejka już jest pusta!")
             return
         
-        # Zapisz długość kolejki przed czyszczeniem
-        queue_length = len(cog.queues[guild_id])
-        
-        # Wyczyść kolejkę
-        cog.queues[guild_id] = []
+        # Wyczyść kolejkę (razem z przygotowanym następnym utworem i pobieraniami w tle)
+        queue_length = await cog._get_player(ctx.guild).call('clear_queue')
         
         # Wyślij potwierdzenie
         await ctx.send(f"🧹 Wyczyszczono kolejkę ({queue_length} utworów)!")
@@ -493,22 +621,33 @@ def setup_queue_commands(cog):
             await ctx.send("❌ Kolejka jest pusta!")
             return
         
-        # Sprawdź poprawność indeksów (użytkownicy numerują od 1)
-        queue_length = len(cog.queues[guild_id])
-        if from_pos < 1 or from_pos > queue_length or to_pos < 1 or to_pos > queue_length:
-            await ctx.send(f"⚠️ Podaj poprawne numery utworów (1-{queue_length})!")
+        # Przenieś utwór na nową pozycję (użytkownicy numerują od 1)
+        track = await cog._get_player(ctx.guild).call('move', from_pos-1, to_pos-1)
+        if track is None:
+            await ctx.send(f"⚠️ Podaj poprawne numery utworów (1-{len(cog.queues[guild_id])})!")
             return
         
-        # Pobierz utwór do przeniesienia
-        track = cog.queues[guild_id][from_pos-1]
+        # Wyślij potwierdzenie
+        await ctx.send(f"✅ Przeniesiono **{track.title}** z pozycji {from_pos} na {to_pos}!")
+    
+    @cog.bot.command(name="duplicates", aliases=["duplikaty"], help="Ustawia obsługę duplikatów w kolejce (allow/skip/warn)")
+    @is_dj()
+    async def duplicates_command(ctx, policy: str = None):
+        """Ustawia politykę duplikatów dla serwera"""
+        guild_id = ctx.guild.id
+        current = cog.duplicate_policy.get(guild_id, DUPLICATE_POLICY)
         
-        # Usuń z oryginalnej pozycji
-        cog.queues[guild_id].pop(from_pos-1)
+        # Bez argumentu pokaż aktualne ustawienie
+        if policy is None:
+            await ctx.send(f"📋 Obsługa duplikatów: **{current}** (dostępne: allow, skip, warn)")
+            return
         
-        # Wstaw na nowej pozycji
-        cog.queues[guild_id].insert(to_pos-1, track)
+        policy = policy.lower()
+        if policy not in DUPLICATE_POLICIES:
+            await ctx.send("⚠️ Dostępne opcje: `allow` (dodawaj), `skip` (pomijaj), `warn` (dodawaj z ostrzeżeniem)")
+            return
         
-        # Wyślij potwierdzenie
-        await ctx.send(f"✅ Przeniesiono **{track.title}** z pozycji {from_pos} na {to_pos}!")
+        cog.duplicate_policy[guild_id] = policy
+        await ctx.send(f"✅ Obsługa duplikatów ustawiona na **{policy}**")
     
     return cog
\ No newline at end of file
@@ -327,9 +327,13 @@ def setup_ui_commands(cog):
         if player.likes is not None:
             embed.add_field(name="Polubienia", value=f"👍 {player.likes:,}", inline=True)
         
-        # Informacje o kolejce
-        queue_size = len(self.queues.get(guild_id, []))
-        embed.add_field(name="W kolejce", value=f"📋 {queue_size} utworów", inline=True)
+        # Informacje o kolejce (liczniki utrzymywane przez kolejkę - odczyt w O(1))
+        queue = self.queues.get(guild_id)
+        if queue:
+            queue_info = f"📋 {len(queue)} utworów ({queue.format_total_duration()})"
+        else:
+            queue_info = "📋 0 utworów"
+        embed.add_field(name="W kolejce", value=queue_info, inline=True)
         
         # Informacje o trybie powtarzania
         repeat_mode = self.repeat_mode.get(guild_id, 0)
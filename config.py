@@ -13,6 +13,89 @@ INACTIVITY_TIMEOUT = int(os.getenv("INACTIVITY_TIMEOUT", "300"))
 DJ_ROLE_ENABLED = os.getenv("DJ_ROLE_ENABLED", "False").lower() == "true"
 DJ_ROLE_NAME = os.getenv("DJ_ROLE_NAME", "DJ")
 
+# Adresy strumieni YouTube wygasają po kilku godzinach - odświeżaj je z takim
+# wyprzedzeniem (w sekundach) przed upływem terminu ważności
+STREAM_URL_REFRESH_MARGIN = int(os.getenv("STREAM_URL_REFRESH_MARGIN", "300"))
+
+# Liczba gotowych instancji YoutubeDL na każdy profil opcji (stream, pobieranie, wyszukiwanie, playlisty)
+YTDL_POOL_SIZE = int(os.getenv("YTDL_POOL_SIZE", "4"))
+
+# Liczba wątków przeznaczonych wyłącznie na ekstrakcję yt-dlp (domyślnie tyle, ile instancji w puli)
+YTDL_WORKERS = int(os.getenv("YTDL_WORKERS", str(YTDL_POOL_SIZE)))
+
+# Utwory nie dłuższe niż tyle sekund są w trybie powtarzania utworu trzymane
+# w pamięci jako zdekodowane PCM (ok. 11 MB na minutę) i zapętlane bez sieci
+# i FFmpeg; 0 wyłącza
+LOOP_BUFFER_SECONDS = int(os.getenv("LOOP_BUFFER_SECONDS", "0"))
+
+# Ile ostatnio odtworzonych utworów pamiętać na serwer (dla powtarzania kolejki);
+# przy dłuższej sesji powtarzanych jest tylko tyle ostatnich utworów
+QUEUE_HISTORY_SIZE = int(os.getenv("QUEUE_HISTORY_SIZE", "200"))
+
+# Gdzie wykonywać ekstrakcję yt-dlp: "thread" (wątki procesu bota) lub "process"
+# (osobne procesy robocze - parsowanie nie konkuruje z pętlą zdarzeń o GIL)
+YTDL_BACKEND = os.getenv("YTDL_BACKEND", "thread").lower()
+
+# Maksymalna liczba jednoczesnych ekstrakcji jednego serwera - reszta wątków zostaje dla innych
+YTDL_GUILD_CONCURRENCY = int(os.getenv("YTDL_GUILD_CONCURRENCY", "2"))
+
+# Cache metadanych utworów (LRU w pamięci + SQLite na dysku)
+METADATA_CACHE_PATH = os.getenv("METADATA_CACHE_PATH", "cache/metadata.sqlite3")
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "2000"))
+METADATA_CACHE_TTL_DAYS = int(os.getenv("METADATA_CACHE_TTL_DAYS", "30"))
+
+# Jak długo fraza wyszukiwania prowadzi do zapamiętanego filmu, zanim zostanie
+# wyszukana ponownie (wyniki wyszukiwania YouTube się zmieniają)
+QUERY_INDEX_TTL_DAYS = int(os.getenv("QUERY_INDEX_TTL_DAYS", "7"))
+
+# Tryb dodawania playlist: "flat" - od razu z listy utworów (bez zapytań na utwór),
+# "full" - pełna ekstrakcja każdego utworu przed dodaniem
+PLAYLIST_MODE = os.getenv("PLAYLIST_MODE", "flat").lower()
+PLAYLIST_MAX_TRACKS = int(os.getenv("PLAYLIST_MAX_TRACKS", "1000"))
+
+# Liczba utworów playlisty pobieranych jednocześnie (tryb "full")
+PLAYLIST_CONCURRENCY = int(os.getenv("PLAYLIST_CONCURRENCY", "4"))
+
+# Domyślna obsługa duplikatów w kolejce: allow, skip lub warn
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "skip").lower()
+
+# Lokalny cache plików audio (pliki zapisywane pod id filmu) i jego limit w MB -
+# po przekroczeniu usuwane są najdawniej używane pliki
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "cache/audio")
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "2048"))
+
+# Domyślna głośność (0.0-1.0, %volume 100 to 1.0). Przy 1.0 dźwięk w Opus (pliki z cache
+# audio i strumienie Opus) jest wysyłany do Discorda bez dekodowania; każda inna wartość
+# wymaga dekodowania do PCM
+DEFAULT_VOLUME = float(os.getenv("DEFAULT_VOLUME", "1.0"))
+
+# Czas płynnego narastania dźwięku na początku utworu i wyciszania przy skip/stop
+# w milisekundach (0 wyłącza)
+FADE_MS = int(os.getenv("FADE_MS", "300"))
+
+# Wyrównywanie głośności utworów do docelowej głośności zintegrowanej (EBU R128, w LUFS).
+# Głośność jest mierzona raz, po pobraniu utworu do cache audio. Domyślnie wyłączone:
+# korekta ma pierwszeństwo przed przesyłaniem Opus bez dekodowania, więc po włączeniu
+# każdy utwór odbiegający od celu o więcej niż 0.5 dB jest dekodowany do PCM
+LOUDNESS_NORMALIZATION = os.getenv("LOUDNESS_NORMALIZATION", "False").lower() == "true"
+LOUDNESS_TARGET = float(os.getenv("LOUDNESS_TARGET", "-14"))
+
+# Ile najbliższych utworów z kolejki pobierać w tle do cache audio (0 wyłącza),
+# ile pobrań może trwać jednocześnie, limit prędkości pobierania w KB/s (0 - bez limitu)
+# i maksymalny czas jednego pobrania w sekundach; przy YTDL_BACKEND=process pobieranie
+# ma DOWNLOAD_CONCURRENCY własnych procesów roboczych, niezależnych od YTDL_WORKERS
+PREDOWNLOAD_TRACKS = int(os.getenv("PREDOWNLOAD_TRACKS", "2"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "1"))
+DOWNLOAD_RATE_LIMIT_KB = int(os.getenv("DOWNLOAD_RATE_LIMIT_KB", "0"))
+DOWNLOAD_TIMEOUT = int(os.getenv("DOWNLOAD_TIMEOUT", "600"))
+
+# Z jakim wyprzedzeniem (w sekundach) przed końcem utworu przygotować następny
+# (odświeżenie adresu, uruchomienie FFmpeg i wstępne buforowanie); 0 wyłącza
+PREFETCH_SECONDS = int(os.getenv("PREFETCH_SECONDS", "10"))
+
+# Katalog plików logów (względem katalogu roboczego bota)
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+
 # Opcje debugowania
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Moduły bota tworzą przy imporcie cache i logi na dysku - w testach kierujemy je do katalogu tymczasowego
+_cache_dir = tempfile.mkdtemp(prefix="musicbot-tests-")
+os.environ.setdefault("TOKEN", "test-token")
+os.environ.setdefault("AUDIO_CACHE_DIR", os.path.join(_cache_dir, "audio"))
+os.environ.setdefault("METADATA_CACHE_PATH", os.path.join(_cache_dir, "metadata.sqlite3"))
+# Logi z testów nie trafiają do katalogu logs/ repozytorium
+os.environ["LOG_DIR"] = os.path.join(_cache_dir, "logs")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import os
+
+from utils.audio_cache import AudioCache
+
+
+def download(cache, video_id, size=100):
+    """Zapisuje plik o podanym rozmiarze w katalogu .partial i przenosi go do cache"""
+    os.makedirs(cache.partial_dir, exist_ok=True)
+    path = os.path.join(cache.partial_dir, f"{video_id}.opus")
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    return cache.store(video_id, path)
+
+
+def test_store_moves_file_out_of_partial_dir(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=1000)
+    path = download(cache, 'aaaaaaaaaaa')
+
+    assert path == os.path.join(str(tmp_path), 'aaaaaaaaaaa.opus')
+    assert os.listdir(cache.partial_dir) == []
+    assert cache.get('aaaaaaaaaaa') == path
+    assert cache.stats()['hits'] == 1
+
+
+def test_least_recently_used_file_is_evicted(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=250)
+    download(cache, 'aaaaaaaaaaa')
+    download(cache, 'bbbbbbbbbbb')
+    cache.get('aaaaaaaaaaa')  # "b" jest teraz najdawniej używany
+    download(cache, 'ccccccccccc')
+
+    assert cache.has('aaaaaaaaaaa')
+    assert not cache.has('bbbbbbbbbbb')
+    assert not os.path.exists(os.path.join(str(tmp_path), 'bbbbbbbbbbb.opus'))
+    assert cache.stats()['size_mb'] * 1024 * 1024 == 200
+
+
+def test_pinned_files_are_not_evicted(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=250)
+    cache.set_pin_source(lambda: {'aaaaaaaaaaa'})
+    download(cache, 'aaaaaaaaaaa')
+    download(cache, 'bbbbbbbbbbb')
+    download(cache, 'ccccccccccc')
+
+    assert cache.has('aaaaaaaaaaa')
+    assert not cache.has('bbbbbbbbbbb')
+    assert cache.has('ccccccccccc')
+
+
+def test_everything_pinned_exceeds_limit_instead_of_deleting(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=150)
+    cache.set_pin_source(lambda: {'aaaaaaaaaaa', 'bbbbbbbbbbb'})
+    download(cache, 'aaaaaaaaaaa')
+    download(cache, 'bbbbbbbbbbb')
+
+    assert cache.has('aaaaaaaaaaa') and cache.has('bbbbbbbbbbb')
+
+    # Po odpięciu limit jest egzekwowany przy najbliższym sprzątaniu
+    cache.set_pin_source(lambda: set())
+    assert cache.cleanup() == 1
+    assert cache.has('bbbbbbbbbbb')
+
+
+def test_index_is_reloaded_after_restart(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=1000)
+    download(cache, 'aaaaaaaaaaa')
+    download(cache, 'bbbbbbbbbbb', size=50)
+    cache.get('aaaaaaaaaaa')
+    cache.cleanup()  # Zapisuje kolejność LRU po odczycie
+
+    reloaded = AudioCache(directory=str(tmp_path), max_bytes=120)
+    assert reloaded.stats()['entries'] == 2
+    assert reloaded.stats()['size_mb'] * 1024 * 1024 == 150
+
+    # Mniejszy limit usuwa najdawniej używany plik z poprzedniej sesji
+    assert reloaded.cleanup() == 1
+    assert reloaded.has('aaaaaaaaaaa')
+    assert not reloaded.has('bbbbbbbbbbb')
+
+
+def test_file_deleted_outside_the_bot_is_a_miss(tmp_path):
+    cache = AudioCache(directory=str(tmp_path), max_bytes=1000)
+    path = download(cache, 'aaaaaaaaaaa')
+    os.unlink(path)
+
+    assert cache.get('aaaaaaaaaaa') is None
+    assert not cache.has('aaaaaaaaaaa')
+
+
+def test_construction_does_not_touch_partial_files(tmp_path):
+    partial_dir = tmp_path / '.partial'
+    partial_dir.mkdir()
+    (partial_dir / 'in-progress.webm').write_bytes(b'data')
+
+    cache = AudioCache(directory=str(tmp_path))
+    cache.stats()
+    assert os.listdir(partial_dir) == ['in-progress.webm']
+
+    cache.remove_partial_files()
+    assert os.listdir(partial_dir) == []
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.helpers import ExtractionScheduler, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+async def occupy(scheduler, guild_id=None):
+    """Zajmuje wątek harmonogramu, dopóki zwrócone zdarzenie nie zostanie ustawione"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+
+    task = asyncio.ensure_future(scheduler.run(work, guild_id=guild_id))
+    while not started.is_set():
+        await asyncio.sleep(0.01)
+    return task, release
+
+
+async def test_interactive_jobs_run_before_background():
+    scheduler = ExtractionScheduler(workers=1, guild_limit=1)
+    blocker, release = await occupy(scheduler)
+
+    order = []
+    background = asyncio.ensure_future(
+        scheduler.run(order.append, 'background', priority=PRIORITY_BACKGROUND)
+    )
+    interactive = asyncio.ensure_future(
+        scheduler.run(order.append, 'interactive', priority=PRIORITY_INTERACTIVE)
+    )
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(blocker, background, interactive)
+    assert order == ['interactive', 'background']
+
+
+async def test_guild_limit_leaves_threads_for_other_guilds():
+    scheduler = ExtractionScheduler(workers=2, guild_limit=1)
+    blocker, release = await occupy(scheduler, guild_id=1)
+
+    same_guild = asyncio.ensure_future(scheduler.run(lambda: 'same', guild_id=1))
+    other_guild = asyncio.ensure_future(scheduler.run(lambda: 'other', guild_id=2))
+
+    assert await asyncio.wait_for(other_guild, 1) == 'other'
+    assert not same_guild.done()
+
+    release.set()
+    assert await asyncio.wait_for(same_guild, 1) == 'same'
+    await blocker
+
+
+async def test_cancelled_pending_job_releases_nothing_and_is_skipped():
+    scheduler = ExtractionScheduler(workers=1, guild_limit=1)
+    blocker, release = await occupy(scheduler, guild_id=1)
+
+    calls = []
+    pending = asyncio.ensure_future(scheduler.run(calls.append, 'cancelled', guild_id=1))
+    await asyncio.sleep(0)
+    pending.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await pending
+
+    release.set()
+    await blocker
+    assert await scheduler.run(lambda: 'next', guild_id=1) == 'next'
+    assert calls == []
+    assert scheduler.stats()['active'] == 0
+    assert scheduler._per_guild == {}
+
+
+async def test_timeout_keeps_thread_until_the_job_finishes():
+    scheduler = ExtractionScheduler(workers=1, guild_limit=1)
+    release = threading.Event()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.run(release.wait, 5, guild_id=1, timeout=0.05)
+
+    # Funkcja nadal działa w wątku - wątek nie może zostać przydzielony innemu zadaniu
+    assert scheduler.stats()['active'] == 1
+
+    release.set()
+    assert await asyncio.wait_for(scheduler.run(lambda: 'next', guild_id=1), 1) == 'next'
+    assert scheduler.stats()['active'] == 0
@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from cogs.music import guild_player
+from cogs.music.guild_player import GuildPlayer
+from cogs.music.guild_queue import GuildQueue
+
+
+def make_player():
+    queue = GuildQueue()
+    cog = SimpleNamespace(
+        now_playing={}, players={}, _queue_history={}, repeat_mode={}, duplicate_policy={},
+        _get_queue=lambda guild_id: queue
+    )
+    guild = SimpleNamespace(id=1, voice_client=None)
+    return GuildPlayer(cog, guild)
+
+
+def make_track(i):
+    return SimpleNamespace(id=f"{i:011d}", url=f"https://www.youtube.com/watch?v={i:011d}",
+                           duration_raw=60, requester=None, is_stale=lambda margin=0: False)
+
+
+async def test_close_cancels_queued_commands():
+    player = make_player()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def _cmd_block():
+        started.set()
+        await release.wait()
+
+    player._cmd_block = _cmd_block
+    running = asyncio.ensure_future(player.call('block'))
+    await started.wait()
+    queued = asyncio.ensure_future(player.call('shuffle'))
+    await asyncio.sleep(0)
+
+    player.close()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(queued, 1)
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(running, 1)
+    assert not player.is_alive()
+
+
+async def test_call_after_close_does_not_hang():
+    player = make_player()
+    player.close()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(player.call('shuffle'), 1)
+
+
+async def test_queue_commands_go_through_the_player(monkeypatch):
+    # Bez pobierania w tle - test nie łączy się z YouTube
+    monkeypatch.setattr(guild_player, 'PREDOWNLOAD_TRACKS', 0)
+    player = make_player()
+    tracks = [make_track(i) for i in range(3)]
+    player.queue.extend(tracks)
+
+    assert await player.call('remove', 5) is None
+    assert await player.call('move', 2, 0) is tracks[2]
+    assert await player.call('remove', 1) is tracks[0]
+    assert list(player.queue.copy()) == [tracks[2], tracks[1]]
+    assert await player.call('clear_queue') == 2
+    assert not player.queue
+    player.close()
+
+
+async def test_enqueue_skips_track_already_in_queue(monkeypatch):
+    monkeypatch.setattr(guild_player, 'PREDOWNLOAD_TRACKS', 0)
+    player = make_player()
+    player.cog.duplicate_policy[1] = 'skip'
+
+    assert await player.call('enqueue', None, [make_track(0)]) == (1, 0)
+    assert await player.call('enqueue', None, [make_track(0)]) == (None, 1)
+    assert len(player.queue) == 1
+    player.close()
+
+
+async def test_enqueue_warns_about_track_already_in_queue(monkeypatch):
+    monkeypatch.setattr(guild_player, 'PREDOWNLOAD_TRACKS', 0)
+    player = make_player()
+    player.cog.duplicate_policy[1] = 'warn'
+
+    assert await player.call('enqueue', None, [make_track(0)]) == (1, 0)
+    assert await player.call('enqueue', None, [make_track(0)]) == (2, 1)
+    assert len(player.queue) == 2
+
+    # Bez sprawdzania (playlista stosuje politykę sama) utwór jest dodawany bez ostrzeżenia
+    assert await player.call('enqueue', None, [make_track(0)], False) == (3, 0)
+    player.close()
+
+
+async def test_source_is_cleaned_up_when_start_fails(monkeypatch):
+    player = make_player()
+    track = make_track(0)
+    player.queue.append(track)
+
+    def play(source, after=None):
+        raise discord.ClientException("Not connected to voice.")
+
+    player.guild.voice_client = SimpleNamespace(
+        is_connected=lambda: True, is_playing=lambda: False, is_paused=lambda: False,
+        encoder=object(), play=play
+    )
+    source = SimpleNamespace(title='Track', track=track, is_opus=lambda: False,
+                             fade_in=lambda ms: None, cleaned_up=False)
+    source.cleanup = lambda: setattr(source, 'cleaned_up', True)
+
+    async def get_volume(guild_id):
+        return 1.0
+
+    player.cog._get_volume = get_volume
+    monkeypatch.setattr(guild_player.YTDLSource, 'from_track', lambda track, volume: source)
+
+    await player.call('play_next', None)
+
+    assert source.cleaned_up
+    assert 1 not in player.cog.now_playing
+    player.close()
+
+
+async def test_announcement_errors_are_logged_and_task_released(monkeypatch):
+    player = make_player()
+    errors = []
+    monkeypatch.setattr(guild_player.logger, 'error', errors.append)
+
+    async def send_now_playing_embed(ctx):
+        raise RuntimeError("channel gone")
+
+    player.cog.command_channels = {1: object()}
+    player.cog._send_now_playing_embed = send_now_playing_embed
+    player.ctx = object()
+
+    player._announce()
+    assert len(player.announcements) == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert not player.announcements
+    assert errors and "channel gone" in errors[0]
+    player.close()
+
+
+async def test_volume_command_sets_current_source_volume():
+    player = make_player()
+    source = SimpleNamespace(volume=1.0)
+    player.guild.voice_client = SimpleNamespace(source=source)
+
+    await player.call('volume', 0.5)
+    assert source.volume == 0.5
+    player.close()
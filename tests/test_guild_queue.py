@@ -0,0 +1,147 @@
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+from cogs.music.guild_queue import GuildQueue, track_key
+
+
+def make_track(video_id=None, duration=60, requester_id=1, url=None):
+    """Minimalny utwór z polami używanymi przez GuildQueue"""
+    return SimpleNamespace(
+        id=video_id,
+        url=url or f"https://www.youtube.com/watch?v={video_id}",
+        duration_raw=duration,
+        requester=SimpleNamespace(id=requester_id) if requester_id is not None else None
+    )
+
+
+def test_key_from_insertion_is_removed_after_id_becomes_known():
+    # Wpis playlisty bez id jest indeksowany linkiem, a id uzupełnia dopiero odświeżenie
+    track = make_track(None, url="https://www.youtube.com/watch?v=ccccccccccc")
+    queue = GuildQueue([track])
+    assert queue.has(track.url)
+
+    track.id = "ccccccccccc"
+    queue.popleft()
+
+    assert not queue.has(track.url)
+    assert not queue.has("ccccccccccc")
+
+
+def test_update_duration_moves_key_to_known_id():
+    track = make_track(None, url="https://www.youtube.com/watch?v=ddddddddddd")
+    queue = GuildQueue([track])
+
+    track.id = "ddddddddddd"
+    queue.update_duration(track)
+
+    assert queue.has("ddddddddddd")
+    assert not queue.has(track.url)
+    queue.clear()
+    assert not queue.has("ddddddddddd")
+
+
+def assert_totals_match_contents(queue):
+    """Liczniki utrzymywane przyrostowo muszą zgadzać się z przeliczeniem od zera"""
+    tracks = list(queue)
+    assert queue.total_duration == sum(track.duration_raw for track in tracks)
+    for track in tracks:
+        assert queue.has(track_key(track))
+    requesters = Counter(track.requester.id for track in tracks)
+    for user_id, count in requesters.items():
+        assert queue.requester_count(user_id) == count
+    assert sum(queue._keys.values()) == len(tracks)
+
+
+def test_totals_follow_append_insert_and_removal():
+    queue = GuildQueue()
+    queue.append(make_track("aaaaaaaaaaa", 100, requester_id=1))
+    queue.extend([make_track("bbbbbbbbbbb", 50, requester_id=2), make_track("ccccccccccc", 30, requester_id=1)])
+    queue.insert(0, make_track("ddddddddddd", 20, requester_id=3))
+    queue.insert(2, make_track("eeeeeeeeeee", 10, requester_id=2))
+
+    assert queue.total_duration == 210
+    assert queue.requester_count(1) == 2
+    assert queue.format_total_duration() == "3m 30s"
+    assert_totals_match_contents(queue)
+
+    assert queue.popleft().id == "ddddddddddd"
+    assert queue.remove_at(1).id == "eeeeeeeeeee"
+    assert queue.total_duration == 180
+    assert queue.requester_count(3) == 0
+    assert not queue.has("ddddddddddd")
+    assert_totals_match_contents(queue)
+
+
+def test_move_and_shuffle_keep_totals():
+    queue = GuildQueue([make_track(f"{i:011d}", 10 * i, requester_id=i % 3) for i in range(1, 8)])
+    version = queue.version
+
+    moved = queue.move(0, 5)
+    assert queue[5] is moved
+    queue.shuffle()
+
+    assert queue.version == version + 2
+    assert queue.total_duration == 280
+    assert_totals_match_contents(queue)
+
+
+def test_duplicate_entries_are_counted_separately():
+    track = make_track("aaaaaaaaaaa", 60)
+    queue = GuildQueue([track, track])
+
+    queue.popleft()
+    assert queue.has("aaaaaaaaaaa")
+    assert queue.total_duration == 60
+    queue.popleft()
+    assert not queue.has("aaaaaaaaaaa")
+    assert queue.total_duration == 0
+
+
+def test_update_duration_adjusts_total_once_per_entry():
+    track = make_track("aaaaaaaaaaa", 0)
+    queue = GuildQueue([track, make_track("bbbbbbbbbbb", 40), track])
+
+    track.duration_raw = 100
+    queue.update_duration(track)
+    assert queue.total_duration == 240
+
+    # Usunięcie odejmuje aktualny czas trwania, a nie ten sprzed odświeżenia
+    queue.popleft()
+    assert queue.total_duration == 140
+    assert_totals_match_contents(queue)
+
+
+def test_clear_resets_everything():
+    queue = GuildQueue([make_track(f"{i:011d}", 30) for i in range(5)])
+    queue.clear()
+
+    assert len(queue) == 0
+    assert queue.total_duration == 0
+    assert queue.requester_count(1) == 0
+    assert not queue.has("00000000000")
+    assert queue.format_total_duration() == "0m 0s"
+
+
+def test_random_operations_keep_totals_consistent():
+    rng = random.Random(0)
+    queue = GuildQueue()
+    pool = [make_track(f"{i:011d}", rng.randint(1, 600), requester_id=rng.randint(1, 4)) for i in range(20)]
+
+    for _ in range(500):
+        operation = rng.choice(["append", "insert", "popleft", "remove_at", "move", "shuffle"])
+        if operation == "append":
+            queue.append(rng.choice(pool))
+        elif operation == "insert":
+            queue.insert(rng.randint(0, len(queue)), rng.choice(pool))
+        elif not queue:
+            continue
+        elif operation == "popleft":
+            queue.popleft()
+        elif operation == "remove_at":
+            queue.remove_at(rng.randrange(len(queue)))
+        elif operation == "move":
+            queue.move(rng.randrange(len(queue)), rng.randrange(len(queue)))
+        else:
+            queue.shuffle()
+        assert_totals_match_contents(queue)
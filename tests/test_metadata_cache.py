@@ -0,0 +1,94 @@
+import time
+
+from utils import helpers
+from utils.helpers import MetadataCache
+
+VIDEO_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+
+def make_data(expire=None, **fields):
+    stream_url = "https://rr1.googlevideo.com/videoplayback?itag=251"
+    if expire is not None:
+        stream_url += f"&expire={int(expire)}"
+    data = {'id': 'aaaaaaaaaaa', 'title': 'Track', 'duration': 200, 'url': stream_url, 'formats': [{}]}
+    data.update(fields)
+    return data
+
+
+def test_valid_stream_url_is_returned(tmp_path):
+    cache = MetadataCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.put(make_data(expire=time.time() + 6 * 3600))
+
+    data = cache.get(VIDEO_URL)
+    assert data['title'] == 'Track'
+    assert data['url'].startswith("https://rr1.googlevideo.com/")
+    # Zapisywane są tylko pola z CACHED_FIELDS
+    assert 'formats' not in data
+
+
+def test_expiring_stream_url_is_dropped_but_metadata_kept(tmp_path):
+    cache = MetadataCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.put(make_data(expire=time.time() + helpers.STREAM_URL_REFRESH_MARGIN / 2))
+
+    data = cache.get(VIDEO_URL)
+    assert data['title'] == 'Track'
+    assert 'url' not in data
+
+
+def test_entries_older_than_ttl_are_misses(tmp_path):
+    cache = MetadataCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.put(make_data())
+    cache._memory['aaaaaaaaaaa']['updated_at'] = time.time() - 120
+
+    assert cache.get(VIDEO_URL) is None
+    assert cache.misses == 1
+
+
+def test_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = MetadataCache(path=path)
+    cache.put(make_data())
+    cache.flush()
+
+    reopened = MetadataCache(path=path)
+    assert reopened.get(VIDEO_URL)['title'] == 'Track'
+    assert reopened.disk_hits == 1
+
+
+def test_expired_rows_are_pruned_on_startup(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = MetadataCache(path=path)
+    cache.put(make_data())
+    cache._writer.execute("UPDATE tracks SET updated_at = ?", (time.time() - 120,))
+    cache.flush()
+
+    MetadataCache(path=path, ttl=60)
+    assert MetadataCache(path=path).get(VIDEO_URL) is None
+
+
+def test_refresh_keeps_measured_loudness(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = MetadataCache(path=path)
+    cache.put(make_data())
+    cache.set_loudness('aaaaaaaaaaa', -9.5)
+
+    # Odświeżenie adresu strumienia zwraca dane bez głośności
+    cache.put(make_data(title='Track (refreshed)'))
+    assert cache.get(VIDEO_URL)['loudness'] == -9.5
+
+    cache.flush()
+    assert MetadataCache(path=path).get(VIDEO_URL)['loudness'] == -9.5
+
+
+def test_periodic_prune_removes_expired_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = MetadataCache(path=path, ttl=60)
+    cache.put(make_data())
+    cache._writer.execute("UPDATE tracks SET updated_at = ?", (time.time() - 120,))
+
+    monkeypatch.setattr(helpers, 'CACHE_PRUNE_INTERVAL', 0)
+    cache.put(make_data(id='bbbbbbbbbbb'))
+    cache.flush()
+
+    rows = cache._db.execute("SELECT id FROM tracks").fetchall()
+    assert rows == [('bbbbbbbbbbb',)]
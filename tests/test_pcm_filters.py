@@ -0,0 +1,74 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from utils.helpers import FRAME_BYTES, FRAME_SAMPLES, FadeFilter, GainFilter, PCMFilterChain
+
+
+def make_frame(size=FRAME_BYTES, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-20000, 20000, size // 2, dtype=np.int16).tobytes()
+
+
+def samples(frame):
+    return np.frombuffer(frame, dtype=np.int16).astype(np.int32)
+
+
+@pytest.mark.parametrize("gain", [0.25, 0.5, 0.8, 1.7])
+def test_gain_matches_audioop_mul(gain):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+
+    frame = make_frame()
+    chain = PCMFilterChain([GainFilter(gain)])
+
+    expected = samples(audioop.mul(frame, 2, gain))
+    assert np.abs(samples(chain.process(frame)) - expected).max() <= 1
+
+
+def test_gain_clips_instead_of_wrapping():
+    frame = np.full(FRAME_BYTES // 2, 30000, dtype=np.int16).tobytes()
+    out = samples(PCMFilterChain([GainFilter(2.0)]).process(frame))
+    assert out.min() == out.max() == 32767
+
+
+def test_unity_gain_returns_frame_unchanged():
+    frame = make_frame()
+    assert PCMFilterChain([GainFilter(1.0), FadeFilter()]).process(frame) is frame
+
+
+def test_short_tail_frame_is_processed():
+    frame = make_frame(size=FRAME_BYTES // 3)
+    out = PCMFilterChain([GainFilter(0.5)]).process(frame)
+
+    assert len(out) == len(frame)
+    assert np.abs(samples(out) - samples(frame) * 0.5).max() <= 1
+
+
+def test_fade_out_lasts_the_requested_number_of_frames():
+    fader = FadeFilter()
+    chain = PCMFilterChain([fader])
+    frame = make_frame()
+
+    fader.fade_out(15)
+    frames = 0
+    while not fader.finished:
+        chain.process(frame)
+        frames += 1
+
+    assert frames == 15
+
+
+def test_fade_in_ramps_within_a_frame():
+    fader = FadeFilter()
+    fader.fade_in(4)
+    frame = np.full(FRAME_BYTES // 2, 10000, dtype=np.int16).tobytes()
+
+    out = samples(PCMFilterChain([fader]).process(frame)).reshape(FRAME_SAMPLES, 2)
+
+    # Pierwsza ramka narasta od ciszy do 1/4 pełnej głośności
+    assert out[0, 0] == 0
+    assert np.all(np.diff(out[:, 0]) >= 0)
+    assert out[-1, 0] == pytest.approx(2500, abs=5)
@@ -0,0 +1,48 @@
+import time
+
+from utils.helpers import QueryIndex, normalize_query
+
+
+def test_normalize_query_ignores_case_whitespace_and_punctuation():
+    assert normalize_query("  Daft Punk -  One More Time!! ") == "daft punk one more time"
+
+
+def test_normalize_query_strips_diacritics():
+    assert normalize_query("Zażółć  Gęślą") == normalize_query("zazolc gesla")
+    assert normalize_query("Łąka") == "laka"
+
+
+def test_normalize_query_keeps_distinct_phrases_apart():
+    assert normalize_query("one more time") != normalize_query("one more tim")
+
+
+def test_query_index_survives_restart(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = QueryIndex(path=path)
+    index.put("Zażółć Gęślą", "aaaaaaaaaaa")
+    index.flush()
+
+    assert QueryIndex(path=path).get("zazolc gesla") == "aaaaaaaaaaa"
+
+
+def test_query_index_expires_old_mappings(tmp_path):
+    index = QueryIndex(path=str(tmp_path / "index.sqlite3"), ttl=60)
+    index.put("phrase", "aaaaaaaaaaa")
+    key = normalize_query("phrase")
+    index._memory[key] = ("aaaaaaaaaaa", time.time() - 120)
+
+    assert index.get("phrase") is None
+    index.flush()
+    # Przeterminowane powiązanie znika także z dysku
+    assert QueryIndex(path=index.path, ttl=3600).get("phrase") is None
+
+
+def test_query_index_discard(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = QueryIndex(path=path)
+    index.put("phrase", "aaaaaaaaaaa")
+    index.discard("PHRASE")
+    index.flush()
+
+    assert index.get("phrase") is None
+    assert QueryIndex(path=path).get("phrase") is None
@@ -0,0 +1,366 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from config import AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB
+from utils.logger import get_logger
+
+# Inicjalizacja loggera
+logger = get_logger("audio_cache")
+
+# Katalog na pliki w trakcie pobierania (ten sam system plików - os.replace jest atomowe)
+PARTIAL_DIR_NAME = '.partial'
+
+# Katalog dawnych plików tymczasowych (sprzed cache audio)
+LEGACY_TEMP_DIR = 'temp'
+
+# Format plików w cache - Ogg/Opus 48 kHz, czyli dokładnie to, co Discord przyjmuje bez dekodowania
+OPUS_EXTENSION = '.opus'
+OPUS_BITRATE = '128k'
+TRANSCODE_TIMEOUT = 300
+
+
+def is_opus_file(path):
+    """Sprawdza, czy plik z cache jest w formacie Ogg/Opus"""
+    return path.endswith(OPUS_EXTENSION)
+
+
+def transcode_to_opus(source_path, copy=False):
+    """
+    Zamienia pobrany plik na Ogg/Opus 48 kHz (wywołanie blokujące - uruchamiać w executorze).
+
+    Args:
+        source_path: Ścieżka pobranego pliku
+        copy: Czy dźwięk jest już w Opus (wystarczy zmiana kontenera, bez kodowania)
+
+    Returns:
+        str: Ścieżka pliku Ogg/Opus lub pliku źródłowego, jeśli konwersja się nie powiodła
+    """
+    if is_opus_file(source_path):
+        return source_path
+
+    target_path = os.path.splitext(source_path)[0] + OPUS_EXTENSION
+    if copy:
+        codec = ['-c:a', 'copy']
+    else:
+        codec = ['-c:a', 'libopus', '-b:a', OPUS_BITRATE, '-ar', '48000', '-ac', '2']
+
+    command = [
+        'ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+        '-i', source_path, '-vn', '-map', '0:a:0', *codec, '-f', 'ogg', target_path
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError) as e:
+        # Bez konwersji plik nadal nadaje się do odtwarzania (przez dekodowanie do PCM)
+        logger.warning(f"Nie udało się przekonwertować {source_path} do Opus: {e}")
+        try:
+            os.unlink(target_path)
+        except OSError:
+            pass
+        return source_path
+
+    os.unlink(source_path)
+    return target_path
+
+
+# Podsumowanie filtra ebur128: "I:  -14.2 LUFS" (głośność zintegrowana)
+INTEGRATED_LOUDNESS_PATTERN = re.compile(r'I:\s+(-?\d+(?:\.\d+)?) LUFS')
+
+
+def measure_loudness(path):
+    """
+    Mierzy głośność zintegrowaną pliku według EBU R128 (wywołanie blokujące).
+
+    Args:
+        path: Ścieżka pliku audio
+
+    Returns:
+        Optional[float]: Głośność w LUFS lub None, jeśli pomiar się nie powiódł
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-hide_banner', '-i', path,
+        '-vn', '-af', 'ebur128=framelog=verbose', '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Nie udało się zmierzyć głośności {path}: {e}")
+        return None
+
+    matches = INTEGRATED_LOUDNESS_PATTERN.findall(result.stderr.decode(errors='replace'))
+    if not matches:
+        return None
+    loudness = float(matches[-1])
+
+    # Cisza daje -70 LUFS (próg bramkowania) - nie ma czego wyrównywać
+    return loudness if loudness > -70 else None
+
+
+class AudioCache:
+    """
+    Lokalny cache plików audio na dysku.
+
+    Pliki są zapisywane pod identyfikatorem filmu, więc ten sam utwór nigdy nie
+    jest pobierany dwa razy. Łączny rozmiar jest ograniczony limitem - po jego
+    przekroczeniu usuwane są najdawniej używane pliki (LRU), z pominięciem
+    utworów przypiętych (odtwarzanych lub czekających w kolejce). Stan cache
+    jest zapisywany w pliku indeksu, więc start bota nie wymaga skanowania
+    katalogu, a pliki trafiają do cache atomowo (os.replace z katalogu .partial).
+    Indeks jest wczytywany przy pierwszym użyciu - sam import modułu (także
+    w procesach roboczych ekstrakcji) nie zmienia niczego na dysku.
+    """
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.partial_dir = os.path.join(directory, PARTIAL_DIR_NAME)
+        self.index_path = os.path.join(directory, 'index.json')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # id filmu -> {'file', 'size', 'last_used'}, od najdawniej używanego
+        self._total = 0
+        self._dirty = False
+        self._pinned = lambda: set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def remove_partial_files(self):
+        """
+        Usuwa porzucone pliki częściowe (wywoływać przy starcie bota, przed pierwszym pobraniem).
+
+        Pobierania przerwane przy poprzednim wyłączeniu bota nie dokończą się.
+        """
+        if not os.path.isdir(self.partial_dir):
+            return
+        for filename in os.listdir(self.partial_dir):
+            try:
+                os.unlink(os.path.join(self.partial_dir, filename))
+            except OSError as e:
+                logger.warning(f"Nie udało się usunąć pliku częściowego {filename}: {e}")
+
+    def _ensure_loaded(self):
+        """Wczytuje indeks przy pierwszym użyciu cache"""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        """Wczytuje indeks z dysku"""
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Nieprawidłowy indeks cache audio, zaczynam od pustego: {e}")
+            entries = {}
+
+        for video_id, entry in sorted(entries.items(), key=lambda item: item[1].get('last_used', 0)):
+            self._entries[video_id] = entry
+            self._total += entry.get('size', 0)
+
+        logger.info(f"Cache audio: {len(self._entries)} plików, {self._total / 1024 / 1024:.1f} MB")
+
+    def _save(self):
+        """Zapisuje indeks atomowo (plik tymczasowy + os.replace)"""
+        temp_path = self.index_path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'entries': self._entries}, f)
+            os.replace(temp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.error(f"Błąd zapisu indeksu cache audio: {e}")
+
+    def _forget(self, video_id):
+        """Usuwa wpis z indeksu (bez usuwania pliku)"""
+        entry = self._entries.pop(video_id, None)
+        if entry is not None:
+            self._total -= entry.get('size', 0)
+            self._dirty = True
+        return entry
+
+    def set_pin_source(self, pinned):
+        """
+        Ustawia funkcję zwracającą identyfikatory utworów, których nie wolno usunąć.
+
+        Args:
+            pinned: Funkcja bez argumentów zwracająca zbiór id filmów
+        """
+        self._pinned = pinned
+
+    def partial_template(self):
+        """Szablon ścieżki pobierania yt-dlp (outtmpl) w katalogu plików częściowych"""
+        return os.path.join(self.partial_dir, '%(id)s.%(ext)s')
+
+    def has(self, video_id):
+        """Sprawdza, czy utwór jest w cache (bez aktualizacji statystyk i kolejności LRU)"""
+        self._ensure_loaded()
+        return video_id is not None and video_id in self._entries
+
+    def get(self, video_id):
+        """
+        Zwraca ścieżkę pliku z cache i oznacza go jako ostatnio używany.
+
+        Args:
+            video_id: Identyfikator filmu
+
+        Returns:
+            Optional[str]: Ścieżka pliku lub None, jeśli utworu nie ma w cache
+        """
+        if video_id is None:
+            return None
+
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            path = os.path.join(self.directory, entry['file'])
+            if not os.path.exists(path):
+                # Plik usunięty spoza bota - indeks był nieaktualny
+                self._forget(video_id)
+                self.misses += 1
+                return None
+
+            entry['last_used'] = time.time()
+            self._entries.move_to_end(video_id)
+            self._dirty = True
+            self.hits += 1
+            return path
+
+    def store(self, video_id, source_path):
+        """
+        Przenosi pobrany plik do cache i w razie potrzeby zwalnia miejsce.
+
+        Args:
+            video_id: Identyfikator filmu
+            source_path: Ścieżka pobranego pliku (najlepiej w katalogu .partial)
+
+        Returns:
+            str: Docelowa ścieżka pliku w cache
+        """
+        extension = os.path.splitext(source_path)[1]
+        filename = f"{video_id}{extension}"
+        path = os.path.join(self.directory, filename)
+
+        self._ensure_loaded()
+        with self._lock:
+            previous = self._forget(video_id)
+            os.replace(source_path, path)
+            if previous and previous['file'] != filename:
+                self._remove_file(previous['file'])
+
+            size = os.path.getsize(path)
+            self._entries[video_id] = {'file': filename, 'size': size, 'last_used': time.time()}
+            self._total += size
+            self._evict()
+            self._save()
+        return path
+
+    def _remove_file(self, filename):
+        """Usuwa plik z katalogu cache, ignorując brak pliku"""
+        try:
+            os.unlink(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Nie udało się usunąć pliku cache {filename}: {e}")
+
+    def _evict(self):
+        """Usuwa najdawniej używane, nieprzypięte pliki, dopóki cache przekracza limit"""
+        if self._total <= self.max_bytes:
+            return 0
+
+        pinned = self._pinned()
+        removed = 0
+        for video_id in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if video_id in pinned:
+                continue
+            entry = self._forget(video_id)
+            self._remove_file(entry['file'])
+            removed += 1
+
+        if removed:
+            logger.info(f"Cache audio: usunięto {removed} najdawniej używanych plików")
+        return removed
+
+    def cleanup(self):
+        """
+        Pilnuje limitu rozmiaru i zapisuje indeks (wywołanie blokujące).
+
+        Returns:
+            int: Liczba usuniętych plików
+        """
+        self._ensure_loaded()
+        with self._lock:
+            removed = self._evict()
+            if self._dirty:
+                self._save()
+        return removed
+
+    def stats(self):
+        """Zwraca rozmiar i skuteczność cache"""
+        self._ensure_loaded()
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'size_mb': self._total / 1024 / 1024,
+            'max_mb': self.max_bytes / 1024 / 1024,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+def cleanup_temp_files(hours=24):
+    """
+    Wspólne czyszczenie plików audio (wywołanie blokujące - uruchamiać w executorze).
+
+    Pilnuje limitu cache audio, usuwa porzucone pliki częściowe oraz pliki
+    z dawnego katalogu temp starsze niż `hours` godzin.
+
+    Args:
+        hours: Maksymalny wiek plików częściowych i tymczasowych w godzinach
+
+    Returns:
+        Tuple[int, int]: Liczba usuniętych plików i zwolnione bajty
+    """
+    removed_count = audio_cache.cleanup()
+    total_size_removed = 0
+    max_age_seconds = hours * 3600
+    current_time = time.time()
+
+    for directory in (audio_cache.partial_dir, LEGACY_TEMP_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for filename in os.listdir(directory):
+            file_path = os.path.join(directory, filename)
+            try:
+                if not os.path.isfile(file_path):
+                    continue
+                if current_time - os.path.getmtime(file_path) > max_age_seconds:
+                    file_size = os.path.getsize(file_path)
+                    os.unlink(file_path)
+                    removed_count += 1
+                    total_size_removed += file_size
+            except OSError as e:
+                logger.error(f"Błąd podczas próby usunięcia pliku {file_path}: {e}")
+
+    return removed_count, total_size_removed
+
+
+audio_cache = AudioCache()
@@ -1,14 +1,39 @@
 import asyncio
 import functools
+import heapq
+import itertools
 import discord
 import yt_dlp
 import re
 import time
 import os
 import random
+import json
+import queue
+import sqlite3
+import threading
 import traceback
+import unicodedata
+from collections import OrderedDict, deque
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse, parse_qs
+from discord.oggparse import OggStream
+import numpy as np
+from config import (
+    STREAM_URL_REFRESH_MARGIN, YTDL_POOL_SIZE, YTDL_WORKERS, YTDL_GUILD_CONCURRENCY, YTDL_BACKEND,
+    METADATA_CACHE_PATH, METADATA_CACHE_SIZE, METADATA_CACHE_TTL_DAYS, QUERY_INDEX_TTL_DAYS,
+    LOUDNESS_NORMALIZATION, LOUDNESS_TARGET,
+    DOWNLOAD_CONCURRENCY, DOWNLOAD_RATE_LIMIT_KB, DOWNLOAD_TIMEOUT
+)
 from utils.logger import get_logger
+from utils import ytdl_worker
+from utils.ytdl_worker import trim_info
+from utils.audio_cache import audio_cache, is_opus_file, transcode_to_opus, measure_loudness
 
 # Inicjalizacja loggera
 logger = get_logger("youtube")
@@ -32,80 +57,1556 @@ ytdl_options = {
     'source_address': '0.0.0.0'  # Bind to ipv4
 }
 
-# Inicjalizacja yt-dlp
-ytdl = yt_dlp.YoutubeDL(ytdl_options)
+# Profile opcji yt-dlp - każdy profil ma własną pulę instancji YoutubeDL
+ytdl_profiles = {
+    # Pobieranie informacji i adresu strumienia pojedynczego utworu
+    'stream': {**ytdl_options, 'skip_download': True},
+    # Mniej wymagający format, używany przy ostatniej próbie
+    'stream_low': {**ytdl_options, 'format': 'worstaudio', 'skip_download': True},
+    # Pobieranie pliku do cache audio (najpierw do katalogu plików częściowych)
+    'download': {
+        **ytdl_options,
+        'outtmpl': audio_cache.partial_template(),
+        'skip_download': False,
+        # Limit prędkości, żeby pobieranie w tle nie konkurowało z odtwarzanymi strumieniami
+        'ratelimit': DOWNLOAD_RATE_LIMIT_KB * 1024 if DOWNLOAD_RATE_LIMIT_KB > 0 else None
+    },
+    # Wyszukiwanie (zapytania w postaci ytsearchN:fraza)
+    'search': {
+        'format': 'bestaudio/best',
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'noplaylist': True
+    },
+    # Lista utworów playlisty bez pełnych informacji o każdym z nich
+    'playlist': {
+        **ytdl_options,
+        'noplaylist': False,
+        'extract_flat': True,
+        'force_generic_extractor': False
+    }
+}
+
+
+class YTDLPool:
+    """
+    Pula wielokrotnie używanych instancji YoutubeDL.
+    
+    Tworzenie YoutubeDL ładuje wszystkie ekstraktory, więc instancje są tworzone
+    raz i wypożyczane na czas pojedynczego wywołania. Instancja jest używana
+    przez jeden wątek naraz, dzięki czemu ekstrakcja jest bezpieczna współbieżnie.
+    """
+
+    def __init__(self, profiles, size=YTDL_POOL_SIZE):
+        self.profiles = profiles
+        self.size = max(1, size)
+        self._idle = {name: queue.LifoQueue() for name in profiles}
+        self._created = {name: 0 for name in profiles}
+        self._lock = threading.Lock()
+
+    def _create(self, profile):
+        """Tworzy nową instancję YoutubeDL dla profilu"""
+        return yt_dlp.YoutubeDL(dict(self.profiles[profile]))
+
+    def warm_up(self, count=1):
+        """Tworzy z wyprzedzeniem `count` instancji dla każdego profilu"""
+        for profile in self.profiles:
+            while True:
+                with self._lock:
+                    if self._created[profile] >= min(count, self.size):
+                        break
+                    self._created[profile] += 1
+                self._idle[profile].put(self._create(profile))
+
+    def _acquire(self, profile):
+        """Pobiera wolną instancję, tworząc nową, jeśli pula nie jest pełna"""
+        idle = self._idle[profile]
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_create = self._created[profile] < self.size
+            if can_create:
+                self._created[profile] += 1
+        
+        if can_create:
+            return self._create(profile)
+        
+        # Pula jest pełna - czekaj na zwolnienie instancji
+        return idle.get()
+
+    @contextmanager
+    def checkout(self, profile):
+        """Wypożycza instancję YoutubeDL na czas bloku with"""
+        ydl = self._acquire(profile)
+        try:
+            yield ydl
+        finally:
+            self._idle[profile].put(ydl)
+
+    def extract_info(self, profile, url, download=False, formats=False):
+        """
+        Wykonuje extract_info na instancji z puli (wywoływać w executorze).
+        
+        Wynik jest pełny (z listą formatów), więc `formats` nie ma tu znaczenia -
+        parametr zachowuje zgodność z YTDLProcessPool.
+        """
+        with self.checkout(profile) as ydl:
+            data = ydl.extract_info(url, download=download)
+            
+            # Przy pobieraniu zapamiętaj ścieżkę pliku, póki mamy instancję z właściwym szablonem
+            if download and data is not None:
+                entry = data['entries'][0] if data.get('entries') else data
+                entry.setdefault('_filename', ydl.prepare_filename(entry))
+            return data
+
+    def clear_cache(self):
+        """Czyści dyskowy cache yt-dlp (wspólny dla wszystkich instancji)"""
+        with self.checkout('stream') as ydl:
+            ydl.cache.remove()
+
+
+# Inicjalizacja puli yt-dlp
+class YTDLProcessPool:
+    """
+    Ekstrakcja yt-dlp w osobnych procesach roboczych.
+    
+    Każdy proces trzyma własne, długo żyjące instancje YoutubeDL (utworzone
+    przy starcie procesu), a wynik jest przycinany do używanych pól, zanim
+    zostanie zserializowany i odesłany. Interfejs jest taki sam jak YTDLPool;
+    wywołania blokują wątek harmonogramu, ale nie trzymają GIL procesu bota.
+    Pula uszkodzona przez nagłą śmierć procesu roboczego (BrokenProcessPool)
+    jest zastępowana nową.
+    """
+
+    def __init__(self, profiles, workers=YTDL_WORKERS):
+        self.profiles = profiles
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+
+    def _create_executor(self):
+        """Tworzy pulę procesów roboczych"""
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=ytdl_worker.init,
+            initargs=(self.profiles,)
+        )
+
+    def _restart(self, broken):
+        """Zastępuje uszkodzoną pulę nową (raz, nawet jeśli błąd zgłosi kilka wątków)"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.warning("Proces roboczy ekstrakcji zakończył się nagle - tworzę nową pulę procesów")
+            self._executor = self._create_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, fn, *args):
+        """Wykonuje funkcję w procesie roboczym i czeka na wynik"""
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # Bieżące wywołanie kończy się błędem (ponowi je _extract_info), kolejne trafią do nowej puli
+            self._restart(executor)
+            raise
+
+    def warm_up(self, count=None):
+        """Uruchamia procesy robocze z wyprzedzeniem, żeby pierwsze zapytania nie czekały na start"""
+        for _ in range(count or self.workers):
+            self._executor.submit(ytdl_worker.ping)
+
+    def extract_info(self, profile, url, download=False, formats=False):
+        """Wykonuje extract_info w procesie roboczym (wywoływać w executorze)"""
+        return self._call(ytdl_worker.extract, profile, url, download, formats)
+
+    def clear_cache(self):
+        """Czyści dyskowy cache yt-dlp (wspólny dla wszystkich procesów)"""
+        self._call(ytdl_worker.clear_cache)
+
+    def shutdown(self):
+        """Zamyka procesy robocze"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_ytdl_backend(backend=YTDL_BACKEND):
+    """
+    Tworzy pulę ekstrakcji dla wybranego trybu.
+    
+    Args:
+        backend: "thread" lub "process"
+        
+    Returns:
+        YTDLPool lub YTDLProcessPool
+    """
+    if backend == 'process':
+        logger.info(f"Ekstrakcja yt-dlp w {YTDL_WORKERS} procesach roboczych")
+        pool = YTDLProcessPool(ytdl_profiles)
+    else:
+        pool = YTDLPool(ytdl_profiles)
+    pool.warm_up()
+    return pool
+
+
+ytdl_pool = create_ytdl_backend()
+
+
+def create_download_backend(backend=YTDL_BACKEND):
+    """
+    Tworzy pulę dla pobierania plików do cache audio.
+    
+    W trybie procesów pobieranie dostaje własne procesy robocze (DOWNLOAD_CONCURRENCY),
+    więc długie pobrania nie zajmują procesów, na które czekają %play i wyszukiwanie.
+    W trybie wątków wystarczy wspólna pula - pobieranie ma własne wątki
+    (download_scheduler) i własne instancje YoutubeDL profilu 'download'.
+    
+    Args:
+        backend: "thread" lub "process"
+        
+    Returns:
+        YTDLPool lub YTDLProcessPool
+    """
+    if backend == 'process':
+        logger.info(f"Pobieranie do cache audio w {DOWNLOAD_CONCURRENCY} osobnych procesach roboczych")
+        return YTDLProcessPool(ytdl_profiles, workers=DOWNLOAD_CONCURRENCY)
+    return ytdl_pool
+
+
+ytdl_download_pool = create_download_backend()
+
+
+# Priorytety ekstrakcji - niższa wartość jest obsługiwana wcześniej
+PRIORITY_INTERACTIVE = 0  # %play, wyszukiwanie - użytkownik czeka na wynik
+PRIORITY_BACKGROUND = 1   # Utwory playlist, odświeżanie adresów, przygotowanie następnego utworu
+
+
+class ExtractionScheduler:
+    """
+    Harmonogram zadań yt-dlp na osobnej puli wątków.
+    
+    Ekstrakcje nie korzystają z domyślnego executora pętli (współdzielonego
+    z resztą bota). Zadania czekają w kolejce priorytetowej - interaktywne
+    przed tłem - a jeden serwer może zająć najwyżej `guild_limit` wątków,
+    więc import dużej playlisty nie blokuje %play na innych serwerach.
+    """
+    
+    def __init__(self, workers=YTDL_WORKERS, guild_limit=YTDL_GUILD_CONCURRENCY):
+        self.workers = max(1, workers)
+        self.guild_limit = max(1, guild_limit)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytdl")
+        self._pending = []  # Kopiec [priorytet, numer, guild_id, bilet, czas dodania]
+        self._sequence = itertools.count()
+        self._active = 0
+        self._per_guild = {}
+        
+        # Statystyki oczekiwania w kolejce dla każdego priorytetu
+        self._waits = {
+            PRIORITY_INTERACTIVE: {'count': 0, 'total': 0.0, 'max': 0.0},
+            PRIORITY_BACKGROUND: {'count': 0, 'total': 0.0, 'max': 0.0}
+        }
+    
+    def _dispatch(self):
+        """Przydziela wolne wątki zadaniom z kolejki (z pominięciem serwerów u limitu)"""
+        blocked = []
+        while self._pending and self._active < self.workers:
+            entry = heapq.heappop(self._pending)
+            guild_id, ticket = entry[2], entry[3]
+            if ticket.done():
+                continue  # Zadanie anulowane przed startem
+            if guild_id is not None and self._per_guild.get(guild_id, 0) >= self.guild_limit:
+                blocked.append(entry)
+                continue
+            
+            self._active += 1
+            if guild_id is not None:
+                self._per_guild[guild_id] = self._per_guild.get(guild_id, 0) + 1
+            ticket.set_result(None)
+        
+        for entry in blocked:
+            heapq.heappush(self._pending, entry)
+    
+    def _release(self, guild_id):
+        """Zwalnia wątek po zakończeniu zadania i uruchamia kolejne"""
+        self._active -= 1
+        if guild_id is not None:
+            self._per_guild[guild_id] -= 1
+            if self._per_guild[guild_id] <= 0:
+                del self._per_guild[guild_id]
+        self._dispatch()
+    
+    async def run(self, func, *args, priority=PRIORITY_INTERACTIVE, guild_id=None, timeout=None):
+        """
+        Wykonuje blokującą funkcję w puli wątków ekstrakcji.
+        
+        Args:
+            func: Funkcja do wykonania
+            *args: Argumenty funkcji
+            priority: PRIORITY_INTERACTIVE lub PRIORITY_BACKGROUND
+            guild_id: ID serwera, którego dotyczy zadanie (do limitu na serwer)
+            timeout: Limit czasu wykonania w sekundach (bez czasu oczekiwania w kolejce)
+            
+        Returns:
+            Wynik funkcji
+        """
+        loop = asyncio.get_running_loop()
+        ticket = loop.create_future()
+        queued_at = time.monotonic()
+        heapq.heappush(self._pending, [priority, next(self._sequence), guild_id, ticket, queued_at])
+        self._dispatch()
+        
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            # Wątek mógł zostać przydzielony tuż przed anulowaniem
+            if ticket.done() and not ticket.cancelled():
+                self._release(guild_id)
+            else:
+                ticket.cancel()
+            raise
+        
+        waited = time.monotonic() - queued_at
+        waits = self._waits.setdefault(priority, {'count': 0, 'total': 0.0, 'max': 0.0})
+        waits['count'] += 1
+        waits['total'] += waited
+        waits['max'] = max(waits['max'], waited)
+        
+        # Wątek jest zwalniany dopiero po faktycznym zakończeniu funkcji, nawet po timeoucie
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args))
+        future.add_done_callback(lambda _: self._release(guild_id))
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    
+    def stats(self):
+        """Zwraca stan kolejki i czasy oczekiwania (w milisekundach)"""
+        waits = {}
+        for priority, data in self._waits.items():
+            waits[priority] = {
+                'count': data['count'],
+                'avg_ms': data['total'] / data['count'] * 1000 if data['count'] else 0.0,
+                'max_ms': data['max'] * 1000
+            }
+        return {
+            'workers': self.workers,
+            'active': self._active,
+            'pending': sum(1 for entry in self._pending if not entry[3].done()),
+            'guild_limit': self.guild_limit,
+            'waits': waits
+        }
+
+
+extraction_scheduler = ExtractionScheduler()
+
+# Pobieranie plików trwa długo - osobne wątki, żeby nie blokowało ekstrakcji dla %play
+download_scheduler = ExtractionScheduler(workers=DOWNLOAD_CONCURRENCY, guild_limit=DOWNLOAD_CONCURRENCY)
+
+# Opcje FFmpeg dla discord.py
+ffmpeg_options = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 10 -nostdin',
+    'options': '-vn'
+}
+
+# Opcje FFmpeg dla plików z lokalnego cache audio (bez ponawiania połączeń)
+ffmpeg_local_options = {
+    'before_options': '-nostdin',
+    'options': '-vn'
+}
+
+# Liczba ramek audio (po 20 ms) buforowanych z wyprzedzeniem dla następnego utworu
+PREBUFFER_FRAMES = 50
+
+
+class PrebufferedAudio(discord.AudioSource):
+    """
+    Źródło audio, które pozwala wczytać początek utworu przed odtworzeniem.
+    
+    Ramki wczytane przez prebuffer() są oddawane jako pierwsze, więc po
+    przełączeniu utworu dźwięk jest dostępny od razu, bez czekania na start
+    FFmpeg i pierwsze dane ze strumienia.
+    """
+    
+    def __init__(self, original):
+        self.original = original
+        self._frames = deque()
+        self._recording = None
+        self._recorded_max = 0
+        self._recording_complete = False
+    
+    def start_recording(self, max_frames):
+        """
+        Zaczyna zapisywać wszystkie ramki utworu (do odtwarzania w pętli z pamięci).
+        
+        Zapis jest porzucany, jeśli utwór okaże się dłuższy niż `max_frames`.
+        Wywoływać przed rozpoczęciem odczytu.
+        
+        Args:
+            max_frames: Maksymalna liczba ramek do zapisania
+        """
+        self._recording = list(self._frames)
+        self._recorded_max = max_frames
+    
+    def recorded_frames(self):
+        """Zwraca zapisane ramki, jeśli utwór został odczytany w całości (inaczej None)"""
+        return self._recording if self._recording_complete else None
+    
+    def _read_original(self):
+        """Czyta ramkę ze źródła, dopisując ją do zapisu, jeśli jest włączony"""
+        frame = self.original.read()
+        if self._recording is not None:
+            if not frame:
+                self._recording_complete = True
+            elif len(self._recording) < self._recorded_max:
+                self._recording.append(frame)
+            else:
+                self._recording = None  # Utwór jest za długi, by trzymać go w pamięci
+        return frame
+    
+    def prebuffer(self, frames=PREBUFFER_FRAMES):
+        """
+        Wczytuje z wyprzedzeniem początkowe ramki (wywołanie blokujące).
+        
+        Args:
+            frames: Docelowa liczba ramek w buforze
+            
+        Returns:
+            int: Liczba ramek w buforze
+        """
+        while len(self._frames) < frames:
+            frame = self._read_original()
+            if not frame:
+                break
+            self._frames.append(frame)
+        return len(self._frames)
+    
+    def read(self):
+        if self._frames:
+            return self._frames.popleft()
+        return self._read_original()
+    
+    def is_opus(self):
+        return self.original.is_opus()
+    
+    def cleanup(self):
+        self._frames.clear()
+        self.original.cleanup()
+
+
+class MemoryAudio(discord.AudioSource):
+    """Źródło odtwarzające ramki PCM zapisane w pamięci (pętla krótkiego utworu bez sieci i dekodowania)"""
+    
+    def __init__(self, frames):
+        self.frames = frames
+        self._position = 0
+    
+    def read(self):
+        if self._position >= len(self.frames):
+            return b''
+        frame = self.frames[self._position]
+        self._position += 1
+        return frame
+    
+    def is_opus(self):
+        return False
+
+
+class OggOpusAudio(discord.AudioSource):
+    """
+    Źródło odczytujące pakiety Opus wprost z pliku Ogg.
+    
+    Pakiety trafiają do Discorda bez zmian - bez procesu FFmpeg, dekodowania
+    do PCM i ponownego kodowania w discord.py. Głośności nie da się zmienić.
+    """
+    
+    def __init__(self, file_path):
+        self._file = open(file_path, 'rb')
+        self._packets = self._iter_audio_packets()
+    
+    def _iter_audio_packets(self):
+        for packet in OggStream(self._file).iter_packets():
+            # Nagłówki strumienia Opus nie zawierają dźwięku
+            if packet.startswith((b'OpusHead', b'OpusTags')):
+                continue
+            yield packet
+    
+    def read(self):
+        return next(self._packets, b'')
+    
+    def is_opus(self):
+        return True
+    
+    def cleanup(self):
+        self._file.close()
+
+
+# Ramka PCM wysyłana do Discorda: 20 ms, 48 kHz, stereo, 16 bitów
+FRAME_SAMPLES = 960
+FRAME_CHANNELS = 2
+SAMPLE_BYTES = FRAME_CHANNELS * 2
+FRAME_BYTES = FRAME_SAMPLES * SAMPLE_BYTES
+
+# Maksymalne podbicie cichych utworów (+6 dB) - większe groziłoby przesterowaniem
+LOUDNESS_MAX_GAIN = 2.0
+# Różnica poniżej 0.5 dB jest niesłyszalna - utwór zostaje bez korekty
+LOUDNESS_TOLERANCE_DB = 0.5
+
+
+def loudness_gain(loudness):
+    """
+    Oblicza stałe wzmocnienie wyrównujące głośność utworu do LOUDNESS_TARGET.
+    
+    Args:
+        loudness: Głośność zintegrowana utworu w LUFS lub None
+        
+    Returns:
+        float: Mnożnik próbek (1.0, gdy głośność nie jest znana lub wyrównywanie jest wyłączone)
+    """
+    if not LOUDNESS_NORMALIZATION or loudness is None:
+        return 1.0
+    gain_db = LOUDNESS_TARGET - loudness
+    if abs(gain_db) < LOUDNESS_TOLERANCE_DB:
+        return 1.0
+    return min(10 ** (gain_db / 20), LOUDNESS_MAX_GAIN)
+
+
+class PCMFilter:
+    """
+    Filtr ramek PCM w łańcuchu PCMFilterChain.
+    
+    Filtr nieaktywny (is_active() == False) jest pomijany, a gdy nieaktywne
+    są wszystkie, ramka przechodzi bez żadnych obliczeń. Wzmocnienia filtrów
+    stałych na ramkę (scalar = True) są łączone w jedno mnożenie.
+    """
+    
+    scalar = True
+    
+    def is_active(self):
+        return False
+    
+    def gain(self):
+        """Wzmocnienie całej ramki (filtry stałe na ramkę)"""
+        return 1.0
+    
+    def apply(self, samples):
+        """
+        Przetwarza ramkę w miejscu.
+        
+        Args:
+            samples: Tablica float32 o kształcie (próbki, 2) - 960 próbek
+                lub mniej dla niepełnej ostatniej ramki
+        """
+        samples *= self.gain()
+
+
+class GainFilter(PCMFilter):
+    """Stałe wzmocnienie (głośność lub korekta głośności utworu)"""
+    
+    def __init__(self, value=1.0, limit=2.0):
+        self.limit = limit
+        self.value = value
+    
+    @property
+    def value(self):
+        return self._value
+    
+    @value.setter
+    def value(self, value):
+        self._value = min(max(value, 0.0), self.limit)
+    
+    def is_active(self):
+        return self._value != 1.0
+    
+    def gain(self):
+        return self._value
+
+
+class FadeFilter(PCMFilter):
+    """Płynne narastanie lub wyciszanie dźwięku (liniowe, próbka po próbce)"""
+    
+    scalar = False
+    
+    def __init__(self):
+        self.level = 1.0
+        self.target = 1.0
+        self.step = 0.0
+        # Położenie próbek w ramce (0..1) i bufor na rampę bieżącej ramki
+        self._positions = np.arange(FRAME_SAMPLES, dtype=np.float32) / FRAME_SAMPLES
+        self._ramp = np.empty(FRAME_SAMPLES, dtype=np.float32)
+    
+    def fade_in(self, frames):
+        """Zaczyna od ciszy i w ciągu `frames` ramek dochodzi do pełnej głośności"""
+        self.level = 0.0
+        self.target = 1.0
+        self.step = 1.0 / max(1, frames)
+    
+    def fade_out(self, frames):
+        """Wycisza dźwięk w ciągu `frames` ramek (od bieżącego poziomu)"""
+        self.target = 0.0
+        self.step = max(self.level, 0.0) / max(1, frames)
+    
+    @property
+    def finished(self):
+        """Czy wyciszanie dobiegło końca"""
+        return self.target == 0.0 and self.level <= 0.0
+    
+    def is_active(self):
+        return self.level != 1.0 or self.target != 1.0
+    
+    def _advance(self):
+        """Przesuwa poziom o jedną ramkę i zwraca poziom na jej początku i końcu"""
+        start = self.level
+        if start < self.target:
+            self.level = min(self.target, start + self.step)
+        else:
+            self.level = max(self.target, start - self.step)
+        
+        # Błędy zaokrągleń nie mogą przedłużyć wyciszania o dodatkową ramkę
+        if abs(self.level - self.target) < 1e-6:
+            self.level = self.target
+        return start, self.level
+    
+    def apply(self, samples):
+        start, end = self._advance()
+        # Niepełna ramka to początek zwykłej ramki - dostaje początek tej samej rampy
+        count = len(samples)
+        ramp = self._ramp[:count]
+        np.multiply(self._positions[:count], np.float32(end - start), out=ramp)
+        ramp += np.float32(start)
+        samples *= ramp[:, None]
+
+
+class PCMFilterChain:
+    """
+    Łańcuch filtrów ramek PCM (s16le, stereo, 20 ms).
+    
+    Ramka jest czytana przez widok int16 na bufor (bez kopiowania), filtry
+    działają w miejscu na stałym buforze roboczym float32, a wynik trafia do
+    stałego bufora int16 - jedyną alokacją na ramkę są bajty przekazywane
+    do Discorda. Niepełna ostatnia ramka używa początkowej części buforów.
+    """
+    
+    def __init__(self, filters=()):
+        self.filters = list(filters)
+        self._work = np.empty((FRAME_SAMPLES, FRAME_CHANNELS), dtype=np.float32)
+        self._out = np.empty((FRAME_SAMPLES, FRAME_CHANNELS), dtype=np.int16)
+    
+    def add(self, pcm_filter):
+        """Dodaje filtr na końcu łańcucha"""
+        self.filters.append(pcm_filter)
+        return pcm_filter
+    
+    def is_active(self):
+        return any(pcm_filter.is_active() for pcm_filter in self.filters)
+    
+    def process(self, frame):
+        """
+        Przepuszcza ramkę przez aktywne filtry.
+        
+        Args:
+            frame: Ramka PCM (bajty)
+            
+        Returns:
+            bytes: Przetworzona ramka (ta sama, jeśli żaden filtr nie jest aktywny)
+        """
+        active = [pcm_filter for pcm_filter in self.filters if pcm_filter.is_active()]
+        count = min(len(frame) // SAMPLE_BYTES, FRAME_SAMPLES)
+        if not count or not active:
+            return frame
+        
+        gain = 1.0
+        shaped = []
+        for pcm_filter in active:
+            if pcm_filter.scalar:
+                gain *= pcm_filter.gain()
+            else:
+                shaped.append(pcm_filter)
+        
+        # Konwersja do float32 i stałe wzmocnienie w jednej operacji
+        work = self._work[:count]
+        out = self._out[:count]
+        samples = np.frombuffer(frame, dtype=np.int16, count=count * FRAME_CHANNELS).reshape(count, FRAME_CHANNELS)
+        np.multiply(samples, np.float32(gain), out=work)
+        for pcm_filter in shaped:
+            pcm_filter.apply(work)
+        np.clip(work, -32768, 32767, out=work)
+        np.copyto(out, work, casting='unsafe')
+        return out.tobytes()
+
+
+class TransitionStats:
+    """Pomiar przerw między końcem jednego utworu a startem następnego"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+        self.prefetched = 0
+    
+    def record(self, gap, prefetched=False):
+        """
+        Zapisuje zmierzoną przerwę.
+        
+        Args:
+            gap: Przerwa w sekundach
+            prefetched: Czy następny utwór był przygotowany z wyprzedzeniem
+        """
+        self.count += 1
+        self.total += gap
+        self.last = gap
+        self.max = max(self.max, gap)
+        if prefetched:
+            self.prefetched += 1
+    
+    def stats(self):
+        """Zwraca statystyki przerw w milisekundach"""
+        return {
+            'transitions': self.count,
+            'prefetched': self.prefetched,
+            'last_ms': self.last * 1000,
+            'avg_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000
+        }
+
+
+transition_stats = TransitionStats()
+
+# Klasa do obsługi błędów YT-DLP
+class YTDLError(Exception):
+    """Niestandardowy wyjątek dla błędów związanych z YT-DLP"""
+    pass
+
+def format_duration(duration):
+    """Formatuje czas trwania w sekundach do czytelnej postaci."""
+    if not duration:
+        return "00:00"
+
+    minutes, seconds = divmod(int(duration), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    else:
+        return f"{minutes:02d}:{seconds:02d}"
+
+
+def parse_stream_expiry(stream_url):
+    """
+    Odczytuje czas wygaśnięcia adresu strumienia (parametr expire= googlevideo).
+    
+    Args:
+        stream_url: Adres strumienia zwrócony przez yt-dlp
+        
+    Returns:
+        Optional[int]: Znacznik czasu UNIX wygaśnięcia lub None, jeśli nieznany
+    """
+    if not stream_url:
+        return None
+    try:
+        parsed = urlparse(stream_url)
+        expire = parse_qs(parsed.query).get('expire')
+        if expire:
+            return int(expire[0])
+        # Adresy manifestów mają parametry w ścieżce: /expire/1700000000/
+        match = re.search(r'/expire/(\d+)', parsed.path)
+        if match:
+            return int(match.group(1))
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+@dataclass(slots=True, eq=False)
+class TrackInfo:
+    """
+    Zwięzłe metadane utworu - tylko pola, z których korzysta bot.
+
+    Pełny słownik yt-dlp (formaty, napisy, opis, tagi) potrafi zająć setki KB,
+    dlatego nie jest nigdzie przechowywany: dane są przepisywane do tego
+    rekordu zaraz po ekstrakcji, a słownik jest porzucany.
+    """
+    id: Optional[str] = None
+    title: str = 'Unknown'
+    url: Optional[str] = None
+    uploader: str = 'Unknown'
+    uploader_url: Optional[str] = None
+    thumbnail: Optional[str] = None
+    duration_raw: int = 0
+    views: Optional[int] = 0
+    likes: Optional[int] = 0
+    loudness: Optional[float] = None  # Głośność zintegrowana w LUFS (EBU R128), jeśli znana
+
+    @property
+    def duration(self):
+        """Czas trwania w czytelnej postaci (np. 03:25)"""
+        return format_duration(self.duration_raw)
+
+    def update_info(self, data):
+        """Ustawia metadane na podstawie danych yt-dlp."""
+        self.id = data.get('id')
+        self.title = data.get('title', 'Unknown')
+        self.url = data.get('webpage_url', f'https://www.youtube.com/watch?v={self.id}')
+        self.uploader = data.get('uploader', 'Unknown')
+        self.uploader_url = data.get('uploader_url', None)
+        self.thumbnail = data.get('thumbnail', None)
+        self.duration_raw = int(data.get('duration') or 0)
+        self.views = data.get('view_count', 0)
+        self.likes = data.get('like_count', 0)
+        self.loudness = data.get('loudness')
+
+
+@dataclass(slots=True, eq=False, init=False)
+class QueuedTrack(TrackInfo):
+    """
+    Lekki utwór w kolejce - przechowuje wyłącznie metadane.
+
+    W przeciwieństwie do YTDLSource nie uruchamia procesu FFmpeg, więc długość
+    kolejki nie wpływa na liczbę procesów ani otwartych potoków. Źródło audio
+    tworzone jest dopiero tuż przed odtworzeniem (YTDLSource.from_track).
+    """
+    stream_url: Optional[str] = None
+    acodec: Optional[str] = None  # Kodek dźwięku strumienia (np. 'opus') - decyduje o dekodowaniu
+    expires_at: Optional[int] = None
+    requester: Optional[discord.abc.User] = None
+
+    def __init__(self, data, requester=None):
+        self.requester = requester
+        self.update_from(data)
+
+    @classmethod
+    def from_playlist_entry(cls, entry, requester=None):
+        """
+        Tworzy utwór z płaskiego wpisu playlisty (extract_flat), bez adresu strumienia.
+        
+        Adres strumienia i brakujące metadane zostaną pobrane, gdy utwór zbliży
+        się do początku kolejki.
+        
+        Args:
+            entry: Wpis playlisty zwrócony przez yt-dlp z extract_flat
+            requester: Użytkownik, który dodał utwór
+        """
+        data = dict(entry)
+        
+        # W płaskim wpisie 'url' to link do filmu, a nie adres strumienia
+        data['webpage_url'] = entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
+        data['url'] = None
+        data['uploader'] = entry.get('uploader') or entry.get('channel') or 'Unknown'
+        if not entry.get('thumbnail') and entry.get('thumbnails'):
+            data['thumbnail'] = entry['thumbnails'][-1].get('url')
+        return cls(data, requester=requester)
+
+    def update_from(self, data):
+        """Ustawia metadane i adres strumienia na podstawie danych yt-dlp."""
+        self.update_info(data)
+        self.stream_url = data.get('url')
+        self.acodec = data.get('acodec')
+        self.expires_at = parse_stream_expiry(self.stream_url)
+
+    def __str__(self):
+        """Reprezentacja tekstowa utworu"""
+        return f'**{self.title}** by **{self.uploader}**'
+
+    def is_stale(self, margin=STREAM_URL_REFRESH_MARGIN):
+        """
+        Sprawdza, czy adres strumienia wymaga odświeżenia.
+        
+        Args:
+            margin: Ile sekund przed wygaśnięciem uznać adres za nieaktualny
+            
+        Returns:
+            bool: True, jeśli brak adresu lub wygaśnie on w ciągu `margin` sekund
+        """
+        if not self.stream_url:
+            return True
+        if self.expires_at is None:
+            return False
+        return time.time() + margin >= self.expires_at
+
+
+# Pola informacji yt-dlp przechowywane w cache metadanych
+CACHED_FIELDS = (
+    'id', 'title', 'webpage_url', 'uploader', 'uploader_url', 'thumbnail',
+    'duration', 'view_count', 'like_count',
+    'acodec',  # Kodek formatu, z którego pochodzi zapisany adres strumienia
+    'loudness'  # Zmierzona raz głośność - powtórne odtworzenia nie wymagają analizy
+)
+
+# Rozpoznawanie identyfikatora filmu w linkach YouTube
+YOUTUBE_ID_PATTERN = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})')
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+DIACRITIC_FALLBACKS = str.maketrans({'ł': 'l', 'đ': 'd', 'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'þ': 'th'})
+
+
+def extract_video_id(url):
+    """Zwraca identyfikator filmu YouTube z linku lub None"""
+    match = YOUTUBE_ID_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
+
+def is_url(query):
+    """Sprawdza, czy zapytanie jest linkiem, a nie frazą wyszukiwania"""
+    return query.startswith(('http://', 'https://'))
+
+
+def normalize_query(query):
+    """
+    Normalizuje frazę wyszukiwania do postaci klucza indeksu.
+    
+    Ignoruje wielkość liter, białe znaki, interpunkcję i znaki diakrytyczne,
+    więc "Zażółć  Gęślą" i "zazolc gesla" dają ten sam klucz.
+    """
+    text = unicodedata.normalize('NFKD', query.casefold())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.translate(DIACRITIC_FALLBACKS)
+    text = re.sub(r'[^\w]+', ' ', text)
+    return ' '.join(text.split())
+
+
+# Co ile sekund usuwać z dysku przeterminowane wpisy cache (poza usuwaniem przy starcie)
+CACHE_PRUNE_INTERVAL = 6 * 3600
+
+
+def open_cache_db(path):
+    """Otwiera bazę SQLite cache (w trybie WAL), tworząc katalog w razie potrzeby"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    # WAL: odczyty nie czekają na zapis, a commit nie wymaga fsync przy każdej transakcji
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class CacheWriter:
+    """
+    Zapis do bazy SQLite cache w osobnym wątku.
+    
+    Zapisy trafiają do kolejki i są zatwierdzane partiami - jeden commit na
+    wszystkie zapisy, które zdążyły się zebrać - więc pętla zdarzeń nie czeka
+    na dysk. Wątek startuje przy pierwszym zapisie.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def execute(self, sql, params=()):
+        """Zleca wykonanie instrukcji SQL (bez czekania na wynik)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cache-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((sql, params))
+
+    def flush(self, timeout=None):
+        """
+        Czeka, aż zlecone wcześniej zapisy trafią na dysk.
+        
+        Returns:
+            bool: Czy zapisy zostały zatwierdzone przed upływem `timeout`
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        """Pętla wątku zapisu"""
+        try:
+            db = open_cache_db(self.path)
+        except sqlite3.Error as e:
+            logger.error(f"Nie udało się otworzyć bazy cache do zapisu {self.path}: {e}")
+            db = None
+
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiting = []
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    waiting.append(item)
+                elif db is not None:
+                    try:
+                        db.execute(*item)
+                    except sqlite3.Error as e:
+                        logger.error(f"Błąd zapisu cache {self.path}: {e}")
+            if db is not None:
+                try:
+                    db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Błąd zapisu cache {self.path}: {e}")
+            for done in waiting:
+                done.set()
+
+
+# Jeden wątek zapisu na plik bazy (cache metadanych i indeks zapytań dzielą plik)
+_cache_writers = {}
+
+
+def cache_writer(path):
+    """Zwraca wspólny wątek zapisu dla pliku bazy"""
+    writer = _cache_writers.get(path)
+    if writer is None:
+        writer = _cache_writers.setdefault(path, CacheWriter(path))
+    return writer
+
+
+class MetadataCache:
+    """
+    Dwupoziomowy cache wyników extract_info.
+    
+    Pierwszy poziom to LRU w pamięci ograniczone liczbą wpisów, drugi to baza
+    SQLite na dysku, która przetrwa restart bota. Wpisy są indeksowane
+    identyfikatorem filmu. Metadane przechowywane są długo
+    (METADATA_CACHE_TTL_DAYS), adres strumienia tylko do momentu wygaśnięcia.
+    Zapisy na dysk wykonuje wątek CacheWriter, a przeterminowane wpisy są
+    usuwane przy starcie i co CACHE_PRUNE_INTERVAL.
+    """
+
+    def __init__(self, path=METADATA_CACHE_PATH, max_entries=METADATA_CACHE_SIZE,
+                 ttl=METADATA_CACHE_TTL_DAYS * 86400):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._memory = OrderedDict()  # id filmu -> wpis
+        self._lock = threading.Lock()
+        self._db = None
+        self._writer = cache_writer(path)
+        self._pruned_at = time.time()
+        
+        # Liczniki skuteczności
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        self._open()
 
-# Opcje FFmpeg dla discord.py
-ffmpeg_options = {
-    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 10 -nostdin',
-    'options': '-vn'
-}
+    def _open(self):
+        """Otwiera (lub tworzy) bazę na dysku i usuwa przeterminowane wpisy"""
+        try:
+            self._db = open_cache_db(self.path)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tracks (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    stream_url TEXT,
+                    expires_at INTEGER,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute("DELETE FROM tracks WHERE updated_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Nie udało się otworzyć cache metadanych {self.path}: {e}")
+            self._db = None
+
+    def _remember(self, video_id, entry):
+        """Dodaje wpis do LRU w pamięci, usuwając najdawniej używane"""
+        self._memory[video_id] = entry
+        self._memory.move_to_end(video_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, video_id):
+        """Wczytuje wpis z dysku"""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT data, stream_url, expires_at, updated_at FROM tracks WHERE id = ?", (video_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        return {'data': data, 'stream_url': row[1], 'expires_at': row[2], 'updated_at': row[3]}
+
+    def get(self, url):
+        """
+        Zwraca dane utworu w formacie yt-dlp dla linku YouTube.
+        
+        Klucz 'url' (adres strumienia) jest obecny tylko, gdy adres nie wygasł.
+        
+        Args:
+            url: Link YouTube
+            
+        Returns:
+            Optional[Dict]: Dane utworu lub None przy braku trafienia
+        """
+        video_id = extract_video_id(url)
+        if video_id is None:
+            return None
+        
+        with self._lock:
+            entry = self._memory.get(video_id)
+            if entry is not None:
+                self._memory.move_to_end(video_id)
+            else:
+                try:
+                    entry = self._load(video_id)
+                except (sqlite3.Error, ValueError) as e:
+                    logger.error(f"Błąd odczytu cache metadanych: {e}")
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._remember(video_id, entry)
+            
+            # Przeterminowane metadane traktujemy jak brak wpisu
+            if entry is None or time.time() - entry['updated_at'] > self.ttl:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            data = dict(entry['data'])
+            expires_at = entry['expires_at']
+            if entry['stream_url'] and (expires_at is None or time.time() + STREAM_URL_REFRESH_MARGIN < expires_at):
+                data['url'] = entry['stream_url']
+            return data
+
+    def put(self, data):
+        """
+        Zapisuje wynik extract_info w cache.
+        
+        Args:
+            data: Informacje o utworze z yt-dlp
+        """
+        video_id = data.get('id')
+        if not video_id:
+            return
+        
+        stream_url = data.get('url')
+        entry = {
+            'data': {field: data[field] for field in CACHED_FIELDS if data.get(field) is not None},
+            'stream_url': stream_url,
+            'expires_at': parse_stream_expiry(stream_url),
+            'updated_at': time.time()
+        }
+        
+        with self._lock:
+            # Ponowna ekstrakcja (np. odświeżenie adresu) nie może zgubić zmierzonej głośności
+            if 'loudness' not in entry['data']:
+                previous = self._memory.get(video_id)
+                if previous is None:
+                    try:
+                        previous = self._load(video_id)
+                    except (sqlite3.Error, ValueError):
+                        previous = None
+                if previous is not None and previous['data'].get('loudness') is not None:
+                    entry['data']['loudness'] = previous['data']['loudness']
+            
+            self._remember(video_id, entry)
+            
+            if self._db is None:
+                return
+            self._writer.execute(
+                "INSERT OR REPLACE INTO tracks (id, data, stream_url, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (video_id, json.dumps(entry['data']), stream_url, entry['expires_at'], entry['updated_at'])
+            )
+            self._prune_if_due()
+
+    def set_loudness(self, video_id, loudness):
+        """
+        Zapisuje zmierzoną głośność utworu w istniejącym wpisie.
+        
+        Args:
+            video_id: Identyfikator filmu
+            loudness: Głośność zintegrowana w LUFS
+        """
+        with self._lock:
+            entry = self._memory.get(video_id)
+            if entry is None:
+                try:
+                    entry = self._load(video_id)
+                except (sqlite3.Error, ValueError) as e:
+                    logger.error(f"Błąd odczytu cache metadanych: {e}")
+                if entry is None:
+                    return
+                self._remember(video_id, entry)
+            
+            entry['data']['loudness'] = loudness
+            
+            if self._db is None:
+                return
+            self._writer.execute(
+                "UPDATE tracks SET data = ? WHERE id = ?", (json.dumps(entry['data']), video_id)
+            )
+
+    def _prune_if_due(self):
+        """Zleca usunięcie przeterminowanych wpisów z dysku, jeśli minął CACHE_PRUNE_INTERVAL"""
+        now = time.time()
+        if now - self._pruned_at < CACHE_PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        self._writer.execute("DELETE FROM tracks WHERE updated_at < ?", (now - self.ttl,))
+
+    def flush(self, timeout=None):
+        """Czeka, aż zmiany trafią na dysk (np. przed zamknięciem bota)"""
+        return self._writer.flush(timeout)
+
+    def stats(self):
+        """Zwraca liczniki skuteczności cache"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._memory),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+class QueryIndex:
+    """
+    Trwały indeks fraz wyszukiwania -> identyfikator filmu.
+    
+    Powtórzone zapytanie (po normalizacji) pomija wyszukiwanie ytsearch
+    i od razu przechodzi do pobierania metadanych konkretnego filmu.
+    Powiązania starsze niż QUERY_INDEX_TTL_DAYS są pomijane, więc fraza
+    jest co jakiś czas wyszukiwana od nowa. Zapisy na dysk wykonuje wątek
+    CacheWriter.
+    """
+
+    def __init__(self, path=METADATA_CACHE_PATH, max_entries=METADATA_CACHE_SIZE,
+                 ttl=QUERY_INDEX_TTL_DAYS * 86400):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._memory = OrderedDict()  # znormalizowana fraza -> (id filmu, czas zapisu)
+        self._lock = threading.Lock()
+        self._db = None
+        self._writer = cache_writer(path)
+        self._pruned_at = time.time()
+        
+        # Liczniki skuteczności
+        self.hits = 0
+        self.misses = 0
+        
+        try:
+            self._db = open_cache_db(self.path)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS queries (
+                    query TEXT PRIMARY KEY,
+                    video_id TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute("DELETE FROM queries WHERE updated_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Nie udało się otworzyć indeksu zapytań {self.path}: {e}")
+            self._db = None
+
+    def _remember(self, key, entry):
+        """Dodaje frazę do LRU w pamięci"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key):
+        """Usuwa frazę z pamięci i z dysku (wywoływać z blokadą)"""
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._writer.execute("DELETE FROM queries WHERE query = ?", (key,))
+
+    def get(self, query):
+        """Zwraca id filmu dla frazy wyszukiwania lub None (także po wygaśnięciu powiązania)"""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                try:
+                    entry = self._db.execute(
+                        "SELECT video_id, updated_at FROM queries WHERE query = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Błąd odczytu indeksu zapytań: {e}")
+                    entry = None
+                if entry is not None:
+                    self._remember(key, entry)
+            
+            # Przeterminowane powiązanie usuwamy - fraza zostanie wyszukana ponownie
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                self._delete(key)
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def discard(self, query):
+        """Zapomina frazę wyszukiwania (np. gdy zapamiętany film przestał być dostępny)"""
+        key = normalize_query(query)
+        with self._lock:
+            self._delete(key)
+
+    def put(self, query, video_id):
+        """Zapamiętuje, do jakiego filmu prowadzi fraza wyszukiwania"""
+        key = normalize_query(query)
+        if not key or not video_id:
+            return
+        
+        updated_at = time.time()
+        with self._lock:
+            self._remember(key, (video_id, updated_at))
+            if self._db is None:
+                return
+            self._writer.execute(
+                "INSERT OR REPLACE INTO queries (query, video_id, updated_at) VALUES (?, ?, ?)",
+                (key, video_id, updated_at)
+            )
+            self._prune_if_due()
+
+    def _prune_if_due(self):
+        """Zleca usunięcie przeterminowanych powiązań z dysku, jeśli minął CACHE_PRUNE_INTERVAL"""
+        now = time.time()
+        if now - self._pruned_at < CACHE_PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        self._writer.execute("DELETE FROM queries WHERE updated_at < ?", (now - self.ttl,))
+
+    def flush(self, timeout=None):
+        """Czeka, aż zmiany trafią na dysk"""
+        return self._writer.flush(timeout)
+
+    def stats(self):
+        """Zwraca liczniki skuteczności indeksu"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._memory),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+# Wspólny cache metadanych i indeks zapytań dla wszystkich serwerów
+metadata_cache = MetadataCache()
+query_index = QueryIndex()
 
-# Klasa do obsługi błędów YT-DLP
-class YTDLError(Exception):
-    """Niestandardowy wyjątek dla błędów związanych z YT-DLP"""
-    pass
 
 class YTDLSource(discord.PCMVolumeTransformer):
     """
     Klasa źródła PCMVolumeTransformer do odtwarzania audio z YouTube.
+    
+    Dźwięk w Opus (pliki Ogg/Opus z cache audio i strumienie Opus z YouTube)
+    jest przy głośności 1.0 przekazywany bez dekodowania. Zmiana głośności
+    podczas takiego odtwarzania przełącza źródło na dekodowanie do PCM od
+    bieżącego miejsca. Ramki PCM przechodzą przez łańcuch filtrów
+    (głośność, płynne narastanie i wyciszanie).
     """
-    # Używanie globalnej zmiennej jako zmiennej klasowej
-    ytdl = ytdl
     
-    def __init__(self, source, *, data, volume=0.5):
-        super().__init__(source, volume)
+    def __init__(self, source, *, data=None, track=None, volume=1.0, file_path=None):
+        # Bez super().__init__ - PCMVolumeTransformer odrzuca źródła Opus
+        self.original = source
+        self._volume = max(volume, 0.0)
+        self.file_path = file_path  # Plik z cache audio, jeśli utwór jest odtwarzany z dysku
+        self.frames_read = 0
+        self._frame_opus = source.is_opus()
+        self._retired = None  # Poprzednie źródło do zamknięcia przez wątek odtwarzacza
+        
+        # Utwór z kolejki, z którego powstało źródło (lub nowy, jeśli mamy tylko dane).
+        # Surowy słownik yt-dlp nie jest przechowywany - wystarczą metadane utworu.
+        self.track = track if track is not None else QueuedTrack(data)
+        
+        # Filtry ramek PCM (ścieżka Opus ich nie używa)
+        self.volume_filter = GainFilter(self._volume)
+        self.loudness_filter = GainFilter(loudness_gain(self.track.loudness), limit=LOUDNESS_MAX_GAIN)
+        self.fader = FadeFilter()
+        self.filters = PCMFilterChain([self.volume_filter, self.loudness_filter, self.fader])
         
         # Podstawowe informacje o utworze
-        self.data = data
-        self.id = data.get('id')
-        self.title = data.get('title', 'Unknown')
-        self.url = data.get('webpage_url', f'https://www.youtube.com/watch?v={self.id}')
+        self.id = self.track.id
+        self.title = self.track.title
+        self.url = self.track.url
         
         # Dodatkowe metadane
-        self.uploader = data.get('uploader', 'Unknown')
-        self.uploader_url = data.get('uploader_url', None)
-        self.thumbnail = data.get('thumbnail', None)
-        self.description = data.get('description', 'No description')
-        self.duration_raw = int(data.get('duration', 0))
-        self.duration = self._format_duration(self.duration_raw)
-        self.tags = data.get('tags', [])
-        self.views = data.get('view_count', 0)
-        self.likes = data.get('like_count', 0)
-        self.stream_url = data.get('url')
-        self.requester = None  # To będzie ustawione po utworzeniu
+        self.uploader = self.track.uploader
+        self.uploader_url = self.track.uploader_url
+        self.thumbnail = self.track.thumbnail
+        self.duration_raw = self.track.duration_raw
+        self.duration = self.track.duration
+        self.views = self.track.views
+        self.likes = self.track.likes
+        self.stream_url = self.track.stream_url
+        self.requester = self.track.requester
 
     def __str__(self):
         """Reprezentacja tekstowa utworu"""
         return f'**{self.title}** by **{self.uploader}**'
+
+    @property
+    def volume(self):
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(value, 0.0)
+        self.volume_filter.value = self._volume
+
+        # Pakietów Opus nie da się przeskalować - przy innej głośności dekoduj do PCM od bieżącego miejsca
+        if self._volume != 1.0 and self.original.is_opus():
+            # Najpierw podmień źródło - wątek odtwarzacza może właśnie czytać poprzednie
+            previous = self.original
+            if self.file_path:
+                self.original = self._local_audio(self.file_path, False, start=self.position)
+            else:
+                self.original = self._stream_audio(self.stream_url, None, False, start=self.position)
+            self._retire(previous)
+
+    @property
+    def position(self):
+        """Czas odtworzonej części utworu w sekundach (ramki po 20 ms)"""
+        return self.frames_read * 0.02
+
+    def _retire(self, source):
+        """Odkłada zastąpione źródło do zamknięcia przy następnym odczycie"""
+        retired, self._retired = self._retired, source
+        if retired is not None:
+            retired.cleanup()
+
+    def fade_in(self, milliseconds):
+        """Płynnie zwiększa głośność od ciszy na początku odtwarzania (tylko PCM)"""
+        if milliseconds > 0 and not self.original.is_opus():
+            self.fader.fade_in(milliseconds // 20)
+
+    def fade_out(self, milliseconds):
+        """
+        Płynnie wycisza utwór, po czym kończy źródło (jak stop, tylko bez trzasku).
         
-    def _format_duration(self, duration):
-        """Formatuje czas trwania w sekundach do czytelnej postaci."""
-        if not duration:
-            return "00:00"
+        Args:
+            milliseconds: Czas wyciszania
             
-        minutes, seconds = divmod(duration, 60)
-        hours, minutes = divmod(minutes, 60)
+        Returns:
+            bool: False, jeśli wyciszanie nie jest możliwe (pakiety Opus) i trzeba zatrzymać od razu
+        """
+        if milliseconds <= 0 or self._frame_opus:
+            return False
+        self.fader.fade_out(milliseconds // 20)
+        return True
+
+    def read(self):
+        # Po wyciszeniu źródło kończy się jak po ostatniej ramce
+        if self.fader.finished:
+            return b''
+
+        # Zastąpione źródło zamyka wątek odtwarzacza - nie jest już wtedy czytane
+        if self._retired is not None:
+            retired, self._retired = self._retired, None
+            retired.cleanup()
+
+        # is_opus() dotyczy ostatnio zwróconej ramki, nawet jeśli źródło zmieniło się w międzyczasie
+        original = self.original
+        self._frame_opus = original.is_opus()
+        frame = original.read()
+        if frame:
+            self.frames_read += 1
+        if self._frame_opus:
+            return frame
+        return self.filters.process(frame)
+
+    def is_opus(self):
+        return self._frame_opus
+
+    def cleanup(self):
+        self.original.cleanup()
+        if self._retired is not None:
+            self._retired.cleanup()
+            self._retired = None
+
+    @staticmethod
+    def _passthrough(volume, loudness):
+        """
+        Sprawdza, czy dźwięk Opus może trafić do Discorda bez dekodowania (brak zmian poziomu).
         
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        else:
-            return f"{minutes:02d}:{seconds:02d}"
+        Korekta głośności utworu ma pierwszeństwo: przy włączonym LOUDNESS_NORMALIZATION
+        bez dekodowania grane są tylko utwory, których głośność jest już bliska celu.
+        """
+        return volume == 1.0 and loudness_gain(loudness) == 1.0
+
+    @staticmethod
+    def _local_audio(file_path, passthrough, start=0):
+        """
+        Tworzy źródło dla pliku z cache audio.
+        
+        Args:
+            file_path: Ścieżka pliku w cache
+            passthrough: Czy pakiety Opus mogą zostać przekazane bez dekodowania
+            start: Pozycja początkowa w sekundach
+            
+        Returns:
+            PrebufferedAudio: Pakiety Opus z pliku (passthrough) lub PCM z FFmpeg
+        """
+        if passthrough and start == 0 and is_opus_file(file_path):
+            return PrebufferedAudio(OggOpusAudio(file_path))
+
+        options = dict(ffmpeg_local_options)
+        if start:
+            options['before_options'] = f"-ss {start:.2f} {options['before_options']}"
+        return PrebufferedAudio(discord.FFmpegPCMAudio(file_path, **options))
+
+    @staticmethod
+    def _stream_audio(stream_url, acodec, passthrough, start=0):
+        """
+        Tworzy źródło dla zdalnego strumienia.
+        
+        Args:
+            stream_url: Adres strumienia
+            acodec: Kodek dźwięku strumienia (z wybranego formatu yt-dlp)
+            passthrough: Czy pakiety Opus mogą zostać przekazane bez dekodowania
+            start: Pozycja początkowa w sekundach
+            
+        Returns:
+            PrebufferedAudio: Pakiety Opus skopiowane przez FFmpeg (strumień Opus
+            i passthrough) lub PCM z FFmpeg
+        """
+        if passthrough and start == 0 and acodec == 'opus':
+            # FFmpeg tylko przepakowuje dźwięk do Ogg - bez dekodowania i kodowania
+            return PrebufferedAudio(discord.FFmpegOpusAudio(stream_url, codec='copy', **ffmpeg_options))
+
+        options = dict(ffmpeg_options)
+        if start:
+            options['before_options'] = f"-ss {start:.2f} {options['before_options']}"
+        return PrebufferedAudio(discord.FFmpegPCMAudio(stream_url, **options))
+
+    def _format_duration(self, duration):
+        """Formatuje czas trwania w sekundach do czytelnej postaci."""
+        return format_duration(duration)
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, stream=True, volume=0.5, retry_count=0):
+    async def _extract_info(cls, url, *, loop=None, stream=True, retry_count=0,
+                            priority=PRIORITY_INTERACTIVE, guild_id=None):
         """
-        Tworzy źródło audio na podstawie URL lub zapytania wyszukiwania.
+        Pobiera informacje o utworze z yt-dlp, ponawiając próby przy błędach.
         
         Args:
             url: Link YouTube lub fraza wyszukiwania
             loop: Pętla asyncio do wykonania operacji
             stream: Czy streamować (True) czy pobierać (False)
-            volume: Początkowa głośność (0.0-1.0)
             retry_count: Liczba już wykonanych prób (dla rekurencji)
+            priority: Priorytet w harmonogramie ekstrakcji
+            guild_id: ID serwera, dla którego wykonywana jest ekstrakcja
             
         Returns:
-            YTDLSource: Obiekt źródła audio
+            Dict: Informacje o pojedynczym utworze
         """
         loop = loop or asyncio.get_event_loop()
 
@@ -113,30 +1614,34 @@ class YTDLSource(discord.PCMVolumeTransformer):
         if retry_count >= MAX_RETRIES:
             raise YTDLError(f"Nie udało się przetworzyć {url} po {MAX_RETRIES} próbach.")
 
-        # Modyfikuj opcje na podstawie parametru stream
-        ytdl_opts = dict(ytdl_options)
+        # Wybierz profil opcji na podstawie parametru stream
+        # Przy ostatniej próbie zmień format na mniej wymagający
         if not stream:
-            ytdl_opts['format'] = 'bestaudio/best'
-            ytdl_opts['skip_download'] = False
+            profile = 'download'
+        elif retry_count >= 2:
+            logger.info("Próba z niższą jakością audio...")
+            profile = 'stream_low'
         else:
-            ytdl_opts['format'] = 'bestaudio/best'
-            ytdl_opts['skip_download'] = True
-            
-        # Używamy cls.ytdl zamiast zmiennej lokalnej ytdl
-        cls.ytdl = yt_dlp.YoutubeDL(ytdl_opts)
+            profile = 'stream'
 
         try:
             # Logujemy próbę
             logger.info(f"Próba {retry_count+1}/{MAX_RETRIES} pobierania informacji: {url}")
             
-            # Tworzymy funkcję częściową do wykonania przez executor
-            partial = functools.partial(cls.ytdl.extract_info, url, download=not stream)
+            # Tworzymy funkcję częściową do wykonania w puli ekstrakcji
+            # (pobieranie pliku ma osobną pulę - w trybie procesów własne procesy robocze)
+            pool = ytdl_pool if stream else ytdl_download_pool
+            partial = functools.partial(pool.extract_info, profile, url, download=not stream)
             
-            # Wykonujemy z timeout
+            # Wykonujemy z timeout (liczonym od startu, bez czasu oczekiwania w kolejce)
+            # Pobieranie pliku ma własne wątki i dłuższy limit czasu
+            scheduler = extraction_scheduler if stream else download_scheduler
             try:
-                data = await asyncio.wait_for(
-                    loop.run_in_executor(None, partial), 
-                    timeout=30.0  # 30 sekund timeout
+                data = await scheduler.run(
+                    partial,
+                    priority=priority,
+                    guild_id=guild_id,
+                    timeout=30.0 if stream else DOWNLOAD_TIMEOUT
                 )
             except asyncio.TimeoutError:
                 raise YTDLError("Timeout podczas pobierania informacji o utworze.")
@@ -148,13 +1653,8 @@ class YTDLSource(discord.PCMVolumeTransformer):
                     raise YTDLError("Nie znaleziono wyników wyszukiwania.")
                 data = data['entries'][0]
 
-            # Zwróć plik jeśli pobieramy lokalnie
-            if not stream:
-                file_path = cls.ytdl.prepare_filename(data)
-                return cls(discord.FFmpegPCMAudio(file_path, **ffmpeg_options), data=data, volume=volume)
-            else:
-                # Twórz jako stream
-                return cls(discord.FFmpegPCMAudio(data['url'], **ffmpeg_options), data=data, volume=volume)
+            # Zostaw tylko używane pola - pełny słownik (formaty, napisy, opis) nie jest potrzebny
+            return trim_info(data)
 
         except Exception as e:
             logger.warning(f"Błąd podczas pobierania {url}: {e}")
@@ -167,26 +1667,305 @@ class YTDLSource(discord.PCMVolumeTransformer):
                 retry_delay = RETRY_DELAY_BASE * (2 ** retry_count) + random.uniform(0, 1)
                 await asyncio.sleep(retry_delay)
                 
-                # Przy kolejnych próbach możemy zmienić strategię
+                # Przy drugiej próbie zresetuj cache
                 if retry_count == 1:
-                    # Przy drugiej próbie zresetuj cache
                     logger.info("Czyszczenie cache yt-dlp...")
-                    cls.ytdl.cache.remove()
-                elif retry_count >= 2:
-                    # Przy trzeciej próbie zmień format na mniej wymagający
-                    logger.info("Próba z niższą jakością audio...")
-                    ytdl_opts['format'] = 'worstaudio'
-                    cls.ytdl = yt_dlp.YoutubeDL(ytdl_opts)
+                    await extraction_scheduler.run(ytdl_pool.clear_cache, priority=priority, guild_id=guild_id)
                 
                 # Rekurencyjnie spróbuj ponownie
-                return await cls.from_url(url, loop=loop, stream=stream, volume=volume, retry_count=retry_count+1)
+                return await cls._extract_info(
+                    url, loop=loop, stream=stream, retry_count=retry_count+1,
+                    priority=priority, guild_id=guild_id
+                )
             else:
                 # Jeśli wykorzystaliśmy wszystkie próby, zgłaszamy szczegółowy błąd
                 logger.error(f"Nie udało się przetworzyć {url} po {MAX_RETRIES} próbach: {e}")
                 raise YTDLError(f"Nie udało się przetworzyć filmu: {e}")
 
+    @staticmethod
+    def _resolve_query(url):
+        """
+        Zamienia wcześniej wyszukiwaną frazę na link do konkretnego filmu.
+        
+        Args:
+            url: Link YouTube lub fraza wyszukiwania
+            
+        Returns:
+            str: Link do filmu z indeksu zapytań lub niezmienione zapytanie
+        """
+        if is_url(url):
+            return url
+        video_id = query_index.get(url)
+        if video_id is None:
+            return url
+        return f'https://www.youtube.com/watch?v={video_id}'
+
+    @classmethod
+    async def _extract_query(cls, url, target, *, loop=None, stream=True,
+                             priority=PRIORITY_INTERACTIVE, guild_id=None):
+        """
+        Pobiera informacje o utworze dla zapytania rozwiązanego przez _resolve_query.
+        
+        Jeśli fraza z indeksu zapytań prowadzi do filmu, którego nie da się już
+        pobrać (usunięty, prywatny), powiązanie jest usuwane, a fraza wyszukiwana
+        od nowa.
+        
+        Args:
+            url: Oryginalne zapytanie (link lub fraza wyszukiwania)
+            target: Wynik _resolve_query dla tego zapytania
+            loop: Pętla asyncio do wykonania operacji
+            stream: Czy streamować (True) czy pobierać (False)
+            priority: Priorytet w harmonogramie ekstrakcji
+            guild_id: ID serwera, dla którego wykonywana jest ekstrakcja
+            
+        Returns:
+            Dict: Informacje o pojedynczym utworze
+        """
+        try:
+            return await cls._extract_info(target, loop=loop, stream=stream, priority=priority, guild_id=guild_id)
+        except YTDLError:
+            if target == url:
+                raise
+            logger.warning(f"Zapamiętany film dla frazy '{url}' jest niedostępny - ponowne wyszukiwanie")
+            query_index.discard(url)
+            return await cls._extract_info(url, loop=loop, stream=stream, priority=priority, guild_id=guild_id)
+
+    @staticmethod
+    def _remember_result(url, data):
+        """Zapisuje wynik ekstrakcji w cache metadanych i indeksie zapytań"""
+        metadata_cache.put(data)
+        if not is_url(url):
+            query_index.put(url, data.get('id'))
+
+    @classmethod
+    async def from_url(cls, url, *, loop=None, stream=True, volume=1.0):
+        """
+        Tworzy źródło audio na podstawie URL lub zapytania wyszukiwania.
+        
+        Uwaga: od razu uruchamia proces FFmpeg. Do kolejki należy dodawać
+        lekkie obiekty QueuedTrack (create_track) zamiast gotowych źródeł.
+        
+        Args:
+            url: Link YouTube lub fraza wyszukiwania
+            loop: Pętla asyncio do wykonania operacji
+            stream: Czy streamować (True) czy pobierać (False)
+            volume: Początkowa głośność (0.0-1.0)
+            
+        Returns:
+            YTDLSource: Obiekt źródła audio
+        """
+        # Zwróć plik jeśli pobieramy lokalnie
+        if not stream:
+            data, file_path = await cls.download(url, loop=loop)
+            passthrough = cls._passthrough(volume, data.get('loudness'))
+            return cls(cls._local_audio(file_path, passthrough), data=data, volume=volume, file_path=file_path)
+
+        # Przy streamowaniu wystarczy wpis z cache z ważnym adresem strumienia
+        target = cls._resolve_query(url)
+        data = metadata_cache.get(target)
+        if data is None or not data.get('url'):
+            data = await cls._extract_query(url, target, loop=loop, stream=stream)
+            cls._remember_result(url, data)
+
+        # Twórz jako stream
+        passthrough = cls._passthrough(volume, data.get('loudness'))
+        return cls(cls._stream_audio(data['url'], data.get('acodec'), passthrough), data=data, volume=volume)
+
+    @classmethod
+    async def download(cls, url, *, loop=None, priority=PRIORITY_INTERACTIVE, guild_id=None):
+        """
+        Pobiera utwór do lokalnego cache audio bez tworzenia źródła.
+        
+        Args:
+            url: Link YouTube lub fraza wyszukiwania
+            loop: Pętla asyncio do wykonania operacji
+            priority: Priorytet w harmonogramie pobierania
+            guild_id: ID serwera, dla którego pobierany jest utwór
+            
+        Returns:
+            Tuple[Dict, str]: Informacje o utworze i ścieżka pliku w cache
+        """
+        loop = loop or asyncio.get_event_loop()
+        target = cls._resolve_query(url)
+        data = metadata_cache.get(target)
+
+        # Utwór pobrany wcześniej odtwarzamy z dysku, bez połączenia z YouTube
+        if data is not None:
+            file_path = audio_cache.get(data.get('id'))
+            if file_path:
+                return data, file_path
+
+        data = await cls._extract_query(url, target, loop=loop, stream=False, priority=priority, guild_id=guild_id)
+        cls._remember_result(url, data)
+        file_path = await loop.run_in_executor(None, cls._store_download, data)
+        return data, file_path
+
+    @staticmethod
+    def _store_download(data):
+        """
+        Zapisuje pobrany plik w cache audio jako Ogg/Opus (wywołanie blokujące).
+        
+        Przy okazji, jeśli głośność utworu nie jest jeszcze znana, mierzy ją
+        raz i zapisuje w cache metadanych (uzupełnia też `data`).
+        """
+        # YouTube zwykle udostępnia dźwięk w Opus - wtedy wystarczy zmienić kontener
+        file_path = transcode_to_opus(data['_filename'], copy=data.get('acodec') == 'opus')
+        
+        if LOUDNESS_NORMALIZATION and data.get('loudness') is None:
+            loudness = measure_loudness(file_path)
+            if loudness is not None:
+                data['loudness'] = loudness
+                metadata_cache.set_loudness(data['id'], loudness)
+        
+        return audio_cache.store(data['id'], file_path)
+
+    # Trwające pobrania w tle (id filmu -> zadanie), wspólne dla wszystkich serwerów
+    _downloads = {}
+
+    @classmethod
+    def download_track(cls, track, *, loop=None, guild_id=None):
+        """
+        Pobiera w tle utwór z kolejki do cache audio.
+        
+        Ten sam utwór jest pobierany tylko raz, nawet jeśli czeka w kolejkach
+        kilku serwerów - kolejne wywołania dostają to samo zadanie.
+        
+        Args:
+            track: Obiekt QueuedTrack
+            loop: Pętla asyncio do wykonania operacji
+            guild_id: ID serwera, do którego należy utwór
+            
+        Returns:
+            asyncio.Task: Zadanie zwracające informacje o utworze i ścieżkę pliku w cache
+        """
+        task = cls._downloads.get(track.id)
+        if task is None:
+            task = asyncio.ensure_future(
+                cls.download(track.url, loop=loop, priority=PRIORITY_BACKGROUND, guild_id=guild_id)
+            )
+            cls._downloads[track.id] = task
+            task.add_done_callback(
+                lambda done: cls._downloads.pop(track.id) if cls._downloads.get(track.id) is done else None
+            )
+        return task
+
+    @classmethod
+    def cancel_download(cls, video_id):
+        """Przerywa pobieranie w tle (czekające w kolejce nie zostanie uruchomione)"""
+        task = cls._downloads.get(video_id)
+        if task is not None:
+            task.cancel()
+
+    @classmethod
+    async def create_track(cls, url, *, loop=None, requester=None, priority=PRIORITY_INTERACTIVE, guild_id=None):
+        """
+        Pobiera metadane utworu bez tworzenia źródła audio.
+        
+        Args:
+            url: Link YouTube lub fraza wyszukiwania
+            loop: Pętla asyncio do wykonania operacji
+            requester: Użytkownik, który dodał utwór
+            priority: Priorytet w harmonogramie ekstrakcji
+            guild_id: ID serwera, dla którego dodawany jest utwór
+            
+        Returns:
+            QueuedTrack: Lekki obiekt utworu do umieszczenia w kolejce
+        """
+        # Do kolejki wystarczą metadane - adres strumienia zostanie odświeżony przed odtworzeniem
+        target = cls._resolve_query(url)
+        data = metadata_cache.get(target)
+        if data is None:
+            data = await cls._extract_query(url, target, loop=loop, stream=True, priority=priority, guild_id=guild_id)
+            cls._remember_result(url, data)
+        return QueuedTrack(data, requester=requester)
+
+    @classmethod
+    async def refresh_track(cls, track, *, loop=None, priority=PRIORITY_BACKGROUND, guild_id=None):
+        """
+        Ponownie pobiera adres strumienia dla utworu z kolejki.
+        
+        Args:
+            track: Obiekt QueuedTrack z nieaktualnym adresem strumienia (lub z samymi metadanymi playlisty)
+            loop: Pętla asyncio do wykonania operacji
+            priority: Priorytet w harmonogramie ekstrakcji (domyślnie w tle)
+            guild_id: ID serwera, do którego należy utwór
+            
+        Returns:
+            QueuedTrack: Ten sam obiekt z odświeżonym adresem
+        """
+        logger.info(f"Odświeżanie adresu strumienia: {track.title}")
+        data = await cls._extract_info(track.url, loop=loop, stream=True, priority=priority, guild_id=guild_id)
+        metadata_cache.put(data)
+        track.update_from(data)
+        return track
+
+    @classmethod
+    def from_track(cls, track, *, volume=1.0):
+        """
+        Tworzy źródło audio dla utworu z kolejki tuż przed jego odtworzeniem.
+        
+        Jeśli utwór jest w lokalnym cache audio, odtwarzany jest plik z dysku
+        (adres strumienia nie jest wtedy potrzebny).
+        
+        Args:
+            track: Obiekt QueuedTrack z adresem strumienia
+            volume: Początkowa głośność (0.0-1.0)
+            
+        Returns:
+            YTDLSource: Obiekt źródła audio
+        """
+        passthrough = cls._passthrough(volume, track.loudness)
+        file_path = audio_cache.get(track.id)
+        if file_path:
+            return cls(cls._local_audio(file_path, passthrough), track=track, volume=volume, file_path=file_path)
+
+        if not track.stream_url:
+            raise YTDLError(f"Brak adresu strumienia dla utworu {track.title}.")
+        return cls(cls._stream_audio(track.stream_url, track.acodec, passthrough), track=track, volume=volume)
+
+    @classmethod
+    def from_frames(cls, track, frames, *, volume=1.0):
+        """
+        Tworzy źródło audio z ramek PCM zapisanych w pamięci.
+        
+        Args:
+            track: Obiekt QueuedTrack, do którego należą ramki
+            frames: Lista ramek PCM (po 20 ms)
+            volume: Początkowa głośność (0.0-1.0)
+            
+        Returns:
+            YTDLSource: Obiekt źródła audio
+        """
+        return cls(MemoryAudio(frames), track=track, volume=volume)
+
+    def start_recording(self, max_frames):
+        """Włącza zapis ramek utworu do pamięci (jeśli źródło to obsługuje)"""
+        # Pakiety Opus z dysku nie wymagają bufora - plik jest lokalny, a ramki nie są PCM
+        if isinstance(self.original, PrebufferedAudio) and not self.original.is_opus():
+            self.original.start_recording(max_frames)
+
+    def recorded_frames(self):
+        """Zwraca ramki zapisane podczas odtwarzania całego utworu lub None"""
+        if isinstance(self.original, PrebufferedAudio):
+            return self.original.recorded_frames()
+        return None
+
+    def prebuffer(self, frames=PREBUFFER_FRAMES):
+        """
+        Wczytuje z wyprzedzeniem początek utworu (wywołanie blokujące - uruchamiać w executorze).
+        
+        Args:
+            frames: Docelowa liczba ramek w buforze
+            
+        Returns:
+            int: Liczba ramek w buforze (0, jeśli źródło nie obsługuje buforowania)
+        """
+        if isinstance(self.original, PrebufferedAudio):
+            return self.original.prebuffer(frames)
+        return 0
+
     @classmethod
-    async def search(cls, query, *, loop=None, limit=5):
+    async def search(cls, query, *, loop=None, limit=5, guild_id=None):
         """
         Wyszukuje utwory na YouTube i zwraca listę wyników.
         
@@ -194,29 +1973,20 @@ class YTDLSource(discord.PCMVolumeTransformer):
             query: Fraza wyszukiwania
             loop: Pętla asyncio
             limit: Maksymalna liczba wyników
+            guild_id: ID serwera, dla którego wykonywane jest wyszukiwanie (do limitu na serwer)
             
         Returns:
             List[Dict]: Lista znalezionych utworów
         """
-        search_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': 'in_playlist',
-            'default_search': f'ytsearch{limit}',
-            'noplaylist': True
-        }
-        
-        # Używamy klasy yt_dlp zamiast importu zmiennej
-        search_ytdl = yt_dlp.YoutubeDL(search_opts)
+        loop = loop or asyncio.get_event_loop()
         
         # Logujemy wyszukiwanie
         logger.info(f"Wyszukiwanie YouTube: {query}")
         
         try:
-            # Wykonaj wyszukiwanie asynchronicznie
-            partial = functools.partial(search_ytdl.extract_info, query, download=False)
-            data = await loop.run_in_executor(None, partial)
+            # Wykonaj wyszukiwanie asynchronicznie na instancji z puli
+            partial = functools.partial(ytdl_pool.extract_info, 'search', f"ytsearch{limit}:{query}", download=False)
+            data = await extraction_scheduler.run(partial, priority=PRIORITY_INTERACTIVE, guild_id=guild_id)
             
             # Sprawdź wyniki
             if 'entries' not in data:
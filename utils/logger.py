@@ -3,14 +3,15 @@ import os
 import sys
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
+from config import LOG_DIR
 
-# Upewnij się, że katalog logs istnieje
-if not os.path.exists('logs'):
-    os.makedirs('logs')
+# Upewnij się, że katalog logów istnieje
+if not os.path.exists(LOG_DIR):
+    os.makedirs(LOG_DIR)
 
 # Data do nazwy pliku logu
 current_date = datetime.now().strftime("%Y-%m-%d")
-log_file = f"logs/musicbot_{current_date}.log"
+log_file = os.path.join(LOG_DIR, f"musicbot_{current_date}.log")
 
 # Konfiguracja formatowania logów
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
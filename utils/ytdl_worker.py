@@ -0,0 +1,111 @@
+"""
+Funkcje wykonywane w procesach roboczych ekstrakcji yt-dlp.
+
+Moduł celowo importuje tylko yt_dlp - procesy uruchamiane metodą spawn
+importują go od nowa, więc nie może ładować konfiguracji bota, cache ani
+połączeń Discord.
+"""
+import yt_dlp
+
+# Pola informacji o utworze, z których korzysta bot - reszta nie jest przesyłana między procesami
+TRIMMED_FIELDS = (
+    'id', 'title', 'url', 'webpage_url', 'original_url',
+    'uploader', 'uploader_url', 'channel', 'channel_url',
+    'thumbnail', 'duration', 'view_count', 'like_count',
+    'acodec', 'abr', 'asr', 'ext', 'loudness', '_filename', '_type'
+)
+
+# Pola formatów zachowywane na potrzeby diagnostyki (trim_info z formats=True)
+FORMAT_FIELDS = ('format_id', 'url', 'acodec', 'abr', 'asr', 'ext', 'protocol')
+
+class ExtractionError(Exception):
+    """Błąd ekstrakcji przekazywany z procesu roboczego (wyjątki yt-dlp nie dają się serializować)"""
+    pass
+
+
+# Instancje YoutubeDL procesu roboczego, po jednej na profil (tworzone przy starcie)
+_profiles = {}
+_instances = {}
+
+
+def trim_info(data, formats=False):
+    """
+    Zostawia w wyniku yt-dlp tylko pola używane przez bota.
+
+    Pomija m.in. listę formatów, napisy, opis i tagi, które potrafią zająć
+    setki KB na utwór. Wpisy playlist i wyników wyszukiwania są przycinane
+    rekurencyjnie.
+
+    Args:
+        data: Słownik zwrócony przez extract_info
+        formats: Czy zachować listę formatów (same podstawowe pola - dla diagnostyki)
+
+    Returns:
+        Dict: Przycięty słownik
+    """
+    if data is None:
+        return None
+
+    trimmed = {key: data[key] for key in TRIMMED_FIELDS if key in data}
+    if formats and data.get('formats'):
+        trimmed['formats'] = [
+            {key: fmt[key] for key in FORMAT_FIELDS if key in fmt} for fmt in data['formats']
+        ]
+
+    # Wpisy z listy playlisty mają tylko listę miniatur - zachowaj ostatnią (największą)
+    if 'thumbnail' not in trimmed and data.get('thumbnails'):
+        trimmed['thumbnails'] = data['thumbnails'][-1:]
+
+    if data.get('entries') is not None:
+        trimmed['entries'] = [trim_info(entry, formats) for entry in data['entries'] if entry]
+    return trimmed
+
+
+def init(profiles):
+    """
+    Inicjalizuje proces roboczy - tworzy instancje YoutubeDL z wyprzedzeniem.
+
+    Args:
+        profiles: Słownik profili opcji yt-dlp (nazwa -> opcje)
+    """
+    _profiles.update(profiles)
+    for name in profiles:
+        _instances[name] = yt_dlp.YoutubeDL(dict(profiles[name]))
+
+
+def extract(profile, url, download=False, formats=False):
+    """
+    Wykonuje extract_info w procesie roboczym i zwraca przycięty wynik.
+
+    Args:
+        profile: Nazwa profilu opcji
+        url: Link lub zapytanie yt-dlp
+        download: Czy pobrać plik
+        formats: Czy zachować listę formatów (diagnostyka)
+
+    Returns:
+        Dict: Przycięte informacje o utworze
+    """
+    ydl = _instances[profile]
+    try:
+        data = ydl.extract_info(url, download=download)
+    except Exception as e:
+        raise ExtractionError(str(e)) from None
+
+    # Przy pobieraniu zapamiętaj ścieżkę pliku, póki mamy instancję z właściwym szablonem
+    if download and data is not None:
+        entry = data['entries'][0] if data.get('entries') else data
+        entry.setdefault('_filename', ydl.prepare_filename(entry))
+    return trim_info(data, formats)
+
+
+def clear_cache():
+    """Czyści dyskowy cache yt-dlp (wspólny dla wszystkich procesów)"""
+    for ydl in _instances.values():
+        ydl.cache.remove()
+        break
+
+
+def ping():
+    """Puste zadanie - wymusza uruchomienie procesu roboczego"""
+    return True